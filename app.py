@@ -1,184 +1,388 @@
-from nicegui import ui, app
+import os
+os.environ.setdefault('MATPLOTLIB', 'false') # The app renders charts itself; skip NiceGUI's matplotlib import
+
+from nicegui import Client, background_tasks, ui, app
+from fastapi import Request
 from fastapi.responses import Response
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import math
-import io
-import base64
-import uuid
-import time
-import trimesh
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import asyncio
+import sys
+from collections import OrderedDict
+from functools import partial
+
+from artifact_store import DiskBlobStore, SpillingStore, open_store
+import building_model
+import glb
+from building_model import LOD_TIERS, MAX_ELEMENTS, floor_layout, generate_with, story_elements, stream_size, stream_with
+from cache import ModelCache, RenderCache, content_id, render_model
+from charts import chart_key, chart_series, echart_options, pareto_options, render_charts_png, schematic_svg
+from dataflow import Dataflow
+from glb import quantize_glb
+from http_cache import UncompressedPaths, cached_file_response, cached_response, negotiate_variant, streamed_response
+from material_db import RATE_COLUMNS
+from metrics import ERRORS, REGISTRY, REQUEST_SECONDS, STAGE_SECONDS, register_store_gauges
+from optimizer import GRID_MAX, GRID_MIN, GRID_PASSO, grids_entre, otimizar
+from prebake import DEFAULT_MODEL_KEY, load_prebaked
+from scene_graph import BuildingScene
+from session import SessionStore
+from sizing import dimensionar, formatar_secao_viga, ler_linhas, secao_laje, secao_viga
+from warm_cache import WarmCache, code_version
+from workers import PoolBusy, WorkerPool
 
 # Global configurations
 arquivo = 'Database.xlsx'
-lista_resultados = []
 lista_dicionarios = []
 
-# Dictionary to store images in memory
-in_memory_images = {}
-in_memory_models = {}
-
-# Global UI component variables
-resultado_text = None
-resultado_grafico_html = None
-model_viewer_html_element = None # Renamed for clarity: this will be the ui.html component that holds the model-viewer
-tabs = None
-
-# Generate initial default model
-initial_model_bytes = None
-initial_model_id = None
-
-# generate_with function
-def generate_with(material_type='wood', num_floors=1, floor_slab_thickness_param=0.2, return_bytes=False):
-    try:
-        num_floors = max(1, int(num_floors))
-        floor_slab_height = max(0.05, float(floor_slab_thickness_param))
-        
-        floor_width = 4.0
-        floor_depth = 4.0
-        column_dim = 0.3
-        beam_height = 0.3
-        beam_width = 0.3
-        story_height = 3.0
-        pillar_height = story_height - floor_slab_height
-
-        meshes = []
-
-        for i in range(num_floors):
-            floor_z_bottom = i * story_height
-            
-            # Slab
-            floor_slab = trimesh.creation.box(extents=[floor_width, floor_depth, floor_slab_height])
-            floor_slab.apply_translation([0, 0, floor_z_bottom + floor_slab_height / 2])
-            meshes.append(floor_slab)
-
-            # Pillars
-            column_x_offset = floor_width / 2 - column_dim / 2
-            column_y_offset = floor_depth / 2 - column_dim / 2
-            
-            column_positions = [
-                [column_x_offset, column_y_offset, floor_z_bottom + floor_slab_height],
-                [-column_x_offset, column_y_offset, floor_z_bottom + floor_slab_height],
-                [column_x_offset, -column_y_offset, floor_z_bottom + floor_slab_height],
-                [-column_x_offset, -column_y_offset, floor_z_bottom + floor_slab_height],
-            ]
-
-            for pos in column_positions:
-                pillar = trimesh.creation.box(extents=[column_dim, column_dim, pillar_height])
-                pillar.apply_translation([pos[0], pos[1], pos[2] + pillar_height / 2])
-                meshes.append(pillar)
-
-            # Beams
-            beam_z = floor_z_bottom + story_height - beam_height / 2
-            beam_length_x = floor_width - column_dim
-            beam_length_y = floor_depth - column_dim
-
-            beam_x1 = trimesh.creation.box(extents=[beam_length_x, beam_width, beam_height])
-            beam_x1.apply_translation([0, column_y_offset, beam_z])
-            meshes.append(beam_x1)
-
-            beam_x2 = trimesh.creation.box(extents=[beam_length_x, beam_width, beam_height])
-            beam_x2.apply_translation([0, -column_y_offset, beam_z])
-            meshes.append(beam_x2)
-
-            beam_y1 = trimesh.creation.box(extents=[beam_width, beam_length_y, beam_height])
-            beam_y1.apply_translation([column_x_offset, 0, beam_z])
-            meshes.append(beam_y1)
-
-            beam_y2 = trimesh.creation.box(extents=[beam_width, beam_length_y, beam_height])
-            beam_y2.apply_translation([-column_x_offset, 0, beam_z])
-            meshes.append(beam_y2)
-        
-        combined = trimesh.util.concatenate(meshes)
-
-        # Material
-        if material_type == 'wood':
-            base_color = [0.6, 0.4, 0.2, 1.0]
-            pbr_material = trimesh.visual.texture.PBRMaterial(
-                baseColorFactor=base_color, metallicFactor=0.0, roughnessFactor=0.8)
-        elif material_type == 'steel':
-            base_color = [0.7, 0.7, 0.7, 1.0]
-            pbr_material = trimesh.visual.texture.PBRMaterial(
-                baseColorFactor=base_color, metallicFactor=0.9, roughnessFactor=0.3)
-        else:  # concrete
-            base_color = [0.55, 0.55, 0.55, 1.0]
-            pbr_material = trimesh.visual.texture.PBRMaterial(
-                baseColorFactor=base_color, metallicFactor=0.05, roughnessFactor=0.9)
-
-        combined.visual = trimesh.visual.TextureVisuals()
-        combined.visual.material = pbr_material
-
-        if return_bytes:
-            buffer = io.BytesIO()
-            combined.export(buffer, file_type='glb')
-            buffer.seek(0)
-            return buffer.read()
-        
-        return combined
-        
-    except Exception as e:
-        print(f"Error generating 3D model: {e}")
-        return None
-
-
-# Initialize default model (moved outside function for direct execution at startup)
-try:
-    initial_model_bytes = generate_with('wood', 1, 0.2, return_bytes=True)
-    if initial_model_bytes:
-        initial_model_id = str(uuid.uuid4())
-        in_memory_models[initial_model_id] = initial_model_bytes
-        print(f"Initial model created with ID: {initial_model_id}")
-    else:
-        print("Failed to generate initial model bytes.")
-except Exception as e:
-    print(f"Error generating initial 3D model: {e}")
-
+# Per-client results and UI references, released once NiceGUI deletes the client
+sessions = SessionStore()
+
+# Bounded stores for chart images and 3D models (memory cap, TTL and LRU eviction).
+# ARTIFACT_STORE=sqlite shares them between several app processes through ARTIFACT_STORE_PATH,
+# so a /model or /chart URL handed out by one worker can be served by any other.
+ARTIFACT_STORE = os.environ.get('ARTIFACT_STORE', 'memory')
+ARTIFACT_STORE_PATH = os.environ.get('ARTIFACT_STORE_PATH', 'artifacts' if ARTIFACT_STORE == 'disk' else 'artifacts.sqlite3')
+in_memory_images = open_store(
+    ARTIFACT_STORE, 'images', path=ARTIFACT_STORE_PATH,
+    max_bytes=int(os.environ.get('IMAGE_STORE_MAX_BYTES', 32 * 1024 * 1024)),
+    ttl=float(os.environ['IMAGE_STORE_TTL']) if 'IMAGE_STORE_TTL' in os.environ else None)
+# GLBs of MODEL_SPILL_BYTES or more are spilled to a content-addressed directory (shared by
+# every worker, garbage-collected by TTL and size) and served from the file instead of the heap.
+# It must differ from the 'disk' backend's own models directory (ARTIFACT_STORE_PATH/models).
+MODEL_CACHE_TTL = float(os.environ.get('MODEL_CACHE_TTL', 6 * 60 * 60))
+in_memory_models = SpillingStore(
+    open_store(
+        ARTIFACT_STORE, 'models', path=ARTIFACT_STORE_PATH,
+        max_bytes=int(os.environ.get('MODEL_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        ttl=MODEL_CACHE_TTL),
+    DiskBlobStore(
+        os.environ.get('MODEL_SPILL_DIR', os.path.join('artifacts', 'models-spill')), suffix='.glb',
+        max_bytes=int(os.environ.get('MODEL_SPILL_MAX_BYTES', 1024 * 1024 * 1024)),
+        ttl=MODEL_CACHE_TTL),
+    threshold=int(os.environ.get('MODEL_SPILL_BYTES', 1024 * 1024)))
+
+# GLB cache keyed on (material, floors, slab thickness), backed by the model store.
+# Models are exported with GPU instancing by default: one shared box mesh per element type.
+MODEL_EXPORT_MODE = os.environ.get('MODEL_EXPORT_MODE', 'instanced')
+model_cache = ModelCache(partial(generate_with, export_mode=MODEL_EXPORT_MODE), store=in_memory_models)
+
+# Buildings at least this tall are shown progressively: coarse envelope, medium tier, full detail
+PROGRESSIVE_MIN_FLOORS = int(os.environ.get('PROGRESSIVE_MIN_FLOORS', 10))
+
+# Buildings with up to this many elements (slabs, pillars, beams) are drawn as a live scene graph
+# and updated by diffs (floors added/removed, elements rescaled in place); larger ones load a GLB.
+# 0 disables it.
+SCENE_MAX_ELEMENTS = int(os.environ.get('SCENE_MAX_ELEMENTS', 400))
+
+# Uncached models of at least this many bytes (instanced export only) are streamed: the viewer gets
+# a parameter-derived URL at once and /model writes the GLB while generating it, keeping a copy in
+# the spill directory. Pending stream IDs live in this process, so streaming is off by default
+# when several processes share the artifact store. 0 disables it.
+MODEL_STREAM_MIN_BYTES = int(os.environ.get('MODEL_STREAM_MIN_BYTES', 1024 * 1024 if ARTIFACT_STORE == 'memory' else 0))
+MODEL_STREAM_PENDING_MAX = 1024
+model_streams = OrderedDict()  # stream ID -> (normalized model key, GLB size), until the model is in the store
+# Part of every stream ID: a URL served as immutable must change when the geometry or GLB code does
+MODEL_CODE_VERSION = code_version(building_model, glb)
+
+# Chart PNGs and GLBs are sent as stored: added outside NiceGUI's GZip middleware, this keeps their
+# Content-Length and Content-Range describing the bytes on the wire
+app.add_middleware(UncompressedPaths, prefixes=('/model/', '/chart/'))
+
+# Encoded GLB variants offered on /model/{id}.glb (None = the GLB as generated)
+MODEL_VARIANTS = {'raw': None, 'quantized': quantize_glb}
+
+# Upper bound on the rows accepted by one /sizing request
+SIZING_MAX_ROWS = int(os.environ.get('SIZING_MAX_ROWS', 100_000))
+
+# Upper bound on the bay spans tried along each axis by one optimizer search
+OTIMIZADOR_MAX_GRIDS = int(os.environ.get('OTIMIZADOR_MAX_GRIDS', 201))
+
+# Chart PNGs keyed on the data series they plot, backed by the image store
+chart_cache = RenderCache(render_charts_png, store=in_memory_images, key_func=chart_key)
+
+# Process pool for GLB generation and chart rendering; refuses new jobs once the queue is full
+worker_pool = WorkerPool(
+    max_workers=int(os.environ['WORKER_POOL_SIZE']) if 'WORKER_POOL_SIZE' in os.environ else None,
+    max_pending=int(os.environ['WORKER_QUEUE_SIZE']) if 'WORKER_QUEUE_SIZE' in os.environ else None)
+app.on_shutdown(worker_pool.shutdown)
+
+
+def load_prebaked_artifacts():
+    # Default model and charts baked at image build time (python prebake.py) skip the first render
+    loaded = load_prebaked(model_cache, chart_cache, export_mode=MODEL_EXPORT_MODE)
+    if loaded:
+        print(f"Loaded {loaded} prebaked artifact(s)")
+
+app.on_startup(load_prebaked_artifacts)
+
+
+# 'client' draws the analysis charts in the browser (ECharts + SVG); 'png' keeps the matplotlib image
+CHART_MODE = os.environ.get('CHART_MODE', 'client')
+
+# Most requested models (and the chart PNGs) are generated in the background and kept in a
+# versioned directory reloaded at boot, so the first users after a restart hit a warm cache.
+# Entries made by another version of the geometry/chart code are dropped. '' disables it.
+WARM_CACHE_DIR = os.environ.get('WARM_CACHE_DIR', os.path.join('artifacts', 'warm'))
+WARM_CACHE_INTERVAL = float(os.environ.get('WARM_CACHE_INTERVAL', 10 * 60))
+warm_cache = WarmCache(
+    model_cache,
+    chart_cache if CHART_MODE == 'png' and os.environ.get('CHART_PRERENDER', '1') == '1' else None,
+    directory=WARM_CACHE_DIR, export_mode=MODEL_EXPORT_MODE,
+    max_models=int(os.environ.get('WARM_CACHE_MODELS', 20))) if WARM_CACHE_DIR else None
+
+
+def load_warm_cache():
+    loaded = warm_cache.load()
+    if loaded:
+        print(f"Loaded {loaded} warm cache artifact(s)")
+    background_tasks.create(keep_cache_warm(), name='warm_cache')
+
+
+async def keep_cache_warm():
+    # First round right after boot, then pick up the models that became popular since
+    while True:
+        try:
+            written = await warm_cache.warm_up(worker_pool, defaults=[DEFAULT_MODEL_KEY[:3]])
+            if written:
+                print(f"Warmed {written} artifact(s) into {WARM_CACHE_DIR}/")
+        except Exception as e:
+            ERRORS.inc(source='warm_cache')
+            sys.stderr.write(f"Error warming the cache: {e}\n")
+        await asyncio.sleep(WARM_CACHE_INTERVAL)
+
+if warm_cache is not None:
+    app.on_startup(load_warm_cache)
+    app.on_shutdown(warm_cache.save)  # Keeps the request counts gathered since the last round
+
+
+# Prometheus scrape endpoint: hot-path latency histograms, error counts and store gauges
+register_store_gauges({'models': in_memory_models, 'images': in_memory_images})
+
+@app.get('/metrics')
+async def get_metrics():
+    return Response(content=REGISTRY.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
 
 # Endpoint to serve images
 @app.get('/chart/{image_id}.png')
-async def get_chart(image_id: str):
+@REQUEST_SECONDS.timed(handler='get_chart')
+async def get_chart(image_id: str, request: Request):
     image_bytes = in_memory_images.get(image_id)
     if image_bytes:
-        return Response(content=image_bytes, media_type='image/png')
+        return cached_response(request, image_bytes, 'image/png', image_id)
     return Response(status_code=404, content="Image not found")
 
+def stream_model_body(model_id, key, builder):
+    # Generate while sending, copy into the spill directory, and cache the model once complete
+    try:
+        with STAGE_SECONDS.time(stage='glb_stream', export_mode='instanced'):
+            yield from in_memory_models.put_stream(model_id, builder.iter_bytes())
+    except Exception as e:
+        ERRORS.inc(source='model_stream')
+        sys.stderr.write(f"Error streaming model {model_id}: {e}\n")
+        raise
+    model_cache.link(key, model_id)
+    model_streams.pop(model_id, None)
+
 # Endpoint to serve 3D models
 @app.get('/model/{model_id}.glb')
-async def get_model(model_id: str):
-    glb_bytes = in_memory_models.get(model_id)
+@REQUEST_SECONDS.timed(handler='get_model')
+async def get_model(model_id: str, request: Request, variant: Optional[str] = None):
+    if model_id not in in_memory_models:
+        stream = model_streams.get(model_id)
+        if stream is None:
+            return Response(status_code=404, content="Model not found")
+        # Reserved but not generated yet: the first request streams it (variants come later).
+        # The size was computed at reservation; only the group patterns are built here, off the loop
+        key, size = stream
+        builder = await run_in_threadpool(stream_with, *key)
+        return streamed_response(request, stream_model_body(model_id, key, builder), size,
+                                 'model/gltf-binary', model_id, headers={'Vary': 'Accept'})
+
+    # Compressed variants are chosen by ?variant= or Accept and cached next to the raw GLB
+    variant = negotiate_variant(request, variant, MODEL_VARIANTS)
+    variant_id = model_id
+    if variant != 'raw':
+        variant_id = f'{model_id}.{variant}'
+        unchanged_id = f'{variant_id}.unchanged'  # Marker: the encoding would not shrink this GLB
+        if variant_id not in in_memory_models and unchanged_id not in in_memory_models:
+            glb_bytes = in_memory_models.get(model_id)
+            try:
+                if glb_bytes:
+                    encoded = await worker_pool.submit(MODEL_VARIANTS[variant], glb_bytes)
+                    # A copy of the raw GLB under another ETag would only split the browser cache
+                    if encoded == glb_bytes:
+                        in_memory_models.put(unchanged_id, b'')
+                    else:
+                        in_memory_models.put(variant_id, encoded)
+            except PoolBusy:
+                pass
+            except Exception as e:
+                ERRORS.inc(source='model_variant')
+                sys.stderr.write(f"Error encoding {variant} variant of model {model_id}: {e}\n")
+        if variant_id not in in_memory_models:
+            variant_id = model_id # Serve the raw GLB, whether unchanged or not encoded yet
+
+    # GLBs are sent as stored: gzipping megabytes of them again on every request costs more than it saves
+    headers = {'Vary': 'Accept'}
+    path = in_memory_models.path(variant_id)
+    if path:
+        # Spilled models are sent from their file rather than read into memory
+        response = cached_file_response(request, path, 'model/gltf-binary', variant_id, headers=headers)
+        if response is not None:
+            return response
+    glb_bytes = in_memory_models.get(variant_id)
     if glb_bytes:
-        return Response(content=glb_bytes, media_type='model/gltf-binary')
+        return cached_response(request, glb_bytes, 'model/gltf-binary', variant_id, headers=headers)
     return Response(status_code=404, content="Model not found")
 
 
+# Batch sizing: CSV or JSON rows in, slab and beam sections for every row out
+@app.post('/sizing')
+async def post_sizing(request: Request, format: Optional[str] = None):
+    body = await request.body()
+    try:
+        linhas = ler_linhas(body, request.headers.get('content-type', ''))
+        if len(linhas) > SIZING_MAX_ROWS:
+            return Response(status_code=413, content=f"At most {SIZING_MAX_ROWS} rows per request")
+        resultado = dimensionar(linhas)
+    except ValueError as e:
+        return Response(status_code=400, content=str(e))
+    if format == 'csv' or (format is None and 'text/csv' in request.headers.get('accept', '')):
+        return Response(content=resultado.to_csv(index=False), media_type='text/csv')
+    return Response(content=resultado.to_json(orient='records', force_ascii=False), media_type='application/json')
+
+
 # Helper functions
 def pre_viga(vao_viga):
-    if vao_viga < 4:
-        base_viga = 150
-    elif vao_viga < 6:
-        base_viga = 190
-    else:
-        base_viga = 240
-    return str(base_viga) + ' x ' + str(int(max(base_viga, vao_viga * 1000 / 10)))
+    return formatar_secao_viga(*secao_viga(vao_viga))
+
+def pre_pilar(secao_viga):
+    # Simplified example, you can add pillar calculation logic here
+    return '200 x 300'
+
+def texto_resultados(resultado):
+    return (
+        f'Resultados Finais:\n'
+        f'- Laje: **{resultado.secao_laje} mm** ({resultado.tipo_laje})\n'
+        f'- Viga: **{resultado.secao_viga}** ({resultado.tipo_viga})\n'
+        f'- Pilar: **{resultado.secao_pilar}** ({resultado.tipo_pilar})'
+    )
+
+async def build_model(material_type, num_floors, thickness, lod='full', grid_x=None, grid_y=None, area=None):
+    # Repeated parameters are served from the cache instead of rebuilding and re-exporting the GLB
+    model_id = model_cache.lookup(material_type, num_floors, thickness, lod, grid_x, grid_y, area)
+    if model_id is None:
+        # Build and export in the worker pool so the event loop stays free for other sessions
+        key = model_cache.normalize_key(material_type, num_floors, thickness, lod, grid_x, grid_y, area)
+        glb_bytes = await worker_pool.submit(render_model, model_cache.generator, key)
+        if glb_bytes:
+            model_id = model_cache.put(key, glb_bytes)
+    return model_id
+
+async def reserve_model_stream(material_type, num_floors, thickness, plan):
+    """
+    Reserva um ID para o modelo completo ser gerado em streaming na primeira requisição a /model.
+
+    The GLB size (the Content-Length of the stream) is computed in the worker pool.
+
+    Returns:
+    - str: The stream ID (derived from the parameters and MODEL_CODE_VERSION, so equal requests share it).
+    - None: If streaming is off, the model is already cached or smaller than MODEL_STREAM_MIN_BYTES.
+    """
+    if not MODEL_STREAM_MIN_BYTES or MODEL_EXPORT_MODE != 'instanced':
+        return None
+    key = model_cache.normalize_key(material_type, num_floors, thickness, 'full', *plan)
+    if model_cache.lookup(*key) is not None:
+        return None
+    size = await worker_pool.submit(stream_size, *key)
+    if size < MODEL_STREAM_MIN_BYTES:
+        return None
+    stream_id = content_id(repr(('stream', MODEL_EXPORT_MODE, MODEL_CODE_VERSION, key)).encode('utf-8'))
+    model_streams[stream_id] = key, size
+    model_streams.move_to_end(stream_id)
+    while len(model_streams) > MODEL_STREAM_PENDING_MAX:
+        model_streams.popitem(last=False)
+    return stream_id
 
 # Function to update model-viewer src (now updates the content of the ui.html element)
-async def update_model_viewer_src(model_id):
-    global model_viewer_html_element
-    model_url = f'/model/{model_id}.glb?t={time.time()}' # Add timestamp to bust cache
+async def update_model_viewer_src(sessao, model_id):
+    model_url = f'/model/{model_id}.glb' # Content-addressed ID: a new model always has a new URL
 
-    if model_viewer_html_element:
-        model_viewer_html_element.clear()
-        with model_viewer_html_element as scene:
+    if sessao.model_viewer:
+        sessao.modelo_cena.clear()  # Also drops the scene graph of a building drawn before
+        with sessao.model_viewer as scene:
             scene.gltf(model_url).scale(0.5)
 
 # Main interface
+# --- Live Recomputation ---
+# Input edits recompute only the stages that read them, after this many seconds without further edits
+FLOW_DEBOUNCE = float(os.environ.get('FLOW_DEBOUNCE', 0.4))
+
+# Resultado fields filled by the 'resultado' stage, in the order of its inputs
+CAMPOS_RESULTADO = ('tipo_laje', 'area', 'pavimentos', 'coberturas', 'grid_x', 'grid_y',
+                    'tipo_viga', 'gama_viga', 'gama_viga_cob', 'base_viga_cob', 'altura_viga_cob',
+                    'tipo_pilar', 'gama_pilar', 'secao_laje', 'secao_viga', 'secao_pilar')
+
+def criar_fluxo(sessao):
+    """
+    Monta o fluxo de cálculo da sessão: laje → viga → pilar → resultados, modelo 3D e gráficos.
+
+    Each panel field is an input of the flow (see `ligar_entradas`). Sections are memoized
+    pure stages; 'resultado' fills the session record and the results text; 'modelo' and
+    'graficos' redraw the 3D view and the charts while the automatic update switch is on.
+    A beam-only edit, for instance, rewrites the results text without touching the model.
+    """
+    fluxo = Dataflow(debounce=FLOW_DEBOUNCE)
+    fluxo.stage('secao_laje', lambda grid_x, grid_y: float(secao_laje(grid_x, grid_y)), ('grid_x', 'grid_y'))
+    fluxo.stage('secao_viga', lambda grid_x, grid_y: pre_viga(max(grid_x, grid_y)), ('grid_x', 'grid_y'))
+    fluxo.stage('secao_pilar', pre_pilar, ('secao_viga',))
+    fluxo.stage('resultado', partial(atualizar_resultado, sessao), CAMPOS_RESULTADO, memoize=0)
+    fluxo.stage('modelo', partial(atualizar_modelo, sessao),
+                ('automatico', 'tipo_laje', 'pavimentos', 'secao_laje', 'grid_x', 'grid_y', 'area'), memoize=0)
+    fluxo.stage('graficos', partial(atualizar_graficos, sessao), ('automatico', 'tipo_laje'), memoize=0)
+    return fluxo
+
+def ligar_entradas(sessao, **campos):
+    # Current values seed the flow; later edits schedule a (debounced) recomputation
+    sessao.entradas.update(campos)
+    sessao.fluxo.seed(**{nome: campo.value for nome, campo in campos.items()})
+    for nome, campo in campos.items():
+        campo.on_value_change(lambda e, nome=nome: sessao.fluxo.set(**{nome: e.value}))
+
+def atualizar_resultado(sessao, *valores):
+    resultado = sessao.resultado(create=True)
+    for campo, valor in zip(CAMPOS_RESULTADO, valores):
+        setattr(resultado, campo, valor)
+    sessao.resultado_text.set_text(texto_resultados(resultado))
+
+async def atualizar_modelo(sessao, automatico, *_):
+    if automatico:
+        with sessao.model_viewer:  # The flow runs in its own task: give ui.notify this client
+            await gerar_modelo_3d(sessao, notificar=False)
+
+async def atualizar_graficos(sessao, automatico, *_):
+    if automatico:
+        with sessao.graficos:
+            await gerar_graficos(sessao, notificar=False)
+
+async def liberar_sessao(client):
+    # Scheduled by the disconnect handlers, so it runs after NiceGUI deletes a client that did not
+    # reconnect in time; a page whose websocket only dropped for a moment keeps its session
+    if client.id in Client.instances:
+        return
+    sessao = sessions.release(client.id)
+    if sessao is not None and sessao.fluxo is not None:
+        sessao.fluxo.cancel()  # Drop a pending recomputation for a page that is gone
+
+app.on_disconnect(liberar_sessao)
+
+
 @ui.page('/')
-def main_page():
-    global tabs, model_viewer_html_element # Ensure access to the global ui.html element
+def main_page(client: Client):
+    # Each browser tab gets its own results and UI references instead of shared globals
+    sessions.prune(Client.instances)
+    sessao = sessions.get(client.id)
+    sessao.fluxo = criar_fluxo(sessao)
 
     with ui.header().classes('bg-blue-800 text-white shadow-lg'):
         ui.label('STAMADE - Análise Estrutural').classes('text-h4 font-bold tracking-wider')
@@ -254,41 +458,52 @@ def main_page():
                 laje_tab = ui.tab('Laje', icon='layers')
                 viga_tab = ui.tab('Viga', icon='horizontal_rule')
                 pilar_tab = ui.tab('Pilar', icon='vertical_align_center')
-            tabs = tabs_container # Assign to global tabs variable
+                otimizar_tab = ui.tab('Otimizar', icon='insights')
+            sessao.tabs = tabs_container
             
             with ui.tab_panels(tabs_container, value=laje_tab).classes('w-full'):
                 with ui.tab_panel(laje_tab):
-                    criar_painel_laje()
+                    criar_painel_laje(sessao)
                 
                 with ui.tab_panel(viga_tab):
-                    criar_painel_viga()
+                    criar_painel_viga(sessao)
                 
                 with ui.tab_panel(pilar_tab):
-                    criar_painel_pilar()
+                    criar_painel_pilar(sessao)
+
+                with ui.tab_panel(otimizar_tab):
+                    criar_painel_otimizacao(sessao)
         
         # Right panel - Results
         with ui.element('div').classes('right-panel'):
             with ui.column().classes('w-full h-full'): # Ensure column fills the height
-                criar_painel_resultados() # This creates results_text and chart_html
+                criar_painel_resultados(sessao) # This creates results_text and chart_html
                 
                 ui.separator().classes('my-4') # Separator between charts/text and model viewer
 
                 # This is the key change: create the ui.html element directly in the right panel
                 # It acts as a container for the model-viewer
-                # The model_viewer_html_element global variable holds a reference to this ui.html component
-                model_viewer_html_element = ui.scene().classes('w-full model-viewer-wrapper')
-                
-                # Initially render the model viewer with the default model
-                if initial_model_id:
-                    initial_model_url = f'/model/{initial_model_id}.glb?t={time.time()}'
-                    with model_viewer_html_element as scene:
-                        scene.gltf(initial_model_url).scale(0.5)
+                # The session keeps a reference to this scene so later updates reach this client only
+                model_viewer_html_element = sessao.model_viewer = ui.scene().classes('w-full model-viewer-wrapper')
+                sessao.modelo_cena = BuildingScene(model_viewer_html_element)
+
+                if SCENE_MAX_ELEMENTS:
+                    # The default building is a handful of boxes: draw it directly, no GLB download
+                    material_type, num_floors, thickness, _ = DEFAULT_MODEL_KEY
+                    sessao.modelo_cena.show(material_type, num_floors, thickness)
                 else:
-                    model_viewer_html_element.content = '<div class="text-gray-500 text-center">Modelo 3D não disponível. Tente gerar novamente.</div>'
+                    # Initially render the model viewer with the default model (prebaked, or built on the first page)
+                    initial_model_id = model_cache.get_or_generate(*DEFAULT_MODEL_KEY)
+                    if initial_model_id:
+                        initial_model_url = f'/model/{initial_model_id}.glb'
+                        with model_viewer_html_element as scene:
+                            scene.gltf(initial_model_url).scale(0.5)
+                    else:
+                        model_viewer_html_element.content = '<div class="text-gray-500 text-center">Modelo 3D não disponível. Tente gerar novamente.</div>'
 
 
 # Function to create slab panel
-def criar_painel_laje():
+def criar_painel_laje(sessao):
     with ui.column().classes('w-full gap-4'):
         ui.label('Configuração da Laje').classes('text-h5 font-semibold text-gray-800 mb-4')
         
@@ -316,13 +531,16 @@ def criar_painel_laje():
             pavimentos = ui.number(label='Número de Pavimentos', value=1, format='%d').classes('w-1/2 pr-2')
             coberturas = ui.number(label='Número de Coberturas', value=1, format='%d').classes('w-1/2 pl-2')
             
+        ligar_entradas(sessao, tipo_laje=tipo_laje, grid_x=grid_x, grid_y=grid_y, area=area,
+                       pavimentos=pavimentos, coberturas=coberturas)
+
         ui.button('Calcular Laje', on_click=lambda: executar_laje(
-            tipo_laje.value, grid_x.value, grid_y.value, gk.value, qk.value,
+            sessao,             tipo_laje.value, grid_x.value, grid_y.value, gk.value, qk.value,
             trrf.value, area.value, pavimentos.value, coberturas.value
         )).classes('w-full bg-green-600 text-white hover:bg-green-700 mt-4')
 
 # Function to create beam panel
-def criar_painel_viga():
+def criar_painel_viga(sessao):
     with ui.column().classes('w-full gap-4'):
         ui.label('Configuração da Viga').classes('text-h5 font-semibold text-gray-800 mb-4')
         
@@ -342,13 +560,16 @@ def criar_painel_viga():
             
         viga_cobertura_igual = ui.checkbox('Viga de Cobertura Igual a de Piso?', value=True).classes('w-full mt-2')
             
+        ligar_entradas(sessao, tipo_viga=tipo_viga, gama_viga=gama_viga, gama_viga_cob=gama_viga_cob,
+                       base_viga_cob=base_viga_cob, altura_viga_cob=altura_viga_cob)
+
         ui.button('Calcular Viga', on_click=lambda: executar_viga(
-            tipo_viga.value, gama_viga.value, gama_viga_cob.value, 
+            sessao,             tipo_viga.value, gama_viga.value, gama_viga_cob.value, 
             base_viga_cob.value, altura_viga_cob.value, viga_cobertura_igual.value
         )).classes('w-full bg-green-600 text-white hover:bg-green-700 mt-4')
 
 # Function to create pillar panel
-def criar_painel_pilar():
+def criar_painel_pilar(sessao):
     with ui.column().classes('w-full gap-4'):
         ui.label('Configuração do Pilar').classes('text-h5 font-semibold text-gray-800 mb-4')
         
@@ -357,208 +578,296 @@ def criar_painel_pilar():
         ui.separator()
         gama_pilar = ui.number(label='Gama Pilar (kg/m³)', value=550, format='%.0f').classes('w-full')
             
+        ligar_entradas(sessao, tipo_pilar=tipo_pilar, gama_pilar=gama_pilar)
+
         ui.button('Calcular Pilar', on_click=lambda: executar_pilar(
-            tipo_pilar.value, gama_pilar.value
+            sessao,             tipo_pilar.value, gama_pilar.value
         )).classes('w-full bg-green-600 text-white hover:bg-green-700 mt-4')
 
+# Function to create optimizer panel
+def criar_painel_otimizacao(sessao):
+    with ui.column().classes('w-full gap-4'):
+        ui.label('Otimização de Soluções').classes('text-h5 font-semibold text-gray-800 mb-4')
+        ui.label('Busca apenas os vãos do grid e o material de cada elemento para a área e o número de '
+                 'pavimentos da laje; as seções seguem as regras dos painéis de cálculo. Mostra as soluções '
+                 'não dominadas em custo, carbono e peso.').classes('text-gray-700')
+
+        ui.separator()
+        ui.label('Vãos do Grid Testados (m)').classes('text-lg font-medium text-gray-700')
+        with ui.row().classes('w-full justify-around no-wrap'):
+            grid_min = ui.number(label='Mínimo', value=GRID_MIN, format='%.2f', step=0.5).classes('w-1/3 pr-2')
+            grid_max = ui.number(label='Máximo', value=GRID_MAX, format='%.2f', step=0.5).classes('w-1/3 px-1')
+            grid_passo = ui.number(label='Passo', value=GRID_PASSO, format='%.2f', step=0.1).classes('w-1/3 pl-2')
+
+        ui.button('Buscar Soluções', on_click=lambda: otimizar_solucoes(
+            sessao, grid_min.value, grid_max.value, grid_passo.value
+        ), icon='insights').classes('w-full bg-green-600 text-white hover:bg-green-700 mt-4')
+
+        sessao.resumo_otimizacao = ui.label('').classes('text-gray-700')
+        sessao.grafico_pareto = ui.echart(pareto_options([])).classes('w-full').style('height: 320px')
+        colunas = [{'name': nome, 'label': rotulo, 'field': nome, 'sortable': True} for nome, rotulo in (
+            ('id', '#'), ('tipo_laje', 'Laje'), ('tipo_viga', 'Viga'), ('tipo_pilar', 'Pilar'), ('grid', 'Grid (m)'),
+            ('custo', 'Custo'), ('carbono', 'Carbono'), ('peso', 'Peso'))]
+        sessao.tabela_solucoes = ui.table(columns=colunas, rows=[], row_key='id', selection='single',
+                                          pagination=10).classes('w-full')
+
+        ui.button('Usar Solução Selecionada', on_click=lambda: usar_solucao(sessao),
+                  icon='check').classes('w-full bg-blue-600 text-white hover:bg-blue-700 mt-4')
+
 # Function to create results panel
-def criar_painel_resultados():
-    global resultado_text, resultado_grafico_html
+def criar_painel_resultados(sessao):
     
     with ui.column().classes('w-full results-section'): # Added results-section class for layout control
         ui.label('Resultados da Análise Estrutural').classes('text-h5 font-semibold text-gray-800 mb-4')
         
-        resultado_text = ui.label('Os resultados detalhados aparecerão aqui após os cálculos.').classes('text-gray-700 text-base leading-relaxed mb-4') # Added leading-relaxed
+        sessao.resultado_text = ui.label('Os resultados detalhados aparecerão aqui após os cálculos.').classes('text-gray-700 text-base leading-relaxed mb-4') # Added leading-relaxed
         
         ui.separator().classes('my-4')
 
         with ui.row().classes('w-full justify-evenly items-center mb-4'):
-            ui.button('Gerar Gráficos de Análise', on_click=gerar_graficos, icon='bar_chart').classes('bg-blue-600 text-white hover:bg-blue-700')
-            ui.button('Visualizar Modelo 3D', on_click=gerar_modelo_3d, icon='3d_rotation').classes('bg-purple-600 text-white hover:bg-purple-700')
+            ui.button('Gerar Gráficos de Análise', on_click=lambda: gerar_graficos(sessao), icon='bar_chart').classes('bg-blue-600 text-white hover:bg-blue-700')
+            ui.button('Visualizar Modelo 3D', on_click=lambda: gerar_modelo_3d(sessao), icon='3d_rotation').classes('bg-purple-600 text-white hover:bg-purple-700')
+        # With the switch on, edits to the inputs redraw the model and the charts by themselves
+        automatico = ui.switch('Atualizar modelo e gráficos ao editar', value=True).classes('w-full')
+        ligar_entradas(sessao, automatico=automatico)
         
-        resultado_grafico_html = ui.html('').classes('w-full flex justify-center mt-4')
+        sessao.resultado_grafico_html = ui.html('').classes('w-full flex justify-center mt-4')
+        sessao.graficos = ui.column().classes('w-full items-center mt-4')
         # The model_viewer_html_element is created in main_page, not here,
         # so it lives outside this specific card for better layout control.
 
 
+def mostrar_graficos_cliente(sessao, current_material_type):
+    """
+    Desenha os gráficos de análise no navegador: pizzas ECharts e o esquema estrutural em SVG.
+
+    Only the chart options (about 1.5 KB of JSON) go over the websocket; later calls just
+    replace the data of the existing chart instead of rendering a new image.
+    """
+    options = echart_options(*chart_series(current_material_type))
+    if sessao.grafico_echart is None:
+        with sessao.graficos:
+            sessao.grafico_echart = ui.echart(options).classes('w-full').style('height: 360px')
+            ui.html(schematic_svg()).classes('w-full flex justify-center')
+    else:
+        sessao.grafico_echart.options.clear()
+        sessao.grafico_echart.options.update(options)
+        sessao.grafico_echart.update()
+
 # Function to generate graphics
-async def gerar_graficos():
+async def gerar_graficos(sessao, notificar=True):
     try:
-        if not lista_resultados:
+        resultado = sessao.resultado()
+        if resultado is None:
             ui.notify('Por favor, execute os cálculos da laje, viga e pilar primeiro para gerar os gráficos.', color='negative', icon='warning')
             return
 
-        fig, axs = plt.subplots(2, 2, figsize=(12, 10), dpi=100)
-        
-        cores = ['#4CAF50', '#2196F3', '#FFC107'] # More pleasant colors
-        materiais = ['Madeira', 'Concreto', 'Aço']
-        
-        # Simulate costs, carbon, and weight based on calculated material types
-        custos = [10000, 15000, 20000]
-        carbono = [500, 1000, 1500]
-        peso = [1000, 2000, 3000]
-
-        # Try to get the calculated slab type for solution 0 to influence graph data
-        if lista_resultados: # Ensure lista_resultados is not empty
-            current_material_type = lista_resultados[0].get('Tipo Laje', 'Madeira')
-            if current_material_type == 'Madeira':
-                custos = [9000, 16000, 21000]
-                carbono = [400, 1100, 1600]
-                peso = [900, 2100, 3100]
-            elif current_material_type == 'Concreto':
-                custos = [18000, 12000, 19000]
-                carbono = [1200, 600, 1400]
-                peso = [2500, 1500, 2800]
-            elif current_material_type == 'Aço':
-                custos = [15000, 18000, 10000]
-                carbono = [1100, 1300, 500]
-                peso = [1800, 2200, 1200]
-
-        # Cost Chart
-        axs[0, 0].pie(custos, labels=materiais, autopct='%1.1f%%', startangle=90, colors=cores, wedgeprops={'edgecolor': 'black'})
-        axs[0, 0].set_title('Custo Estimado por Material', fontsize=14, fontweight='bold')
-        
-        # Carbon Chart
-        axs[0, 1].pie(carbono, labels=materiais, autopct='%1.1f%%', startangle=90, colors=cores, wedgeprops={'edgecolor': 'black'})
-        axs[0, 1].set_title('Pegada de Carbono por Material', fontsize=14, fontweight='bold')
-        
-        # Weight Chart
-        axs[1, 0].pie(peso, labels=materiais, autopct='%1.1f%%', startangle=90, colors=cores, wedgeprops={'edgecolor': 'black'})
-        axs[1, 0].set_title('Peso Total por Material', fontsize=14, fontweight='bold')
-        
-        # Simplified Structural Drawing
-        axs[1, 1].set_xlim(0, 10)
-        axs[1, 1].set_ylim(0, 6.2)
-        axs[1, 1].axis('off') # Hide axes for a cleaner look
-        
-        # Pillar
-        pilar_rect = patches.Rectangle((4.5, 0), 1, 5.0, facecolor='#607D8B', edgecolor='black', linewidth=1.5) # Dark gray
-        axs[1, 1].add_patch(pilar_rect)
-        axs[1, 1].text(5.0, 2.5, 'Pilar', ha='center', va='center', fontsize=12, color='white', fontweight='bold')
-        
-        # Beams
-        # Top left beam
-        axs[1, 1].add_patch(patches.Rectangle((2, 5), 2.5, 0.4, facecolor='#795548', edgecolor='black', linewidth=1.5)) # Brown
-        # Top right beam
-        axs[1, 1].add_patch(patches.Rectangle((6.5, 5), 2.5, 0.4, facecolor='#795548', edgecolor='black', linewidth=1.5)) # Brown
-        # Transversal beam (passing over the pillar)
-        axs[1, 1].add_patch(patches.Rectangle((2, 5.4), 6, 0.4, facecolor='#795548', edgecolor='black', linewidth=1.5)) # Brown
-        axs[1, 1].text(5, 5.2, 'Vigas', ha='center', va='center', fontsize=12, color='white', fontweight='bold')
-
-        # Slab
-        laje_rect = patches.Rectangle((1.5, 5.8), 7, 0.4, facecolor='#9E9E9E', edgecolor='black', linewidth=1.5) # Light gray
-        axs[1, 1].add_patch(laje_rect)
-        axs[1, 1].text(5.0, 6.0, 'Laje', ha='center', va='center', fontsize=12, color='black', fontweight='bold')
-        
-        axs[1, 1].set_title('Representação Estrutural Simplificada', fontsize=14, fontweight='bold')
-        
-        plt.tight_layout(pad=3.0) # Add padding to avoid cropping
-        
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight', facecolor='white', dpi=100)
-        buf.seek(0)
-        
-        image_id = str(uuid.uuid4())
-        in_memory_images[image_id] = buf.getvalue()
-        
-        image_url = f'/chart/{image_id}.png?t={time.time()}'
-        resultado_grafico_html.content = f'<img src="{image_url}" class="max-w-full h-auto" alt="Gráficos de Análise">'
+        current_material_type = resultado.tipo_laje or 'Madeira'
+        if CHART_MODE == 'client':
+            mostrar_graficos_cliente(sessao, current_material_type)
+            if notificar:
+                ui.notify('Gráficos gerados com sucesso!', color='positive', icon='check_circle')
+            return
+
+        # Charts only depend on their data series: repeat requests are a cache lookup
+        image_id = chart_cache.lookup(current_material_type)
+        if image_id is None:
+            # Render in the worker pool so other sessions keep responding while matplotlib runs
+            key = chart_cache.normalize_key(current_material_type)
+            image_id = chart_cache.put(key, await worker_pool.submit(render_charts_png, *key))
         
-        plt.close(fig)
+        image_url = f'/chart/{image_id}.png'
+        sessao.resultado_grafico_html.content = f'<img src="{image_url}" class="max-w-full h-auto" alt="Gráficos de Análise">'
         
-        ui.notify('Gráficos gerados com sucesso!', color='positive', icon='check_circle')
+        if notificar:
+            ui.notify('Gráficos gerados com sucesso!', color='positive', icon='check_circle')
         
+    except PoolBusy:
+        ui.notify('Servidor ocupado no momento. Tente gerar os gráficos novamente em instantes.', color='warning', icon='hourglass_empty')
     except Exception as e:
+        ERRORS.inc(source='gerar_graficos')
         ui.notify(f'Erro ao gerar gráficos: {str(e)}', color='negative', icon='error')
 
 # Function to generate 3D model
-async def gerar_modelo_3d():
+async def gerar_modelo_3d(sessao, notificar=True):
     try:
-        if not lista_resultados:
+        resultado = sessao.resultado()
+        if resultado is None:
             ui.notify('Por favor, execute os cálculos da laje, viga e pilar primeiro para gerar o modelo 3D.', color='negative', icon='warning')
             return
             
-        solucao = 0
         material_map = {'Madeira': 'wood', 'Concreto': 'concrete', 'Aço': 'steel'}
-        material_type = material_map.get(lista_resultados[solucao].get('Tipo Laje', 'Madeira'), 'wood')
-        num_floors = lista_resultados[solucao].get('Pavimentos', 1)
-        thickness = lista_resultados[solucao].get('Secao Laje', 200) / 1000 if 'Secao Laje' in lista_resultados[solucao] else 0.2
-        
-        glb_bytes = generate_with(material_type, num_floors, thickness, return_bytes=True)
+        material_type = material_map.get(resultado.tipo_laje or 'Madeira', 'wood')
+        num_floors = resultado.pavimentos or 1
+        thickness = resultado.secao_laje / 1000 if resultado.secao_laje is not None else 0.2
+        # Bay grid from the slab inputs: Grid X × Grid Y bays covering the floor area
+        plan = (resultado.grid_x, resultado.grid_y, resultado.area)
+        layout = floor_layout(*plan)
+        elementos = max(1, int(num_floors)) * story_elements(layout)
+        if elementos > MAX_ELEMENTS:
+            # Checked before anything is queued: with automatic updates every edit would start such a job
+            ui.notify(f'Modelo grande demais para gerar: {elementos} elementos (máximo {MAX_ELEMENTS}). '
+                      'Aumente os vãos do grid ou reduza a área ou os pavimentos.', color='warning', icon='warning')
+            return
 
-        if glb_bytes:
-            model_id = str(uuid.uuid4())
-            in_memory_models[model_id] = glb_bytes
+        if sessao.modelo_cena and elementos <= SCENE_MAX_ELEMENTS:
+            # Small buildings: diff the live scene graph instead of exporting and downloading a GLB
+            sessao.modelo_cena.show(material_type, num_floors, thickness, layout)
+            if notificar:
+                ui.notify('Modelo 3D gerado com sucesso!', color='positive', icon='3d_rotation')
+            return
+
+        if warm_cache is not None:
+            warm_cache.record(material_type, num_floors, thickness, *plan)
+        stream_id = await reserve_model_stream(material_type, num_floors, thickness, plan)
+        if stream_id:
+            # The browser receives the GLB while it is generated: no need for the intermediate tiers
+            await update_model_viewer_src(sessao, stream_id)
+            if notificar:
+                ui.notify('Modelo 3D gerado com sucesso!', color='positive', icon='3d_rotation')
+            return
 
-            await update_model_viewer_src(model_id)  # Update the model-viewer with the new model
+        if int(num_floors) >= PROGRESSIVE_MIN_FLOORS:
+            # Show the coarse envelope right away (a few boxes, built inline), then swap in
+            # the finer tiers as the worker pool finishes them
+            coarse_id = model_cache.get_or_generate(material_type, num_floors, thickness, 'coarse', *plan)
+            if coarse_id:
+                await update_model_viewer_src(sessao, coarse_id)
+            tiers = LOD_TIERS[1:]
+        else:
+            tiers = ('full',)
+
+        tasks = [asyncio.create_task(build_model(material_type, num_floors, thickness, lod, *plan)) for lod in tiers]
+        for task in tasks:
+            task.add_done_callback(lambda t: t.cancelled() or t.exception()) # Don't warn about unawaited failures
+        for index, task in enumerate(tasks[:-1]):
+            # Intermediate tiers are only shown if nothing finer has arrived in the meantime
+            tier_id = await task
+            finer_ready = any(t.done() and not t.cancelled() and t.exception() is None and t.result() for t in tasks[index + 1:])
+            if tier_id and not finer_ready:
+                await update_model_viewer_src(sessao, tier_id)
+        model_id = await tasks[-1]
+
+        if model_id:
+            await update_model_viewer_src(sessao, model_id)  # Update the model-viewer with the new model
             
-            ui.notify('Modelo 3D gerado com sucesso!', color='positive', icon='3d_rotation')
+            if notificar:
+                ui.notify('Modelo 3D gerado com sucesso!', color='positive', icon='3d_rotation')
         else:
+            ERRORS.inc(source='gerar_modelo_3d')
             ui.notify('Erro ao gerar modelo 3D: O modelo retornado é nulo.', color='negative', icon='error')
             
+    except PoolBusy:
+        ui.notify('Servidor ocupado no momento. Tente gerar o modelo 3D novamente em instantes.', color='warning', icon='hourglass_empty')
     except Exception as e:
+        ERRORS.inc(source='gerar_modelo_3d')
         ui.notify(f'Erro ao gerar modelo 3D: {str(e)}', color='negative', icon='error')
 
+# Function to search the design space
+async def otimizar_solucoes(sessao, grid_min, grid_max, grid_passo):
+    try:
+        # Floor area and floors as currently typed in the slab panel
+        area = sessao.fluxo.values.get('area') or 100
+        pavimentos = sessao.fluxo.values.get('pavimentos') or 1
+        if not grid_min or not grid_max or not grid_passo or grid_min <= 0 or grid_passo <= 0 or grid_max < grid_min:
+            ui.notify('Informe vãos mínimo e máximo positivos e um passo maior que zero.', color='negative', icon='warning')
+            return
+        grids = grids_entre(grid_min, grid_max, grid_passo)
+        if len(grids) > OTIMIZADOR_MAX_GRIDS:
+            ui.notify(f'Muitos vãos para testar ({len(grids)}); aumente o passo (máximo de {OTIMIZADOR_MAX_GRIDS}).', color='warning', icon='warning')
+            return
+
+        busca = await otimizar(area, pavimentos, grids, submit=worker_pool.submit)
+        sessao.solucoes = busca['solucoes']
+        sessao.resumo_otimizacao.set_text(
+            f"{len(sessao.solucoes)} solução(ões) não dominada(s) entre {busca['candidatos']:,} candidatas "
+            f"({busca['avaliados']:,} avaliadas após o descarte das geometrias dominadas).".replace(',', '.')
+            + (' Valores ilustrativos: a planilha de materiais não traz as taxas por m³ '
+               f"({', '.join(RATE_COLUMNS)})." if busca['ilustrativo'] else ''))
+        sessao.grafico_pareto.options.clear()
+        sessao.grafico_pareto.options.update(pareto_options(sessao.solucoes))
+        sessao.grafico_pareto.update()
+        sessao.tabela_solucoes.selected.clear()
+        sessao.tabela_solucoes.update_rows([
+            {**solucao, 'id': indice + 1, 'grid': f"{solucao['grid_x']:g} x {solucao['grid_y']:g}"}
+            for indice, solucao in enumerate(sessao.solucoes)])
+        ui.notify('Otimização concluída!', color='positive', icon='insights')
+
+    except PoolBusy:
+        ui.notify('Servidor ocupado no momento. Tente otimizar novamente em instantes.', color='warning', icon='hourglass_empty')
+    except Exception as e:
+        ERRORS.inc(source='otimizar_solucoes')
+        ui.notify(f'Erro na otimização: {str(e)}', color='negative', icon='error')
+
+# Function to apply an optimizer solution as the current one
+async def usar_solucao(sessao):
+    if not sessao.tabela_solucoes.selected:
+        ui.notify('Selecione uma solução na tabela primeiro.', color='negative', icon='warning')
+        return
+    solucao = sessao.solucoes[sessao.tabela_solucoes.selected[0]['id'] - 1]
+
+    # The solution goes into the panel fields, so the flow recomputes the results (sections
+    # included, by the rules the optimizer used) and later edits start from the chosen solution
+    for nome in ('tipo_laje', 'tipo_viga', 'tipo_pilar', 'grid_x', 'grid_y'):
+        if nome in sessao.entradas:
+            sessao.entradas[nome].set_value(solucao[nome])
+    sessao.fluxo.cancel()  # Apply now rather than after the debounce
+    await sessao.fluxo.run()
+    if not sessao.fluxo.values.get('automatico'):
+        await gerar_modelo_3d(sessao)  # Otherwise the flow has just redrawn it
+
 # Execution functions
-def executar_laje(tipo_laje, grid_x, grid_y, gk, qk, trrf, area, pavimentos, coberturas):
-    solucao = 0
-    if len(lista_resultados) <= solucao:
-        lista_resultados.append({})
+def executar_laje(sessao, tipo_laje, grid_x, grid_y, gk, qk, trrf, area, pavimentos, coberturas):
+    resultado = sessao.resultado(create=True)
     
-    vao_laje = min(grid_x, grid_y)
-    secao_laje = max(80, round(0.0286 * (vao_laje * 100), 0) * 10)
+    secao = float(secao_laje(grid_x, grid_y))
     
-    lista_resultados[solucao]['Tipo Laje'] = tipo_laje
-    lista_resultados[solucao]['Secao Laje'] = secao_laje
-    lista_resultados[solucao]['Area'] = area
-    lista_resultados[solucao]['Pavimentos'] = pavimentos
-    lista_resultados[solucao]['Coberturas'] = coberturas
-    lista_resultados[solucao]['Grid X'] = grid_x
-    lista_resultados[solucao]['Grid Y'] = grid_y
+    resultado.tipo_laje = tipo_laje
+    resultado.secao_laje = secao
+    resultado.area = area
+    resultado.pavimentos = pavimentos
+    resultado.coberturas = coberturas
+    resultado.grid_x = grid_x
+    resultado.grid_y = grid_y
     
-    ui.notify(f'Laje calculada com sucesso! Seção: **{secao_laje} mm**', color='positive', icon='check')
-    tabs.set_value('Viga') # Uses the tab name to change
+    ui.notify(f'Laje calculada com sucesso! Seção: **{secao} mm**', color='positive', icon='check')
+    sessao.tabs.set_value('Viga') # Uses the tab name to change
 
-def executar_viga(tipo_viga, gama_viga, gama_viga_cob, base_viga_cob, altura_viga_cob, viga_cobertura_igual):
-    solucao = 0
-    if len(lista_resultados) <= solucao or 'Secao Laje' not in lista_resultados[solucao]:
+def executar_viga(sessao, tipo_viga, gama_viga, gama_viga_cob, base_viga_cob, altura_viga_cob, viga_cobertura_igual):
+    resultado = sessao.resultado()
+    if resultado is None or resultado.secao_laje is None:
         ui.notify('Por favor, calcule a laje primeiro.', color='negative', icon='warning')
         return
     
-    vao_viga = max(lista_resultados[solucao]['Grid X'], lista_resultados[solucao]['Grid Y'])
+    vao_viga = max(resultado.grid_x, resultado.grid_y)
     secao_viga = pre_viga(vao_viga)
     
-    lista_resultados[solucao]['Tipo Viga'] = tipo_viga
-    lista_resultados[solucao]['Secao Viga'] = secao_viga
-    lista_resultados[solucao]['Gama Viga'] = gama_viga
-    lista_resultados[solucao]['Gama Viga Cobertura'] = gama_viga_cob
-    lista_resultados[solucao]['Base Viga Cobertura'] = base_viga_cob
-    lista_resultados[solucao]['Altura Viga Cobertura'] = altura_viga_cob
+    resultado.tipo_viga = tipo_viga
+    resultado.secao_viga = secao_viga
+    resultado.gama_viga = gama_viga
+    resultado.gama_viga_cob = gama_viga_cob
+    resultado.base_viga_cob = base_viga_cob
+    resultado.altura_viga_cob = altura_viga_cob
     
     ui.notify(f'Viga calculada com sucesso! Seção: **{secao_viga}**', color='positive', icon='check')
-    tabs.set_value('Pilar') # Uses the tab name to change
+    sessao.tabs.set_value('Pilar') # Uses the tab name to change
 
-def executar_pilar(tipo_pilar, gama_pilar):
-    solucao = 0
-    if len(lista_resultados) <= solucao or 'Secao Viga' not in lista_resultados[solucao]:
+def executar_pilar(sessao, tipo_pilar, gama_pilar):
+    resultado = sessao.resultado()
+    if resultado is None or resultado.secao_viga is None:
         ui.notify('Por favor, calcule a laje e a viga primeiro.', color='negative', icon='warning')
         return
     
-    # Simplified example, you can add pillar calculation logic here
-    secao_pilar = '200 x 300'
+    secao_pilar = pre_pilar(resultado.secao_viga)
     
-    lista_resultados[solucao]['Tipo Pilar'] = tipo_pilar
-    lista_resultados[solucao]['Secao Pilar'] = secao_pilar
-    lista_resultados[solucao]['Gama Pilar'] = gama_pilar
+    resultado.tipo_pilar = tipo_pilar
+    resultado.secao_pilar = secao_pilar
+    resultado.gama_pilar = gama_pilar
     
     # Update result text
-    resultado_text.set_text(
-        f'Resultados Finais:\n'
-        f'- Laje: **{lista_resultados[solucao]["Secao Laje"]} mm** ({lista_resultados[solucao]["Tipo Laje"]})\n'
-        f'- Viga: **{lista_resultados[solucao]["Secao Viga"]}** ({lista_resultados[solucao]["Tipo Viga"]})\n'
-        f'- Pilar: **{secao_pilar}** ({lista_resultados[solucao]["Tipo Pilar"]})'
-    )
+    sessao.resultado_text.set_text(texto_resultados(resultado))
     ui.notify(f'Pilar calculado com sucesso! Seção: **{secao_pilar}**. Análise Completa!', color='positive', icon='done_all')
-    tabs.set_value('Laje') # Returns to the first tab or you can create a "Summary" tab
+    sessao.tabs.set_value('Laje') # Returns to the first tab or you can create a "Summary" tab
 
-ui.run(title='STAMADE - Análise Estrutural', dark=False)
\ No newline at end of file
+# PORT lets several instances run side by side behind a load balancer (with ARTIFACT_STORE=sqlite)
+ui.run(title='STAMADE - Análise Estrutural', dark=False, port=int(os.environ.get('PORT', 8080)))
\ No newline at end of file
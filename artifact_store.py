@@ -0,0 +1,461 @@
+import os
+import re
+import sqlite3
+import tempfile
+import time
+
+from cache import BlobStore
+
+
+class SQLiteBlobStore:
+    """
+    Armazenamento de blobs compartilhado entre processos em um arquivo SQLite.
+
+    Drop-in replacement for BlobStore (same put/get/stats/on_evict interface) for running
+    several app workers on one machine or a shared volume: an artifact generated by one
+    worker can be served by any other. Each store uses its own `namespace` inside the
+    database file, with its own byte budget, TTL and LRU eviction. Timestamps are wall-clock
+    so that every process agrees on expiry and recency. Hit and miss counters are per process.
+
+    Parameters:
+    - path (str): Database file; created on first use.
+    - namespace (str): Name separating this store's entries from other stores in the same file.
+    - max_bytes (int): Memory cap for all payloads in the namespace.
+    - ttl (float | None): Default time-to-live of an entry in seconds.
+    - on_evict (callable | None): Called with the key of every entry this process evicts or expires.
+    """
+
+    def __init__(self, path, namespace='default', max_bytes=64 * 1024 * 1024, ttl=None, on_evict=None):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        # One connection per process: connections must not be shared across a fork
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS blobs ('
+                ' namespace TEXT NOT NULL, key TEXT NOT NULL, data BLOB NOT NULL, size INTEGER NOT NULL,'
+                ' expires_at REAL, accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key))')
+            connection.execute('CREATE INDEX IF NOT EXISTS blobs_lru ON blobs (namespace, accessed_at)')
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    @property
+    def total_bytes(self):
+        row = self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM blobs WHERE namespace = ?', (self.namespace,)).fetchone()
+        return row[0]
+
+    def put(self, key, data, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        self.connection.execute(
+            'INSERT OR REPLACE INTO blobs (namespace, key, data, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (self.namespace, key, sqlite3.Binary(data), len(data), expires_at, now))
+        self._purge_expired(now)
+        self._evict(keep=key)
+        return key
+
+    def get(self, key):
+        now = time.time()
+        row = self.connection.execute(
+            'SELECT data, expires_at FROM blobs WHERE namespace = ? AND key = ?', (self.namespace, key)).fetchone()
+        if row is not None and row[1] is not None and row[1] <= now:
+            self._remove([key])
+            self.expirations += 1
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute(
+            'UPDATE blobs SET accessed_at = ? WHERE namespace = ? AND key = ?', (now, self.namespace, key))
+        return bytes(row[0])
+
+    def path(self, key):
+        return None  # Entries live inside the database, not as files
+
+    def stats(self):
+        entries, total = self.connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs WHERE namespace = ?', (self.namespace,)).fetchone()
+        return {
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def _purge_expired(self, now):
+        keys = [row[0] for row in self.connection.execute(
+            'SELECT key FROM blobs WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?',
+            (self.namespace, now))]
+        self._remove(keys)
+        self.expirations += len(keys)
+
+    def _evict(self, keep=None):
+        # Drop least recently used entries until the byte budget is met (never the newest one)
+        excess = self.total_bytes - self.max_bytes
+        if excess <= 0:
+            return
+        keys = []
+        for key, size in self.connection.execute(
+                'SELECT key, size FROM blobs WHERE namespace = ? AND key != ? ORDER BY accessed_at',
+                (self.namespace, keep)):
+            if excess <= 0:
+                break
+            keys.append(key)
+            excess -= size
+        self._remove(keys)
+        self.evictions += len(keys)
+
+    def _remove(self, keys):
+        if not keys:
+            return
+        self.connection.executemany(
+            'DELETE FROM blobs WHERE namespace = ? AND key = ?', [(self.namespace, key) for key in keys])
+        if self.on_evict:
+            for key in keys:
+                self.on_evict(key)
+
+    def __contains__(self, key):
+        row = self.connection.execute(
+            'SELECT expires_at FROM blobs WHERE namespace = ? AND key = ?', (self.namespace, key)).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+
+    def __len__(self):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM blobs WHERE namespace = ?', (self.namespace,)).fetchone()[0]
+
+
+# Keys become file names: content hashes plus an optional variant suffix, nothing path-like
+DISK_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9_.-]*$')
+
+
+class DiskBlobStore:
+    """
+    Diretório endereçado por conteúdo para artefatos grandes, com coleta de lixo por TTL e LRU.
+
+    Each entry is one file, `<directory>/<key[:2]>/<key><suffix>`, written atomically so
+    several processes can share the directory. A file's mtime is its creation time (for
+    the TTL) and its atime is refreshed on every read (for LRU); expired files are deleted
+    and the least recently read ones are removed once the directory exceeds `max_bytes`.
+    Entries can be served straight from disk through `path()`, without loading them into
+    the Python heap. The TTL is per store: the `ttl` argument of `put` is not supported here.
+
+    Listing the directory costs O(files), so it is done by `collect_garbage` only: after a
+    write that takes the running byte total over `max_bytes`, or once `sweep_interval`
+    seconds have passed since the last sweep. In between, writes and removals keep the
+    totals reported by `stats()` and `len()` up to date; files written by other processes
+    sharing the directory are picked up by the next sweep.
+
+    Parameters:
+    - directory (str): Root directory; created on first write.
+    - max_bytes (int): Disk budget for all files in the directory.
+    - ttl (float | None): Lifetime of a file in seconds (None disables expiry).
+    - suffix (str): File name extension (e.g. '.glb'). A store without one skips files carrying
+      the extension of another DiskBlobStore, in case both were pointed at the same directory.
+    - on_evict (callable | None): Called with the key of every file this process evicts or expires.
+    - sweep_interval (float): Seconds between sweeps while the directory stays within budget.
+    """
+
+    # Extensions used by the disk stores of this process
+    suffixes = set()
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024, ttl=None, suffix='', on_evict=None, sweep_interval=60.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.suffix = suffix
+        if suffix:
+            DiskBlobStore.suffixes.add(suffix)
+        self.on_evict = on_evict
+        self.sweep_interval = sweep_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._sizes = None  # key -> file size as of the last sweep plus later writes/removals; None until the first scan
+        self._total_bytes = 0
+        self._last_sweep = None
+
+    def file_path(self, key):
+        if not DISK_KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid artifact key '{key}'")
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def put(self, key, data, ttl=None):
+        path = self.file_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename it, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._written(key, len(data))
+        return key
+
+    def put_stream(self, key, chunks):
+        """
+        Repassa os blocos de `chunks` gravando-os no arquivo da entrada à medida que passam.
+
+        The file only appears (atomically) once every chunk went through; if the consumer
+        stops early (e.g. the HTTP client disconnected) the partial file is discarded.
+
+        Yields:
+        - bytes: The chunks, unchanged.
+        """
+        path = self.file_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+                size = f.tell()
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._written(key, size)
+
+    def path(self, key):
+        """
+        Retorna o caminho do arquivo da entrada (renovando seu uso para o LRU), ou None se não existir.
+        """
+        try:
+            path = self.file_path(key)
+            stat = os.stat(path)
+        except (ValueError, FileNotFoundError):
+            self.misses += 1
+            return None
+        now = time.time()
+        if self._is_expired(stat, now):
+            self._remove([(key, path)])
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(path, (now, stat.st_mtime))
+        except FileNotFoundError:
+            pass  # Collected by another process in the meantime; the caller handles the open failure
+        return path
+
+    def get(self, key):
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def stats(self):
+        sizes = self._known_sizes()
+        return {
+            'entries': len(sizes),
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def collect_garbage(self, keep=None):
+        """
+        Remove os arquivos expirados e, acima do orçamento, os lidos há mais tempo (nunca `keep`).
+
+        Also resynchronizes the running totals with the files actually in the directory.
+        """
+        now = time.time()
+        entries = []
+        expired = []
+        for key, path, stat in self._scan():
+            (expired if self._is_expired(stat, now) and key != keep else entries).append((key, path, stat))
+        self._sizes = {key: stat.st_size for key, _, stat in entries + expired}
+        self._total_bytes = sum(self._sizes.values())
+        self._last_sweep = time.monotonic()
+        self._remove([(key, path) for key, path, _ in expired])
+        self.expirations += len(expired)
+
+        excess = sum(stat.st_size for _, _, stat in entries) - self.max_bytes
+        evicted = []
+        for key, path, stat in sorted(entries, key=lambda entry: entry[2].st_atime):
+            if excess <= 0:
+                break
+            if key != keep:
+                evicted.append((key, path))
+                excess -= stat.st_size
+        self._remove(evicted)
+        self.evictions += len(evicted)
+
+    def _is_expired(self, stat, now):
+        return self.ttl is not None and stat.st_mtime + self.ttl <= now
+
+    def _known_sizes(self):
+        if self._sizes is None:
+            self.collect_garbage()
+        return self._sizes
+
+    def _written(self, key, size):
+        sizes = self._known_sizes()
+        self._total_bytes += size - sizes.get(key, 0)
+        sizes[key] = size
+        if self._total_bytes > self.max_bytes or time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.collect_garbage(keep=key)
+
+    def _scan(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        # Without a suffix of its own, files named after another store's are not this store's entries
+        foreign = ('.tmp',) if self.suffix else ('.tmp', *DiskBlobStore.suffixes)
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for item in os.scandir(shard.path):
+                if item.name.endswith(self.suffix) and not item.name.endswith(foreign):
+                    try:
+                        entries.append((item.name[:len(item.name) - len(self.suffix)], item.path, item.stat()))
+                    except FileNotFoundError:
+                        pass
+        return entries
+
+    def _remove(self, entries):
+        for key, path in entries:
+            if self._sizes is not None and key in self._sizes:
+                self._total_bytes -= self._sizes.pop(key)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # Already removed by another process
+            if self.on_evict:
+                self.on_evict(key)
+
+    def __contains__(self, key):
+        try:
+            stat = os.stat(self.file_path(key))
+        except (ValueError, FileNotFoundError):
+            return False
+        return not self._is_expired(stat, time.time())
+
+    def __len__(self):
+        return len(self._known_sizes())
+
+
+class SpillingStore:
+    """
+    Combina um armazenamento principal com um diretório em disco para os artefatos grandes.
+
+    Payloads of at least `threshold` bytes go to `spill` (a DiskBlobStore) and can be served
+    from their file through `path()`; smaller ones stay in `primary`.
+
+    Parameters:
+    - primary: Store for small payloads (BlobStore or SQLiteBlobStore).
+    - spill (DiskBlobStore): Store for large payloads.
+    - threshold (int): Size in bytes from which a payload is spilled to disk.
+
+    Raises:
+    - ValueError: If `primary` is a DiskBlobStore on the same directory as `spill`.
+    """
+
+    def __init__(self, primary, spill, threshold=1024 * 1024):
+        if isinstance(primary, DiskBlobStore) and os.path.realpath(primary.directory) == os.path.realpath(spill.directory):
+            raise ValueError(f"The spill directory '{spill.directory}' is also the primary store's directory")
+        self.primary = primary
+        self.spill = spill
+        self.threshold = threshold
+
+    @property
+    def on_evict(self):
+        return self.primary.on_evict
+
+    @on_evict.setter
+    def on_evict(self, callback):
+        self.primary.on_evict = callback
+        self.spill.on_evict = callback
+
+    def put(self, key, data, ttl=None):
+        target = self.spill if len(data) >= self.threshold else self.primary
+        return target.put(key, data, ttl)
+
+    def put_stream(self, key, chunks):
+        # Streamed payloads are large by construction: they go straight to the spill directory
+        return self.spill.put_stream(key, chunks)
+
+    def get(self, key):
+        if key in self.primary:
+            return self.primary.get(key)
+        return self.spill.get(key)
+
+    def path(self, key):
+        return None if key in self.primary else self.spill.path(key)
+
+    def stats(self):
+        primary, spill = self.primary.stats(), self.spill.stats()
+        stats = {name: primary[name] + spill[name] for name in primary if name != 'max_bytes'}
+        stats['max_bytes'] = primary['max_bytes']
+        stats['spilled_entries'] = spill['entries']
+        stats['spilled_bytes'] = spill['bytes']
+        stats['spill_max_bytes'] = spill['max_bytes']
+        return stats
+
+    def __contains__(self, key):
+        return key in self.primary or key in self.spill
+
+    def __len__(self):
+        return len(self.primary) + len(self.spill)
+
+
+ARTIFACT_BACKENDS = ('memory', 'sqlite', 'disk')
+
+
+def open_store(backend='memory', namespace='default', max_bytes=64 * 1024 * 1024, ttl=None, path='artifacts.sqlite3'):
+    """
+    Cria o armazenamento de artefatos (PNG/GLB) para o backend configurado.
+
+    Parameters:
+    - backend (str): 'memory' for a per-process BlobStore, 'sqlite' for a store shared by every worker using `path`,
+      'disk' for a content-addressed directory under `path` (one file per artifact).
+    - namespace (str): Store name inside the shared database, or subdirectory for 'disk' (ignored in memory).
+    - max_bytes (int): Byte budget of the store.
+    - ttl (float | None): Default time-to-live of an entry in seconds.
+    - path (str): SQLite database file for 'sqlite', root directory for 'disk'.
+
+    Raises:
+    - ValueError: If the backend is unknown.
+    """
+    if backend == 'memory':
+        return BlobStore(max_bytes=max_bytes, ttl=ttl)
+    if backend == 'sqlite':
+        return SQLiteBlobStore(path, namespace=namespace, max_bytes=max_bytes, ttl=ttl)
+    if backend == 'disk':
+        return DiskBlobStore(os.path.join(path, namespace), max_bytes=max_bytes, ttl=ttl)
+    raise ValueError(f"Unknown artifact store backend '{backend}'. Use one of: {', '.join(ARTIFACT_BACKENDS)}")
@@ -0,0 +1,28 @@
+"""
+Benchmark dos gráficos de análise: renderização do PNG (o trabalho de `gerar_graficos` numa falha
+de cache) e consulta ao cache de gráficos (o caminho de uma requisição repetida).
+"""
+from common import peak_memory_kb, record, time_call
+
+from cache import BlobStore, RenderCache
+from charts import MATERIAIS, chart_key, render_charts_png
+
+
+def run(quick=False, repeats=5):
+    results = []
+    cache = RenderCache(render_charts_png, store=BlobStore(), key_func=chart_key)
+    for material in MATERIAIS[:1] if quick else MATERIAIS:
+        key = chart_key(material)
+        timing, png = time_call(lambda: render_charts_png(*key), repeats=repeats)
+        results.append(record('chart_render', {'material': material}, **timing,
+                              peak_mem_kb=peak_memory_kb(lambda: render_charts_png(*key)), png_bytes=len(png)))
+
+        cache.get_or_render(material)
+        timing, _ = time_call(lambda: cache.lookup(material), repeats=max(repeats, 100))
+        results.append(record('chart_cache_lookup', {'material': material}, **timing))
+    return results
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(run(quick=True), indent=2))
@@ -0,0 +1,90 @@
+"""
+Benchmark de vazão dos endpoints /model e /chart através de um cliente ASGI em processo (sem rede).
+
+The app is imported in a child process that is not the main process, so `ui.run` returns
+without starting a server; requests go straight to the FastAPI app through httpx.
+"""
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from common import ROOT, percentile, record
+
+
+async def measure_throughput(client, path, requests, concurrency, headers=None):
+    latencies = []
+    statuses = set()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses.add(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {'requests_per_s': round(requests / elapsed, 1), 'p50_ms': round(percentile(latencies, 0.5), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3), 'status': sorted(statuses)}
+
+
+async def run_requests(requests, concurrency):
+    import httpx
+
+    import app as app_module
+
+    small_id = app_module.model_cache.get_or_generate('wood', 1, 0.2)
+    large_id = app_module.model_cache.get_or_generate('steel', 1000, 0.2)
+    chart_id = app_module.chart_cache.get_or_render('Madeira')
+    cases = [
+        ('model', {'size': 'small'}, f'/model/{small_id}.glb', None),
+        ('model', {'size': 'large_spilled'}, f'/model/{large_id}.glb', None),
+        ('model', {'size': 'large_spilled', 'variant': 'quantized'}, f'/model/{large_id}.glb?variant=quantized', None),
+        ('model', {'size': 'large_spilled', 'conditional': True}, f'/model/{large_id}.glb', {'If-None-Match': f'"{large_id}"'}),
+        ('chart', {'material': 'Madeira'}, f'/chart/{chart_id}.png', None),
+    ]
+
+    results = []
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        for benchmark, params, path, headers in cases:
+            await client.get(path, headers=headers)  # Warm up (builds the quantized variant once)
+            metrics = await measure_throughput(client, path, requests, concurrency, headers)
+            params = {**params, 'concurrency': concurrency}
+            results.append(record(f'endpoint_{benchmark}', params, **metrics))
+    app_module.worker_pool.shutdown()
+    return results
+
+
+def child(queue, requests, concurrency, spill_dir):
+    os.chdir(ROOT)
+    os.environ.update({'CHART_PRERENDER': '0', 'MODEL_SPILL_DIR': spill_dir, 'MODEL_SPILL_BYTES': str(64 * 1024)})
+    try:
+        queue.put(asyncio.run(run_requests(requests, concurrency)))
+    except BaseException as e:
+        queue.put(e)
+        raise
+
+
+def run(quick=False, requests=None, concurrency=16):
+    requests = requests or (100 if quick else 1000)
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    with tempfile.TemporaryDirectory() as spill_dir:
+        # Any process name other than MainProcess makes ui.run return instead of serving
+        process = context.Process(target=child, args=(queue, requests, concurrency, spill_dir), name='benchmark')
+        process.start()
+        results = queue.get()
+        process.join()
+    if isinstance(results, BaseException):
+        raise results
+    return results
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(run(quick=True), indent=2))
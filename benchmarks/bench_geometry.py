@@ -0,0 +1,41 @@
+"""
+Benchmark de geometria e exportação: tempo, pico de memória e tamanho do GLB de `generate_with`.
+"""
+from common import peak_memory_kb, record, time_call
+
+from building_model import generate_with
+
+FLOORS = (1, 10, 100, 500, 1000)
+QUICK_FLOORS = (1, 10, 100)
+MATERIALS = ('wood', 'steel', 'concrete')
+EXPORT_MODES = ('mesh', 'instanced')
+# Multi-bay plan: 5 x 5 m bays over 2500 m² (10 x 10 bays, 342 elements per story)
+GRID_PLAN = {'grid_x': 5.0, 'grid_y': 5.0, 'area': 2500.0}
+GRID_FLOORS = (1, 10, 100)
+
+
+def run(quick=False, repeats=5):
+    results = []
+    for export_mode in EXPORT_MODES:
+        for material in MATERIALS:
+            for floors in QUICK_FLOORS if quick else FLOORS:
+                def generate():
+                    return generate_with(material, floors, 0.2, return_bytes=True, export_mode=export_mode)
+                timing, glb_bytes = time_call(generate, repeats=repeats)
+                results.append(record(
+                    'generate_with', {'export_mode': export_mode, 'material': material, 'floors': floors},
+                    **timing, peak_mem_kb=peak_memory_kb(generate), glb_bytes=len(glb_bytes)))
+
+        for floors in GRID_FLOORS[:2] if quick else GRID_FLOORS:
+            def generate():
+                return generate_with('wood', floors, 0.2, return_bytes=True, export_mode=export_mode, **GRID_PLAN)
+            timing, glb_bytes = time_call(generate, repeats=repeats)
+            results.append(record(
+                'generate_with', {'export_mode': export_mode, 'material': 'wood', 'floors': floors, **GRID_PLAN},
+                **timing, peak_mem_kb=peak_memory_kb(generate), glb_bytes=len(glb_bytes)))
+    return results
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(run(quick=True), indent=2))
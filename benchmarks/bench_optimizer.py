@@ -0,0 +1,33 @@
+"""
+Benchmark do otimizador: enumeração e poda das geometrias, pontuação vetorizada e fronteira de Pareto.
+
+Searches run inline (no worker pool), so the numbers are the CPU cost of one search.
+"""
+import asyncio
+
+from common import peak_memory_kb, record, time_call
+
+from optimizer import espaco_de_projeto, grids_entre, otimizar
+
+# (area m², floors, grid step m): the default search and a fine one
+SEARCHES = ((100, 1, 0.5), (2500, 10, 0.5), (2500, 10, 0.05))
+
+
+def run(quick=False, repeats=5):
+    results = []
+    for area, floors, step in SEARCHES[:2] if quick else SEARCHES:
+        grids = grids_entre(passo=step)
+        params = {'area': area, 'floors': floors, 'grid_step': step}
+        timing, _ = time_call(lambda: espaco_de_projeto(area, floors, grids), repeats=repeats)
+        results.append(record('optimizer_design_space', params, **timing))
+
+        search = lambda: asyncio.run(otimizar(area, floors, grids))
+        timing, found = time_call(search, repeats=repeats)
+        results.append(record('optimizer_search', params, **timing, peak_mem_kb=peak_memory_kb(search),
+                              candidates=found['candidatos'], scored=found['avaliados'], front=len(found['solucoes'])))
+    return results
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(run(quick=True), indent=2))
@@ -0,0 +1,115 @@
+"""
+Utilitários compartilhados pelos benchmarks: medição de tempo e memória e o formato dos resultados.
+
+Every benchmark returns a list of records {"benchmark", "params", "metrics"}; `run.py`
+wraps them with run metadata and compares them against a previous results file.
+"""
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def record(benchmark, params, **metrics):
+    return {'benchmark': benchmark, 'params': params, 'metrics': metrics}
+
+
+def time_call(function, repeats=5, warmup=1):
+    """
+    Mede o tempo de `function()` em milissegundos.
+
+    Returns:
+    - tuple(dict, object): ({'median_ms', 'min_ms', 'max_ms'}, last return value).
+    """
+    result = None
+    for _ in range(warmup):
+        result = function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': round(statistics.median(timings), 3), 'min_ms': round(min(timings), 3),
+            'max_ms': round(max(timings), 3)}, result
+
+
+def peak_memory_kb(function):
+    """
+    Mede o pico de memória alocada (Python e NumPy, via tracemalloc) durante `function()`, em KiB.
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def metadata():
+    """
+    Retorna o contexto da execução (commit, versões, máquina) gravado junto dos resultados.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import numpy
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def record_id(entry):
+    params = ','.join(f'{name}={value}' for name, value in sorted(entry['params'].items()))
+    return f"{entry['benchmark']}[{params}]"
+
+
+def lower_is_better(metric):
+    return not metric.endswith('_per_s')
+
+
+def compare(results, baseline, threshold=1.25, min_ms=1.0):
+    """
+    Compara resultados com uma execução anterior e lista as métricas que pioraram além de `threshold`.
+
+    Timings below `min_ms` in both runs are ignored (too noisy to judge); sizes and counts are
+    compared exactly against the threshold.
+
+    Returns:
+    - list(dict): One entry per regression with the record ID, metric, baseline and current value.
+    """
+    previous = {record_id(entry): entry['metrics'] for entry in baseline['results']}
+    regressions = []
+    for entry in results['results']:
+        old_metrics = previous.get(record_id(entry))
+        if old_metrics is None:
+            continue
+        for metric, value in entry['metrics'].items():
+            old = old_metrics.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old <= 0:
+                continue
+            if metric.endswith('_ms') and max(value, old) < min_ms:
+                continue
+            ratio = value / old if lower_is_better(metric) else old / max(value, 1e-12)
+            if ratio > threshold:
+                regressions.append({'record': record_id(entry), 'metric': metric, 'baseline': old,
+                                    'current': value, 'ratio': round(ratio, 2)})
+    return regressions
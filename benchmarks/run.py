@@ -0,0 +1,64 @@
+"""
+Executa a suíte de benchmarks e grava os resultados em JSON.
+
+Covers generate_with time/memory/GLB size (floors 1 to 1000, every material and export
+mode), chart rendering and chart cache lookups, /model and /chart throughput through an
+in-process ASGI client, and design-space optimizer searches. With --baseline, metrics
+that got worse than --threshold times the baseline are listed and the exit status is 1,
+so a regression fails the build.
+
+Usage:
+    python benchmarks/run.py --output benchmarks/results.json
+    python benchmarks/run.py --quick --baseline benchmarks/results.json
+"""
+import argparse
+import json
+import sys
+
+import bench_charts
+import bench_endpoints
+import bench_geometry
+import bench_optimizer
+from common import compare, metadata
+
+SUITES = {
+    'geometry': bench_geometry.run,
+    'charts': bench_charts.run,
+    'endpoints': bench_endpoints.run,
+    'optimizer': bench_optimizer.run,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='STAMADE benchmark suite')
+    parser.add_argument('--quick', action='store_true', help='Fewer floors, materials and requests')
+    parser.add_argument('--only', choices=sorted(SUITES), action='append', help='Run only these suites')
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    parser.add_argument('--baseline', help='Previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Allowed slowdown/growth ratio (default 1.25)')
+    args = parser.parse_args()
+
+    results = {'meta': {**metadata(), 'quick': args.quick}, 'results': []}
+    for name in args.only or SUITES:
+        print(f'Running {name} benchmarks...', file=sys.stderr)
+        results['results'].extend(SUITES[name](quick=args.quick))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), threshold=args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['record']} {regression['metric']}: "
+                  f"{regression['baseline']} -> {regression['current']} (x{regression['ratio']})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark de inicialização: tempo de import dos módulos e latência das primeiras requisições.
+
+Starts `python app.py` in a fresh process, once with the prebaked artifacts and once
+without, and records the time until `/` first answers plus the latency of the first
+/model and /chart requests. Results are printed as JSON (and written to --output).
+
+Usage: python benchmarks/startup.py [--port 8765] [--repeats 3] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Modules imported by app.py, in import order
+APP_MODULES = ('nicegui', 'artifact_store', 'building_model', 'cache', 'charts', 'glb',
+               'http_cache', 'prebake', 'session', 'sizing', 'workers')
+
+IMPORT_SCRIPT = '''
+import importlib, json, time
+timings = {}
+start = time.perf_counter()
+for name in %r:
+    t = time.perf_counter()
+    importlib.import_module(name)
+    timings[name] = (time.perf_counter() - t) * 1000
+timings['total'] = (time.perf_counter() - start) * 1000
+print(json.dumps(timings))
+'''
+
+
+def measure_imports(repeats):
+    """
+    Mede o tempo de import de cada módulo do app em processos novos (mediana de `repeats`).
+    """
+    runs = []
+    env = {**os.environ, 'MATPLOTLIB': 'false'}
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT % (APP_MODULES,)],
+                                cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output))
+    return {name: round(statistics.median(run[name] for run in runs), 1) for name in runs[0]}
+
+
+def timed_get(url, timeout=60):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, round((time.perf_counter() - start) * 1000, 1)
+
+
+def measure_server(port, prebaked_dir, model_id, chart_id, timeout=120):
+    """
+    Inicia o app, espera a primeira resposta de `/` e mede as primeiras requisições de modelo e gráfico.
+    """
+    env = {**os.environ, 'PORT': str(port), 'PREBAKED_DIR': prebaked_dir, 'PYTHONUNBUFFERED': '1'}
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd=ROOT, env=env, start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f'http://127.0.0.1:{port}'
+        while True:
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f'app did not answer within {timeout} s')
+            try:
+                status, first_page_ms = timed_get(base + '/')
+                if status == 200:
+                    break
+            except OSError:
+                time.sleep(0.05)
+        result = {'time_to_first_response_ms': round((time.perf_counter() - start) * 1000, 1),
+                  'first_page_ms': first_page_ms}
+        for name, path in (('model', f'/model/{model_id}.glb'), ('chart', f'/chart/{chart_id}.png')):
+            status, latency = timed_get(base + path)
+            result[f'first_{name}_status'] = status
+            result[f'first_{name}_ms'] = latency
+            result[f'second_{name}_ms'] = timed_get(base + path)[1]
+        return result
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    from prebake import prebake
+
+    with tempfile.TemporaryDirectory() as prebaked_dir:
+        manifest = prebake(prebaked_dir, os.environ.get('MODEL_EXPORT_MODE', 'instanced'))
+        model_id = manifest['models'][0]['file'].split('.')[0]
+        chart_id = manifest['charts'][0]['file'].split('.')[0]
+        results = {
+            'python': sys.version.split()[0],
+            'imports_ms': measure_imports(args.repeats),
+            'server_prebaked': measure_server(args.port, prebaked_dir, model_id, chart_id),
+            'server_cold': measure_server(args.port, os.path.join(prebaked_dir, 'missing'), model_id, chart_id),
+        }
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
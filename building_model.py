@@ -1,148 +1,628 @@
-import trimesh
+import math
 import numpy as np
 import os
-import time
 import sys
 import traceback
-import io # Import io for handling bytes in memory
 
-def generate_with(material_type='wood', num_floors=1, floor_slab_thickness_param=0.2, return_bytes=False):
+from artifact_store import DiskBlobStore
+from cache import content_id
+from glb import ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER, GLBBuilder, index_array
+from metrics import ERRORS, STAGE_SECONDS
+
+# --- Building Dimensions ---
+# Core dimensions of a single story and its structural elements (meters)
+FLOOR_WIDTH = 4.0   # Width of the building floor
+FLOOR_DEPTH = 4.0   # Depth of the building floor
+COLUMN_DIM = 0.3    # Side length of square columns
+BEAM_HEIGHT = 0.3   # Height of beams
+BEAM_WIDTH = 0.3    # Width of beams
+STORY_HEIGHT = 3.0  # Total height of one story (from floor to floor above)
+
+# --- Levels of Detail ---
+LOD_TIERS = ('coarse', 'medium', 'full') # From fastest to load to most detailed
+COARSE_MAX_BLOCKS = 32 # Upper bound on the number of boxes in the coarse envelope
+
+# --- Model Files ---
+# Models saved to disk (return_bytes=False) go to a content-addressed directory with an age and
+# size budget, so repeated exports share one file and old ones are garbage-collected
+MODEL_FILE_DIR = os.path.join('static', 'models')
+model_files = DiskBlobStore(MODEL_FILE_DIR, max_bytes=256 * 1024 * 1024, ttl=7 * 24 * 60 * 60, suffix='.glb')
+
+# --- Unit Box Template ---
+# Same vertex order and triangle winding as trimesh.creation.box(), centered at the origin
+UNIT_BOX_VERTICES = np.array([
+    [-0.5, -0.5, -0.5], [-0.5, -0.5, 0.5], [-0.5, 0.5, -0.5], [-0.5, 0.5, 0.5],
+    [0.5, -0.5, -0.5], [0.5, -0.5, 0.5], [0.5, 0.5, -0.5], [0.5, 0.5, 0.5],
+], dtype=np.float64)
+UNIT_BOX_FACES = np.array([
+    [1, 3, 0], [4, 1, 0], [0, 3, 2], [2, 4, 0], [1, 7, 3], [5, 1, 4],
+    [5, 7, 1], [3, 7, 2], [6, 4, 2], [2, 7, 6], [6, 5, 4], [7, 5, 6],
+], dtype=np.int64)
+
+
+# --- Structural Grid ---
+# A floor plan is (grid_x, grid_y, bays_x, bays_y): bays_x by bays_y bays of grid_x by grid_y meters
+DEFAULT_LAYOUT = (FLOOR_WIDTH, FLOOR_DEPTH, 1, 1)
+CHUNK_MAX_BOXES = 16384 # Boxes generated (and exported) per chunk of floors
+# Upper bound on the elements of a building (floors × story_elements): a 0.6 m grid over a
+# large area would otherwise produce a GLB of hundreds of MB and keep a worker busy for minutes
+MAX_ELEMENTS = int(os.environ.get('MODEL_MAX_ELEMENTS', 250_000))
+
+
+def floor_layout(grid_x=None, grid_y=None, area=None):
+    """
+    Retorna a planta (grid_x, grid_y, bays_x, bays_y) que cobre `area` com vãos de grid_x × grid_y.
+
+    The bays are arranged as close to a square as possible (bays_x >= bays_y), so the plan
+    covers at least `area`. Missing inputs fall back to the single 4 x 4 m bay.
+
+    Parameters:
+    - grid_x (float | None): Bay span along X in meters.
+    - grid_y (float | None): Bay span along Y in meters.
+    - area (float | None): Floor area in m² (one bay if omitted).
+
+    Returns:
+    - tuple(float, float, int, int): (grid_x, grid_y, bays_x, bays_y).
+    """
+    grid_x = max(COLUMN_DIM * 2, float(grid_x)) if grid_x else FLOOR_WIDTH
+    grid_y = max(COLUMN_DIM * 2, float(grid_y)) if grid_y else FLOOR_DEPTH
+    bays = max(1, math.ceil(float(area) / (grid_x * grid_y) - 1e-6)) if area else 1
+    bays_x = math.ceil(math.sqrt(bays))
+    return grid_x, grid_y, bays_x, math.ceil(bays / bays_x)
+
+
+def story_elements(layout):
+    """
+    Retorna quantos elementos `story_layout` gera por pavimento para a planta: laje, pilares e vigas.
+    """
+    _, _, bays_x, bays_y = layout
+    return 1 + (bays_x + 1) * (bays_y + 1) + bays_x * (bays_y + 1) + bays_y * (bays_x + 1)
+
+
+def check_building_size(num_floors, layout):
+    """
+    Verifica se o prédio cabe no limite MAX_ELEMENTS e retorna seu número de elementos.
+
+    Raises:
+    - ValueError: If floors × story_elements(layout) exceeds MAX_ELEMENTS.
+    """
+    elements = max(1, int(num_floors)) * story_elements(layout)
+    if elements > MAX_ELEMENTS:
+        raise ValueError(f'Building too large: {elements} elements, at most {MAX_ELEMENTS}')
+    return elements
+
+
+def column_lines(span, bays):
+    """
+    Retorna as coordenadas das linhas de pilares ao longo de um eixo, centradas na origem.
+
+    The outer lines are moved inward by half a column so the columns sit inside the slab.
+    """
+    lines = np.arange(bays + 1, dtype=np.float64) * span - bays * span / 2
+    lines[0] += COLUMN_DIM / 2
+    lines[-1] -= COLUMN_DIM / 2
+    return lines
+
+
+def story_layout(floor_slab_height, layout=DEFAULT_LAYOUT):
+    """
+    Retorna as dimensões e os centros locais dos elementos de um pavimento.
+
+    Order per story: the slab, one pillar at every grid intersection, the beams along every
+    X grid line, then the beams along every Y grid line (one beam per bay and line).
+    Centers are relative to the bottom of the story. The default single bay has 9 elements.
+
+    Parameters:
+    - floor_slab_height (float): Thickness of the slab in meters.
+    - layout (tuple): Floor plan (grid_x, grid_y, bays_x, bays_y), see `floor_layout`.
+
+    Returns:
+    - tuple(np.ndarray, np.ndarray): (extents, centers), both with shape (elements, 3).
+    """
+    grid_x, grid_y, bays_x, bays_y = layout
+    pillar_height = STORY_HEIGHT - floor_slab_height
+    pillar_z = floor_slab_height + pillar_height / 2
+    beam_z = STORY_HEIGHT - BEAM_HEIGHT / 2
+    # Reversed so the single bay keeps its original element order (+x+y, -x+y, +x-y, -x-y)
+    xs = column_lines(grid_x, bays_x)[::-1]
+    ys = column_lines(grid_y, bays_y)[::-1]
+
+    pillar_x, pillar_y = (grid.ravel() for grid in np.meshgrid(xs, ys))
+    # Beams run between consecutive columns, center to center
+    beam_x_center, beam_y_line = (grid.ravel() for grid in np.meshgrid((xs[:-1] + xs[1:]) / 2, ys))
+    beam_x_length = np.tile(np.abs(np.diff(xs)), len(ys))
+    beam_y_center, beam_x_line = (grid.ravel() for grid in np.meshgrid((ys[:-1] + ys[1:]) / 2, xs))
+    beam_y_length = np.tile(np.abs(np.diff(ys)), len(xs))
+
+    def elements(x, y, z):
+        return np.column_stack(np.broadcast_arrays(x, y, z))
+
+    extents = np.concatenate([
+        [[bays_x * grid_x, bays_y * grid_y, floor_slab_height]],
+        elements(COLUMN_DIM, COLUMN_DIM, np.full(len(pillar_x), pillar_height)),
+        elements(beam_x_length, BEAM_WIDTH, BEAM_HEIGHT),
+        elements(BEAM_WIDTH, beam_y_length, BEAM_HEIGHT),
+    ]).astype(np.float64)
+    centers = np.concatenate([
+        [[0, 0, floor_slab_height / 2]],
+        elements(pillar_x, pillar_y, pillar_z),
+        elements(beam_x_center, beam_y_line, beam_z),
+        elements(beam_x_line, beam_y_center, beam_z),
+    ]).astype(np.float64)
+    return extents, centers
+
+
+def building_groups(num_floors, floor_slab_height, lod='full', layout=DEFAULT_LAYOUT):
+    """
+    Descreve o prédio como grupos de caixas repetidos em várias elevações, sem expandi-los.
+
+    A group is a pattern of boxes (e.g. one story) plus the elevations it is repeated at, so
+    the whole building is a few small arrays whatever its size. `building_chunks` expands
+    the groups; the streaming GLB writer counts and emits each element type from them.
+
+    Parameters:
+    - num_floors (int): Number of floors for the building.
+    - floor_slab_height (float): Thickness of the floor slabs in meters.
+    - lod (str): Level of detail, one of LOD_TIERS:
+      'coarse' is an envelope of at most COARSE_MAX_BLOCKS boxes (one per block of floors),
+      'medium' keeps one slab per floor plus full-height columns at every grid intersection,
+      'full' is the complete structure (slab, pillars and beams on every floor).
+    - layout (tuple): Floor plan (grid_x, grid_y, bays_x, bays_y), see `floor_layout`.
+
+    Returns:
+    - list(tuple(np.ndarray, np.ndarray, np.ndarray)): (extents, centers, elevations) per group:
+      pattern box sizes and centers, shape (E, 3), and the z offsets it is placed at, shape (F,).
+    """
+    grid_x, grid_y, bays_x, bays_y = layout
+    ground = np.zeros(1)
+    if lod == 'coarse':
+        floors_per_block = -(-num_floors // COARSE_MAX_BLOCKS) # Ceiling division
+        block_start = np.arange(0, num_floors, floors_per_block)
+        block_floors = np.minimum(floors_per_block, num_floors - block_start)
+        heights = block_floors * STORY_HEIGHT
+        extents = np.column_stack([np.full(len(heights), bays_x * grid_x), np.full(len(heights), bays_y * grid_y), heights])
+        centers = np.column_stack([np.zeros(len(heights)), np.zeros(len(heights)), block_start * STORY_HEIGHT + heights / 2])
+        return [(extents.astype(np.float64), centers.astype(np.float64), ground)]
+
+    extents, centers = story_layout(floor_slab_height, layout)
+    floor_z = np.arange(num_floors, dtype=np.float64) * STORY_HEIGHT
+    if lod != 'medium':
+        return [(extents, centers, floor_z)]
+
+    # Slabs on every floor, and continuous columns from the top of the first slab to the roof
+    pillars = slice(1, 1 + (bays_x + 1) * (bays_y + 1))
+    column_extents, column_centers = extents[pillars].copy(), centers[pillars].copy()
+    column_height = num_floors * STORY_HEIGHT - floor_slab_height
+    column_extents[:, 2] = column_height
+    column_centers[:, 2] = floor_slab_height + column_height / 2
+    return [(extents[:1], centers[:1], floor_z), (column_extents, column_centers, ground)]
+
+
+def place(centers, elevations):
+    """
+    Repete os centros de um padrão em cada elevação, na ordem (elevação, elemento).
+
+    Returns:
+    - np.ndarray: Centers with shape (len(elevations) * len(centers), 3).
+    """
+    placed = centers[np.newaxis, :, :] + (elevations[:, np.newaxis] * [0.0, 0.0, 1.0])[:, np.newaxis, :]
+    return placed.reshape(-1, 3)
+
+
+def elevation_runs(elevations, pattern_size, max_boxes=CHUNK_MAX_BOXES):
+    """
+    Divide as elevações de um grupo em trechos de no máximo `max_boxes` caixas (ao menos uma elevação).
+    """
+    per_run = max(1, max_boxes // max(1, pattern_size))
+    return [elevations[start:start + per_run] for start in range(0, len(elevations), per_run)]
+
+
+def building_chunks(num_floors, floor_slab_height, lod='full', layout=DEFAULT_LAYOUT, max_boxes=CHUNK_MAX_BOXES):
+    """
+    Gera as caixas do prédio em blocos de pavimentos, com no máximo `max_boxes` caixas por bloco.
+
+    Each chunk broadcasts a group pattern over a run of elevations, so large footprints and
+    tall buildings are produced with bounded memory: the exporters consume one chunk at a
+    time instead of holding every box of the building at once. Consecutive pieces are merged
+    while they fit (e.g. the medium tier's columns ride along with the last slabs).
+
+    Parameters: as `building_groups`, plus
+    - max_boxes (int): Upper bound on the boxes of one chunk (at least one floor per chunk).
+
+    Yields:
+    - tuple(np.ndarray, np.ndarray): (extents, centers) of a chunk, both with shape (N, 3).
+    """
+    pending = []
+    for extents, centers, elevations in building_groups(num_floors, floor_slab_height, lod, layout):
+        for run in elevation_runs(elevations, len(extents), max_boxes):
+            piece = (np.broadcast_to(extents, (len(run),) + extents.shape).reshape(-1, 3), place(centers, run))
+            if pending and sum(len(e) for e, _ in pending) + len(piece[0]) > max_boxes:
+                yield merge_chunks(pending)
+                pending = []
+            pending.append(piece)
+    if pending:
+        yield merge_chunks(pending)
+
+
+def merge_chunks(pieces):
+    if len(pieces) == 1:
+        return pieces[0]
+    return np.concatenate([e for e, _ in pieces]), np.concatenate([c for _, c in pieces])
+
+
+def building_boxes(num_floors, floor_slab_height, lod='full', layout=DEFAULT_LAYOUT):
+    """
+    Calcula as dimensões e os centros de todas as caixas do prédio de uma só vez.
+
+    Concatenation of `building_chunks`; prefer the chunks for very large buildings.
+
+    Returns:
+    - tuple(np.ndarray, np.ndarray): (extents, centers), both with shape (N, 3).
+    """
+    chunks = list(building_chunks(num_floors, floor_slab_height, lod, layout))
+    return np.concatenate([e for e, _ in chunks]), np.concatenate([c for _, c in chunks])
+
+
+def boxes_to_arrays(extents, centers):
+    """
+    Monta os arrays de vértices e faces de várias caixas a partir do template unitário.
+
+    Parameters:
+    - extents (np.ndarray): Box sizes, shape (N, 3).
+    - centers (np.ndarray): Box centers, shape (N, 3).
+
+    Returns:
+    - tuple(np.ndarray, np.ndarray): vertices (N * 8, 3) and faces (N * 12, 3).
+    """
+    count = len(extents)
+    vertices = UNIT_BOX_VERTICES[np.newaxis, :, :] * extents[:, np.newaxis, :] + centers[:, np.newaxis, :]
+    offsets = np.arange(count, dtype=np.int64) * len(UNIT_BOX_VERTICES)
+    faces = UNIT_BOX_FACES[np.newaxis, :, :] + offsets[:, np.newaxis, np.newaxis]
+    return vertices.reshape(-1, 3), faces.reshape(-1, 3)
+
+
+# --- Mesh Optimization ---
+# Face of the unit box each template triangle belongs to: the axis all three vertices share and its sign
+_shared_axis = np.ptp(UNIT_BOX_VERTICES[UNIT_BOX_FACES], axis=1) == 0
+TRIANGLE_AXIS = np.argmax(_shared_axis, axis=1)
+TRIANGLE_SIGN = np.sign(UNIT_BOX_VERTICES[UNIT_BOX_FACES[:, 0], TRIANGLE_AXIS])
+CULL_CHUNK_SIZE = 65536 # Box pairs tested per vectorized chunk
+CULL_EPSILON = 1e-9
+CULL_CELL_PERCENTILE = 90 # Hash cell size per axis: this percentile of the box extents
+
+
+def touching_pairs(mins, maxs):
+    """
+    Encontra os pares (i, j), i != j, de caixas alinhadas aos eixos que se tocam ou se sobrepõem.
+
+    Broad phase on a uniform 3D grid: each box is registered in every cell its bounds touch,
+    and only boxes sharing a cell are compared. Cells are as large as most boxes, so the few
+    large ones (slabs spanning the whole plan) land in many cells while the pair count stays
+    close to linear in the number of boxes, even for wide multi-bay floors.
+
+    Returns:
+    - tuple(np.ndarray, np.ndarray): Indices i and j of every touching pair, both orders included.
+    """
+    count = len(mins)
+    size = np.maximum(np.percentile(maxs - mins, CULL_CELL_PERCENTILE, axis=0), CULL_EPSILON * 1e3)
+    lo = np.floor((mins - CULL_EPSILON - mins.min(axis=0)) / size).astype(np.int64)
+    hi = np.floor((maxs + CULL_EPSILON - mins.min(axis=0)) / size).astype(np.int64)
+    spans = hi - lo + 1
+    dims = hi.max(axis=0) + 1
+
+    # One entry per (box, cell) it touches
+    cells_per_box = spans.prod(axis=1)
+    box = np.repeat(np.arange(count), cells_per_box)
+    local = np.arange(len(box)) - np.repeat(np.cumsum(cells_per_box) - cells_per_box, cells_per_box)
+    offset = np.column_stack([local // (spans[box, 1] * spans[box, 2]), local // spans[box, 2] % spans[box, 1],
+                              local % spans[box, 2]])
+    cell = lo[box] + offset
+    cell_key = (cell[:, 0] * dims[1] + cell[:, 1]) * dims[2] + cell[:, 2]
+
+    # Every ordered pair of entries within a cell, then each box pair once
+    order = np.argsort(cell_key, kind='stable')
+    box, cell_key = box[order], cell_key[order]
+    starts = np.flatnonzero(np.r_[True, cell_key[1:] != cell_key[:-1]])
+    group_size = np.diff(np.r_[starts, len(box)])
+    entry_group_size = np.repeat(group_size, group_size)
+    entry_start = np.repeat(starts, group_size)
+    box_i = np.repeat(box, entry_group_size)
+    box_j = box[np.repeat(entry_start, entry_group_size) + np.arange(entry_group_size.sum())
+                - np.repeat(np.cumsum(entry_group_size) - entry_group_size, entry_group_size)]
+    pairs = np.unique(box_i[box_i != box_j] * count + box_j[box_i != box_j])
+    box_i, box_j = pairs // count, pairs % count
+    overlapping = np.all((mins[box_j] <= maxs[box_i] + CULL_EPSILON) & (mins[box_i] <= maxs[box_j] + CULL_EPSILON), axis=1)
+    return box_i[overlapping], box_j[overlapping]
+
+
+def hidden_triangles(extents, centers):
+    """
+    Marca os triângulos de caixas alinhadas aos eixos que ficam totalmente ocultos.
+
+    A box face is hidden when its rectangle lies inside another box and the space just
+    outside it is occupied by that box: faces buried in another element (beam ends inside
+    pillars) and contact faces (pillar bottoms on slabs, beam tops under the next slab).
+    Faces only partially covered are kept. Only pairs of touching boxes are tested, found
+    with a spatial hash (see `touching_pairs`).
+
+    Returns:
+    - np.ndarray: Boolean mask with shape (N * 12,), True for triangles that can be dropped.
+    """
+    count = len(extents)
+    triangles = len(UNIT_BOX_FACES)
+    mins = centers - extents / 2
+    maxs = centers + extents / 2
+
+    # Rectangle of every triangle's face: flat along its axis, at the box's min or max plane
+    planes = np.where(TRIANGLE_SIGN > 0, maxs[:, TRIANGLE_AXIS], mins[:, TRIANGLE_AXIS]) # (N, 12)
+    face_mins = np.repeat(mins[:, np.newaxis, :], triangles, axis=1)
+    face_maxs = np.repeat(maxs[:, np.newaxis, :], triangles, axis=1)
+    face_mins[:, np.arange(triangles), TRIANGLE_AXIS] = planes
+    face_maxs[:, np.arange(triangles), TRIANGLE_AXIS] = planes
+
+    box_i, box_j = touching_pairs(mins, maxs)
+
+    hidden = np.zeros(count * triangles, dtype=bool)
+    for start in range(0, len(box_i), CULL_CHUNK_SIZE):
+        i, j = box_i[start:start + CULL_CHUNK_SIZE], box_j[start:start + CULL_CHUNK_SIZE]
+        # (pairs, triangles): face rectangle of i contained in box j ...
+        inside = np.all((mins[j][:, np.newaxis] <= face_mins[i] + CULL_EPSILON) &
+                        (face_maxs[i] <= maxs[j][:, np.newaxis] + CULL_EPSILON), axis=2)
+        # ... and box j extends past the face on its outer side
+        far = np.where(TRIANGLE_SIGN > 0,
+                       maxs[j][:, TRIANGLE_AXIS] > planes[i] + CULL_EPSILON,
+                       mins[j][:, TRIANGLE_AXIS] < planes[i] - CULL_EPSILON)
+        hits = inside & far
+        hidden[(i[:, np.newaxis] * triangles + np.arange(triangles))[hits]] = True
+    return hidden
+
+
+def weld_vertices(vertices, faces, decimals=6):
+    """
+    Une vértices coincidentes (até `decimals` casas) e descarta os que não são usados por nenhuma face.
+
+    Returns:
+    - tuple(np.ndarray, np.ndarray): Welded vertices and remapped faces.
+    """
+    used = np.unique(faces)
+    keys = np.round(vertices[used] * 10 ** decimals).astype(np.int64)
+    order = np.lexsort(keys.T[::-1])
+    sorted_keys = keys[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    remap = np.zeros(len(vertices), dtype=np.int64)
+    remap[used] = inverse
+    return vertices[used][order][first], remap[faces]
+
+
+def optimize_boxes(extents, centers):
+    """
+    Monta a malha das caixas sem as faces ocultas e com vértices soldados.
+
+    Returns:
+    - tuple(np.ndarray, np.ndarray, dict): vertices, faces and the triangle/vertex counts
+      before and after the optimization.
+    """
+    vertices, faces = boxes_to_arrays(extents, centers)
+    stats = {'triangles_before': len(faces), 'vertices_before': len(vertices)}
+    faces = faces[~hidden_triangles(extents, centers)]
+    vertices, faces = weld_vertices(vertices, faces)
+    stats.update(triangles_after=len(faces), vertices_after=len(vertices))
+    return vertices, faces, stats
+
+
+# --- Materials ---
+# PBR parameters (base color RGBa, metallic, roughness) per material type
+MATERIALS = {
+    'wood': ([0.6, 0.4, 0.2, 1.0], 0.0, 0.8),         # Wood-like color
+    'steel': ([0.7, 0.7, 0.7, 1.0], 0.9, 0.3),        # Steel-like color
+    'concrete': ([0.55, 0.55, 0.55, 1.0], 0.05, 0.9), # Concrete-like color
+}
+DEFAULT_MATERIAL = ([0.5, 0.5, 0.5, 1.0], 0.5, 0.5)  # Default material if type is not recognized
+
+EXPORT_MODES = ('mesh', 'instanced', 'nodes')
+
+
+def material_for(material_type):
+    """
+    Retorna o material PBR correspondente ao tipo de material (wood/steel/concrete).
+    """
+    import trimesh  # Deferred: only the merged-mesh export needs trimesh
+
+    base_color, metallic, roughness = MATERIALS.get(material_type, DEFAULT_MATERIAL)
+    return trimesh.visual.texture.PBRMaterial(
+        baseColorFactor=base_color, metallicFactor=metallic, roughnessFactor=roughness, emissiveFactor=[0,0,0])
+
+
+def instanced_glb_builder(groups, material_type='wood', use_extension=True):
+    """
+    Monta o GLB instanciado: uma malha por tipo de elemento (dimensões distintas) e apenas uma
+    translação por elemento.
+
+    With the extension, the translations of each element type are streamed accessors: they
+    are computed run by run of floors while `iter_bytes` writes the file, so the builder
+    holds only the group patterns and `byte_size` is known before any geometry is produced.
+
+    Parameters:
+    - groups (list): Box groups, as returned by `building_groups`.
+    - material_type (str): Type of material ('wood', 'steel', 'concrete').
+    - use_extension (bool): If True, each element type is one node with EXT_mesh_gpu_instancing
+      translations; if False, one plain node per element references the shared mesh.
+
+    Returns:
+    - GLBBuilder: Call `to_bytes()` for the whole file or `iter_bytes()` to stream it.
+    """
+    # Boxes with identical dimensions share one mesh; only their positions differ
+    occurrences = {}  # type extents -> [(pattern centers of that type, elevations)]
+    for extents, centers, elevations in groups:
+        element_types, element_type_of = np.unique(np.round(extents, 6), axis=0, return_inverse=True)
+        element_type_of = element_type_of.reshape(-1)
+        for type_index, type_extents in enumerate(element_types):
+            occurrences.setdefault(tuple(type_extents.tolist()), []).append((centers[element_type_of == type_index], elevations))
+
+    def translations(type_occurrences):
+        for type_centers, elevations in type_occurrences:
+            for run in elevation_runs(elevations, len(type_centers)):
+                yield place(type_centers, run).astype(np.float32)
+
+    builder = GLBBuilder()
+    material = builder.add_material(*MATERIALS.get(material_type, DEFAULT_MATERIAL))
+    if use_extension:
+        builder.use_extension('EXT_mesh_gpu_instancing', required=True)
+    else:
+        root = builder.add_node(name='building', children=[])
+
+    indices = index_array(UNIT_BOX_FACES.reshape(-1), len(UNIT_BOX_VERTICES))
+    for type_index, type_extents in enumerate(sorted(occurrences)):
+        positions = (UNIT_BOX_VERTICES * type_extents).astype(np.float32)
+        mesh = builder.add_mesh(
+            {'POSITION': builder.add_accessor(positions, ARRAY_BUFFER, bounds=True)},
+            builder.add_accessor(indices, ELEMENT_ARRAY_BUFFER),
+            material=material, name=f'element_{type_index}')
+        type_occurrences = occurrences[type_extents]
+        if use_extension:
+            count = sum(len(type_centers) * len(elevations) for type_centers, elevations in type_occurrences)
+            builder.add_node(mesh=mesh, extensions={'EXT_mesh_gpu_instancing': {
+                'attributes': {'TRANSLATION': builder.add_streamed_accessor(translations(type_occurrences), count, np.float32, 3)}}})
+        else:
+            builder.gltf['nodes'][root]['children'].extend(
+                builder.add_node(root=False, mesh=mesh, translation=translation)
+                for chunk in translations(type_occurrences) for translation in chunk.tolist())
+    return builder
+
+
+def mesh_arrays(chunks, optimize=True):
+    """
+    Monta os vértices e faces da malha única bloco a bloco.
+
+    With `optimize`, hidden faces are culled and vertices welded within each chunk, so the
+    pair search never spans more than one chunk of boxes; faces touching across a chunk
+    boundary are kept.
+
+    Returns:
+    - tuple(np.ndarray, np.ndarray, dict | None): vertices, faces and the summed optimization
+      counts (None without `optimize`).
+    """
+    all_vertices, all_faces, stats, offset = [], [], None, 0
+    for extents, centers in chunks:
+        if optimize:
+            vertices, faces, chunk_stats = optimize_boxes(extents, centers)
+            stats = {k: (stats or {}).get(k, 0) + v for k, v in chunk_stats.items()}
+        else:
+            vertices, faces = boxes_to_arrays(extents, centers)
+        all_vertices.append(vertices)
+        all_faces.append(faces + offset)
+        offset += len(vertices)
+    return np.concatenate(all_vertices), np.concatenate(all_faces), stats
+
+
+def building_for(num_floors, floor_slab_thickness_param, lod, grid_x=None, grid_y=None, area=None):
+    """
+    Valida e normaliza os parâmetros do prédio e retorna seus grupos de caixas (`building_groups`).
+    """
+    if lod not in LOD_TIERS:
+        raise ValueError(f"Unknown level of detail '{lod}', expected one of {LOD_TIERS}")
+    num_floors = max(1, int(num_floors)) # Ensure at least 1 floor
+    # Use the provided thickness parameter, ensuring it's a float and has a reasonable minimum value
+    floor_slab_height = max(0.05, float(floor_slab_thickness_param))
+    layout = floor_layout(grid_x, grid_y, area)
+    check_building_size(num_floors, layout)
+    return num_floors, floor_slab_height, layout
+
+
+def stream_with(material_type='wood', num_floors=1, floor_slab_thickness_param=0.2, lod='full', grid_x=None, grid_y=None, area=None):
+    """
+    Prepara o GLB instanciado do prédio para ser escrito em streaming (mesmo arquivo que
+    `generate_with(..., export_mode='instanced')`).
+
+    Nothing but the group patterns and the JSON chunk is computed up front; the instance
+    translations are generated run by run of floors as `iter_bytes()` is consumed, so peak
+    memory stays bounded and the first bytes can be sent before the geometry is complete.
+
+    Returns:
+    - GLBBuilder: `byte_size()` gives the Content-Length, `iter_bytes()` the file in parts.
+    """
+    num_floors, floor_slab_height, layout = building_for(num_floors, floor_slab_thickness_param, lod, grid_x, grid_y, area)
+    return instanced_glb_builder(building_groups(num_floors, floor_slab_height, lod, layout), material_type)
+
+
+def stream_size(material_type='wood', num_floors=1, floor_slab_thickness_param=0.2, lod='full', grid_x=None, grid_y=None, area=None):
+    """
+    Retorna o tamanho em bytes do GLB de `stream_with` com os mesmos parâmetros (executável no pool).
+    """
+    return stream_with(material_type, num_floors, floor_slab_thickness_param, lod, grid_x, grid_y, area).byte_size()
+
+
+def generate_with(material_type='wood', num_floors=1, floor_slab_thickness_param=0.2, return_bytes=False, export_mode='mesh', lod='full', optimize=True,
+                  grid_x=None, grid_y=None, area=None):
     """
     Gera um modelo GLB de uma estrutura de prédio com a quantidade de andares especificada.
     A aparência varia com o material (wood/steel/concrete) e a espessura da laje.
+
+    The floor plan is an N×M grid of grid_x × grid_y bays covering `area`, with a pillar at
+    every grid intersection and a beam along every grid line. All slabs, pillars and beams
+    are built from a single unit-box template, vectorized over chunks of floors that are
+    exported as they are produced, so large footprints stay within bounded memory.
     
     Parameters:
     - material_type (str): Type of material ('wood', 'steel', 'concrete').
     - num_floors (int): Number of floors for the building.
     - floor_slab_thickness_param (float): Desired thickness of the floor slabs in meters.
     - return_bytes (bool): If True, returns the GLB bytes directly. If False, saves to a file (legacy).
+    - export_mode (str): 'mesh' merges every box into one mesh; 'instanced' emits one mesh per
+      element type with EXT_mesh_gpu_instancing translations; 'nodes' emits one mesh per element
+      type plus one node per element.
+    - lod (str): Level of detail ('coarse', 'medium' or 'full'), see `building_groups`.
+    - optimize (bool): In 'mesh' mode, drop hidden faces and weld shared vertices before export.
+    - grid_x, grid_y (float | None): Bay spans in meters (4 m if omitted).
+    - area (float | None): Floor area in m² to cover with bays (a single bay if omitted).
 
     Returns:
     - bytes: The GLB file content as bytes if `return_bytes` is True.
-    - str: The filepath of the saved GLB file if `return_bytes` is False.
+    - str: The filepath of the saved GLB file if `return_bytes` is False (`MODEL_FILE_DIR/<id[:2]>/<id>.glb`).
     - None: If an error occurs during generation.
     """
     try:
-        num_floors = max(1, int(num_floors)) # Ensure at least 1 floor
-        # Use the provided thickness parameter, ensuring it's a float and has a reasonable minimum value
-        floor_slab_height = max(0.05, float(floor_slab_thickness_param)) 
-        
-        # --- Building Dimensions ---
-        # Define core dimensions of a single story and structural elements
-        floor_width = 4.0   # Width of the building floor
-        floor_depth = 4.0   # Depth of the building floor
-        column_dim = 0.3    # Side length of square columns
-        beam_height = 0.3   # Height of beams
-        beam_width = 0.3    # Width of beams
-        story_height = 3.0  # Total height of one story (from floor to floor above)
-
-        # Calculate pillar height based on total story height and slab thickness
-        pillar_height = story_height - floor_slab_height
-
-        meshes = [] # List to store all individual Trimesh objects
-
-        # --- Generate Floors and Columns ---
-        for i in range(num_floors):
-            # Z-coordinate for the bottom of the current floor's structure
-            floor_z_bottom = i * story_height 
-            
-            # 1. Floor Slab
-            floor_slab = trimesh.creation.box(extents=[floor_width, floor_depth, floor_slab_height])
-            # Position the slab correctly: center it horizontally, and place its bottom at floor_z_bottom
-            floor_slab.apply_translation([0, 0, floor_z_bottom + floor_slab_height / 2])
-            meshes.append(floor_slab)
-
-            # 2. Columns (Pillars)
-            # Calculate offsets for columns to be at the corners of the floor
-            column_x_offset = floor_width / 2 - column_dim / 2
-            column_y_offset = floor_depth / 2 - column_dim / 2
-            
-            # Define positions for the four corner columns
-            column_positions = [
-                np.array([ column_x_offset,  column_y_offset, floor_z_bottom + floor_slab_height]),
-                np.array([-column_x_offset,  column_y_offset, floor_z_bottom + floor_slab_height]),
-                np.array([ column_x_offset, -column_y_offset, floor_z_bottom + floor_slab_height]),
-                np.array([-column_x_offset, -column_y_offset, floor_z_bottom + floor_slab_height]),
-            ]
-
-            # Create and position each column
-            for pos in column_positions:
-                pillar = trimesh.creation.box(extents=[column_dim, column_dim, pillar_height]) 
-                # Position the pillar: its bottom starts where the slab ends
-                pillar.apply_translation([pos[0], pos[1], pos[2] + pillar_height / 2])
-                meshes.append(pillar)
-
-            # 3. Beams (connecting columns at the top of each floor)
-            # Beams are added for each floor, except possibly the very top if no more floors are above.
-            # In this logic, beams are created for each floor's "ceiling"
-            if i < num_floors: # This condition might be simplified or removed depending on exact beam placement
-                # Z-coordinate for the center of the beams
-                # It's at the top of the current story
-                beam_z = floor_z_bottom + story_height - beam_height / 2
-
-                # Beams along X-axis
-                beam_length_x = floor_width - column_dim # Length between columns
-                beam_x1 = trimesh.creation.box(extents=[beam_length_x, beam_width, beam_height])
-                beam_x1.apply_translation([0, column_y_offset, beam_z])
-                meshes.append(beam_x1)
-
-                beam_x2 = trimesh.creation.box(extents=[beam_length_x, beam_width, beam_height])
-                beam_x2.apply_translation([0, -column_y_offset, beam_z])
-                meshes.append(beam_x2)
-
-                # Beams along Y-axis
-                beam_length_y = floor_depth - column_dim # Length between columns
-                beam_y1 = trimesh.creation.box(extents=[beam_width, beam_length_y, beam_height])
-                beam_y1.apply_translation([column_x_offset, 0, beam_z])
-                meshes.append(beam_y1)
-
-                beam_y2 = trimesh.creation.box(extents=[beam_width, beam_length_y, beam_height])
-                beam_y2.apply_translation([-column_x_offset, 0, beam_z])
-                meshes.append(beam_y2)
-        
-        # Combine all individual meshes into a single Trimesh object
-        combined = trimesh.util.concatenate(meshes)
-
-        # --- Apply Material Properties (PBR Material) ---
-        pbr_material_instance = None 
-
-        if material_type == 'wood':
-            base_color = [0.6, 0.4, 0.2, 1.0] # RGBa for wood-like color
-            pbr_material_instance = trimesh.visual.texture.PBRMaterial(
-                baseColorFactor=base_color, metallicFactor=0.0, roughnessFactor=0.8, emissiveFactor=[0,0,0])
-        elif material_type == 'steel':
-            base_color = [0.7, 0.7, 0.7, 1.0] # RGBa for steel-like color
-            pbr_material_instance = trimesh.visual.texture.PBRMaterial(
-                baseColorFactor=base_color, metallicFactor=0.9, roughnessFactor=0.3, emissiveFactor=[0,0,0])
-        elif material_type == 'concrete':
-            base_color = [0.55, 0.55, 0.55, 1.0] # RGBa for concrete-like color
-            pbr_material_instance = trimesh.visual.texture.PBRMaterial(
-                baseColorFactor=base_color, metallicFactor=0.05, roughnessFactor=0.9, emissiveFactor=[0,0,0])
-        else:
-            # Default material if type is not recognized
-            base_color = [0.5, 0.5, 0.5, 1.0] 
-            pbr_material_instance = trimesh.visual.texture.PBRMaterial(
-                baseColorFactor=base_color, metallicFactor=0.5, roughnessFactor=0.5, emissiveFactor=[0,0,0])
+        if export_mode not in EXPORT_MODES:
+            raise ValueError(f"Unknown export mode '{export_mode}', expected one of {EXPORT_MODES}")
+        num_floors, floor_slab_height, layout = building_for(num_floors, floor_slab_thickness_param, lod, grid_x, grid_y, area)
+
+        # --- Generate Floors, Columns and Beams, and Export the Model ---
+        if export_mode == 'mesh':
+            import trimesh  # Deferred so the instanced export paths start without it
+
+            with STAGE_SECONDS.time(stage='concatenate', export_mode=export_mode):
+                # Cull hidden faces and weld shared vertices; the counts travel in the mesh extras
+                vertices, faces, stats = mesh_arrays(building_chunks(num_floors, floor_slab_height, lod, layout), optimize)
+            combined = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+            if optimize:
+                combined.metadata['optimization'] = stats
 
-        combined.visual = trimesh.visual.TextureVisuals()
-        combined.visual.material = pbr_material_instance
+            # --- Apply Material Properties (PBR Material) ---
+            combined.visual = trimesh.visual.TextureVisuals()
+            combined.visual.material = material_for(material_type)
+
+            # Export straight to bytes (no intermediate buffer copy)
+            with STAGE_SECONDS.time(stage='glb_export', export_mode=export_mode):
+                glb_bytes = combined.export(file_type='glb')
+        else:
+            with STAGE_SECONDS.time(stage='mesh_build', export_mode=export_mode):
+                groups = building_groups(num_floors, floor_slab_height, lod, layout)
+            with STAGE_SECONDS.time(stage='glb_export', export_mode=export_mode):
+                # Instance translations are produced while the file is written, a run of floors at a time
+                glb_bytes = instanced_glb_builder(groups, material_type, use_extension=export_mode == 'instanced').to_bytes()
 
-        # --- Export Model ---
         if return_bytes:
-            # Export to a BytesIO buffer in memory and return its content
-            buffer = io.BytesIO()
-            combined.export(buffer, file_type='glb')
-            buffer.seek(0) # Rewind the buffer to the beginning
-            return buffer.read() # Return the bytes
+            return glb_bytes # Return the bytes
         else:
-            # Legacy: Save to a file in the 'static' directory (not used in multi-user setup)
-            filename = f"building_{material_type}_{num_floors}_floors_{int(time.time())}.glb"
-            filepath = os.path.join("static", filename)
-            combined.export(filepath)
-            return filepath
+            # Save to the content-addressed model directory (not used in multi-user setup)
+            return model_files.file_path(model_files.put(content_id(glb_bytes), glb_bytes))
             
     except Exception as e:
         # Log any errors that occur during model generation
+        ERRORS.inc(source='generate_with')
         sys.stderr.write(f"Error generating GLB model: {e}\n")
         traceback.print_exc(file=sys.stderr) # Print full traceback for detailed debugging
         return None
@@ -0,0 +1,249 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+
+def content_id(data):
+    """
+    Retorna um identificador estável derivado do conteúdo (hash SHA-256 truncado).
+    """
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+class BlobStore:
+    """
+    Armazenamento em memória de blobs (PNG/GLB) com limite de bytes, TTL e despejo LRU.
+
+    Entries expire `ttl` seconds after they were stored (None disables expiry) and the
+    least recently used entries are evicted once the total size exceeds `max_bytes`.
+    Hit, miss, eviction and expiration counters are kept for monitoring.
+
+    Parameters:
+    - max_bytes (int): Memory cap for all stored payloads.
+    - ttl (float | None): Default time-to-live of an entry in seconds.
+    - on_evict (callable | None): Called with the key of every evicted or expired entry.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=None, on_evict=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (data, expires_at), in LRU order
+
+    def put(self, key, data, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        if key in self._entries:
+            self.total_bytes -= len(self._entries[key][0])
+        self._entries[key] = (data, expires_at)
+        self._entries.move_to_end(key)
+        self.total_bytes += len(data)
+        self._purge_expired()
+        self._evict(keep=key)
+        return key
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and self._is_expired(entry):
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def path(self, key):
+        return None  # In-memory entries have no file to serve from
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def _is_expired(self, entry, now=None):
+        expires_at = entry[1]
+        return expires_at is not None and expires_at <= (time.monotonic() if now is None else now)
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        for key in [k for k, entry in self._entries.items() if self._is_expired(entry, now)]:
+            self._remove(key)
+            self.expirations += 1
+
+    def _evict(self, keep=None):
+        # Drop least recently used entries until the byte budget is met (never the newest one)
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        data, _ = self._entries.pop(key)
+        self.total_bytes -= len(data)
+        if self.on_evict:
+            self.on_evict(key)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and not self._is_expired(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RenderCache:
+    """
+    Cache de artefatos renderizados (PNG/GLB) indexado pelas entradas que realmente os definem.
+
+    `key_func` maps the call arguments to a hashable key of the inputs that determine the
+    output; `renderer(*key)` produces the bytes. Results are stored in a BlobStore under a
+    content-hash ID, so identical inputs always map to the same URL. Size limits, TTL and
+    LRU eviction come from the store.
+
+    Parameters:
+    - renderer (callable): Called with the normalized key, returns bytes (or None on failure).
+    - store (BlobStore | None): Where the bytes are kept; a new store is created if omitted.
+    - max_bytes (int): Byte budget used when creating the store.
+    - key_func (callable | None): Normalizes the call arguments into a key (identity if omitted).
+    """
+
+    def __init__(self, renderer, store=None, max_bytes=64 * 1024 * 1024, key_func=None):
+        self.renderer = renderer
+        self.key_func = key_func
+        self.store = store if store is not None else BlobStore(max_bytes)
+        self.store.on_evict = self._forget
+        self._ids = {}   # normalized key -> content ID
+        self._keys = {}  # content ID -> set of normalized keys
+
+    def normalize_key(self, *args):
+        return self.key_func(*args) if self.key_func else args
+
+    def render(self, key):
+        return self.renderer(*key)
+
+    def get_or_render(self, *args):
+        """
+        Retorna o ID do artefato para as entradas, renderizando só na primeira vez.
+
+        Returns:
+        - str: The content-hash ID.
+        - None: If the renderer fails.
+        """
+        artifact_id = self.lookup(*args)
+        if artifact_id is not None:
+            return artifact_id
+
+        key = self.normalize_key(*args)
+        data = self.render(key)
+        if not data:
+            return None
+        return self.put(key, data)
+
+    def lookup(self, *args):
+        """
+        Retorna o ID em cache para as entradas, ou None se ainda não foi renderizado.
+        """
+        key = self.normalize_key(*args)
+        artifact_id = self._ids.get(key)
+        # A membership test: never reads the payload (e.g. a spilled GLB) nor counts a store hit
+        if artifact_id is not None and artifact_id in self.store:
+            return artifact_id
+        return None
+
+    def put(self, key, data):
+        artifact_id = content_id(data)
+        self.store.put(artifact_id, data)
+        return self.link(key, artifact_id)
+
+    def link(self, key, artifact_id):
+        """
+        Associa a chave normalizada a um artefato já gravado no armazenamento (e.g. por streaming).
+        """
+        self._ids[key] = artifact_id
+        self._keys.setdefault(artifact_id, set()).add(key)
+        return artifact_id
+
+    def get(self, artifact_id):
+        return self.store.get(artifact_id)
+
+    def _forget(self, artifact_id):
+        for key in self._keys.pop(artifact_id, ()):
+            if self._ids.get(key) == artifact_id:
+                del self._ids[key]
+
+    def __contains__(self, artifact_id):
+        return artifact_id in self.store
+
+    def __len__(self):
+        return len(self.store)
+
+
+def render_model(generator, key):
+    """
+    Gera o GLB para uma chave normalizada de ModelCache (função de módulo, executável no pool de processos).
+    """
+    material_type, num_floors, floor_slab_thickness, lod, grid_x, grid_y, area = key
+    return generator(material_type, num_floors, floor_slab_thickness, return_bytes=True, lod=lod,
+                     grid_x=grid_x, grid_y=grid_y, area=area)
+
+
+class ModelCache(RenderCache):
+    """
+    Cache de modelos GLB na frente de `generate_with`.
+
+    Models are keyed on the normalized (material_type, num_floors, floor_slab_thickness, lod,
+    grid_x, grid_y, area) tuple, so equivalent parameters share one entry and one content-hash
+    model ID. The area is rounded up to the bays it produces: two areas that need the same
+    N×M grid share the model. `normalize_key` raises ValueError for buildings over
+    building_model.MAX_ELEMENTS.
+
+    Parameters:
+    - generator (callable): Function with the `generate_with` signature.
+    - store (BlobStore | None): Where GLB bytes are kept; a new store is created if omitted.
+    - max_bytes (int): Byte budget used when creating the store.
+    """
+
+    def __init__(self, generator, store=None, max_bytes=64 * 1024 * 1024):
+        super().__init__(generator, store=store, max_bytes=max_bytes)
+
+    @property
+    def generator(self):
+        return self.renderer
+
+    @staticmethod
+    def normalize_key(material_type, num_floors, floor_slab_thickness, lod='full', grid_x=None, grid_y=None, area=None):
+        from building_model import check_building_size, floor_layout  # Local: building_model imports this module
+
+        # Mirror the clamping done by generate_with so equivalent inputs share one entry
+        material = str(material_type).strip().lower()
+        floors = max(1, int(num_floors))
+        thickness = round(max(0.05, float(floor_slab_thickness)), 3)  # Millimeter resolution
+        grid_x, grid_y, bays_x, bays_y = layout = floor_layout(
+            round(float(grid_x), 3) if grid_x else None, round(float(grid_y), 3) if grid_y else None, area)
+        check_building_size(floors, layout)  # Oversized buildings never get a key, let alone a job
+        return material, floors, thickness, lod, grid_x, grid_y, round(bays_x * bays_y * grid_x * grid_y, 6)
+
+    def render(self, key):
+        return render_model(self.renderer, key)
+
+    def get_or_generate(self, material_type, num_floors, floor_slab_thickness, lod='full', grid_x=None, grid_y=None, area=None):
+        """
+        Retorna o ID do modelo para os parâmetros, gerando e exportando o GLB só na primeira vez.
+        """
+        return self.get_or_render(material_type, num_floors, floor_slab_thickness, lod, grid_x, grid_y, area)
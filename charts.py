@@ -0,0 +1,197 @@
+import io
+
+from material_db import MATERIAIS, get_database
+from metrics import STAGE_SECONDS
+
+CORES = ['#4CAF50', '#2196F3', '#FFC107'] # More pleasant colors
+
+# Chart titles, shared by the PNG figure and the client-side charts
+TITULOS = ('Custo Estimado por Material', 'Pegada de Carbono por Material', 'Peso Total por Material')
+TITULO_ESQUEMA = 'Representação Estrutural Simplificada'
+
+# Simplified structural drawing: (x, y, width, height, fill) in a 10 x 6.2 frame, y pointing up
+ESQUEMA_RETANGULOS = (
+    (4.5, 0, 1, 5.0, '#607D8B'),   # Pillar (dark gray)
+    (2, 5, 2.5, 0.4, '#795548'),   # Top left beam (brown)
+    (6.5, 5, 2.5, 0.4, '#795548'), # Top right beam
+    (2, 5.4, 6, 0.4, '#795548'),   # Transversal beam (passing over the pillar)
+    (1.5, 5.8, 7, 0.4, '#9E9E9E'), # Slab (light gray)
+)
+# (x, y, text, color) of the element labels
+ESQUEMA_ROTULOS = ((5.0, 2.5, 'Pilar', 'white'), (5, 5.2, 'Vigas', 'white'), (5.0, 6.0, 'Laje', 'black'))
+
+
+def chart_series(current_material_type):
+    """
+    Retorna as séries de custo, carbono e peso por material para o tipo de laje calculado.
+
+    Values come from the material database (Database.xlsx, or its built-in defaults).
+
+    Returns:
+    - tuple(list, list, list): (custos, carbono, peso), one value per entry of MATERIAIS.
+    """
+    return get_database().series(current_material_type)
+
+
+def chart_key(current_material_type):
+    """
+    Retorna a chave de cache do gráfico: as próprias séries que entram na figura.
+
+    Two inputs that produce the same data share one cached PNG.
+    """
+    return tuple(tuple(serie) for serie in chart_series(current_material_type))
+
+
+def echart_options(custos, carbono, peso):
+    """
+    Monta as opções do ECharts com as três pizzas (custo, carbono e peso) lado a lado.
+
+    The browser draws the charts from this small JSON object instead of downloading a PNG.
+
+    Returns:
+    - dict: ECharts option object for `ui.echart`.
+    """
+    centros = ('17%', '50%', '83%')
+    return {
+        'color': CORES,
+        'title': [{'text': titulo, 'left': centro, 'top': 0, 'textAlign': 'center',
+                   'textStyle': {'fontSize': 13, 'fontWeight': 'bold'}}
+                  for titulo, centro in zip(TITULOS, centros)],
+        'tooltip': {'trigger': 'item', 'formatter': '{b}: {c} ({d}%)'},
+        'legend': {'bottom': 0, 'data': MATERIAIS},
+        'series': [{
+            'name': titulo, 'type': 'pie', 'radius': '55%', 'center': [centro, '52%'],
+            'label': {'formatter': '{d}%'},
+            'itemStyle': {'borderColor': 'black', 'borderWidth': 1},
+            'data': [{'name': material, 'value': valor} for material, valor in zip(MATERIAIS, serie)],
+        } for titulo, centro, serie in zip(TITULOS, centros, (custos, carbono, peso))],
+    }
+
+
+def pareto_options(solucoes):
+    """
+    Monta o gráfico de dispersão da fronteira de Pareto: custo × carbono, com o peso no tamanho do ponto.
+
+    Parameters:
+    - solucoes (list): Solutions as returned by `optimizer.otimizar` (dicts with custo, carbono, peso).
+
+    Returns:
+    - dict: ECharts option object for `ui.echart`.
+    """
+    pesos = [solucao['peso'] for solucao in solucoes] or [1]
+    menor, maior = min(pesos), max(pesos)
+    return {
+        'title': {'text': 'Fronteira de Pareto', 'left': 'center', 'textStyle': {'fontSize': 13, 'fontWeight': 'bold'}},
+        'tooltip': {'trigger': 'item'},
+        'xAxis': {'name': 'Custo', 'nameLocation': 'middle', 'nameGap': 28, 'scale': True},
+        'yAxis': {'name': 'Carbono', 'nameLocation': 'middle', 'nameGap': 50, 'scale': True},
+        'series': [{
+            'type': 'scatter', 'itemStyle': {'color': CORES[1], 'borderColor': 'black'},
+            'data': [{
+                'value': [solucao['custo'], solucao['carbono']],
+                # 8 to 24 px, growing with the weight
+                'symbolSize': 8 + 16 * (solucao['peso'] - menor) / ((maior - menor) or 1),
+                'name': f"#{indice + 1} {solucao['tipo_laje']}/{solucao['tipo_viga']}/{solucao['tipo_pilar']} "
+                        f"{solucao['grid_x']:g} x {solucao['grid_y']:g} m, peso {solucao['peso']:g}",
+            } for indice, solucao in enumerate(solucoes)],
+        }],
+    }
+
+
+def schematic_svg(escala=40):
+    """
+    Desenha a representação estrutural simplificada (pilar, vigas e laje) como SVG vetorial.
+
+    Parameters:
+    - escala (float): Pixels per drawing unit.
+
+    Returns:
+    - str: The SVG markup.
+    """
+    largura, altura, topo = 10 * escala, 6.2 * escala, 30
+    partes = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {largura:g} {altura + topo:g}" '
+              f'style="max-width:{largura:g}px;width:100%" role="img" aria-label="{TITULO_ESQUEMA}">',
+              f'<text x="{largura / 2:g}" y="18" text-anchor="middle" font-size="14" font-weight="bold">{TITULO_ESQUEMA}</text>']
+    for x, y, w, h, cor in ESQUEMA_RETANGULOS:
+        partes.append(f'<rect x="{x * escala:g}" y="{topo + altura - (y + h) * escala:g}" width="{w * escala:g}" '
+                      f'height="{h * escala:g}" fill="{cor}" stroke="black" stroke-width="1.5"/>')
+    for x, y, texto, cor in ESQUEMA_ROTULOS:
+        partes.append(f'<text x="{x * escala:g}" y="{topo + altura - y * escala:g}" text-anchor="middle" '
+                      f'dominant-baseline="central" font-size="12" font-weight="bold" fill="{cor}">{texto}</text>')
+    partes.append('</svg>')
+    return ''.join(partes)
+
+
+def render_analysis_charts(current_material_type='Madeira'):
+    """
+    Renderiza a figura 2x2 de análise (custo, carbono, peso e desenho estrutural) como PNG.
+
+    Returns:
+    - bytes: The PNG image content.
+    """
+    return render_charts_png(*chart_series(current_material_type))
+
+
+def render_charts_png(custos, carbono, peso):
+    """
+    Renderiza a figura 2x2 a partir das séries de custo, carbono e peso.
+
+    Pure function of its arguments, so it can run in a worker process.
+
+    Returns:
+    - bytes: The PNG image content.
+    """
+    # matplotlib is imported on first render (usually in a worker process), not at app startup
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+
+    with STAGE_SECONDS.time(stage='chart_render'):
+        fig, axs = plt.subplots(2, 2, figsize=(12, 10), dpi=100)
+        try:
+            # Cost Chart
+            axs[0, 0].pie(custos, labels=MATERIAIS, autopct='%1.1f%%', startangle=90, colors=CORES, wedgeprops={'edgecolor': 'black'})
+            axs[0, 0].set_title(TITULOS[0], fontsize=14, fontweight='bold')
+
+            # Carbon Chart
+            axs[0, 1].pie(carbono, labels=MATERIAIS, autopct='%1.1f%%', startangle=90, colors=CORES, wedgeprops={'edgecolor': 'black'})
+            axs[0, 1].set_title(TITULOS[1], fontsize=14, fontweight='bold')
+
+            # Weight Chart
+            axs[1, 0].pie(peso, labels=MATERIAIS, autopct='%1.1f%%', startangle=90, colors=CORES, wedgeprops={'edgecolor': 'black'})
+            axs[1, 0].set_title(TITULOS[2], fontsize=14, fontweight='bold')
+
+            # Simplified Structural Drawing
+            axs[1, 1].set_xlim(0, 10)
+            axs[1, 1].set_ylim(0, 6.2)
+            axs[1, 1].axis('off') # Hide axes for a cleaner look
+
+            # Pillar
+            pilar_rect = patches.Rectangle((4.5, 0), 1, 5.0, facecolor='#607D8B', edgecolor='black', linewidth=1.5) # Dark gray
+            axs[1, 1].add_patch(pilar_rect)
+            axs[1, 1].text(5.0, 2.5, 'Pilar', ha='center', va='center', fontsize=12, color='white', fontweight='bold')
+
+            # Beams
+            # Top left beam
+            axs[1, 1].add_patch(patches.Rectangle((2, 5), 2.5, 0.4, facecolor='#795548', edgecolor='black', linewidth=1.5)) # Brown
+            # Top right beam
+            axs[1, 1].add_patch(patches.Rectangle((6.5, 5), 2.5, 0.4, facecolor='#795548', edgecolor='black', linewidth=1.5)) # Brown
+            # Transversal beam (passing over the pillar)
+            axs[1, 1].add_patch(patches.Rectangle((2, 5.4), 6, 0.4, facecolor='#795548', edgecolor='black', linewidth=1.5)) # Brown
+            axs[1, 1].text(5, 5.2, 'Vigas', ha='center', va='center', fontsize=12, color='white', fontweight='bold')
+
+            # Slab
+            laje_rect = patches.Rectangle((1.5, 5.8), 7, 0.4, facecolor='#9E9E9E', edgecolor='black', linewidth=1.5) # Light gray
+            axs[1, 1].add_patch(laje_rect)
+            axs[1, 1].text(5.0, 6.0, 'Laje', ha='center', va='center', fontsize=12, color='black', fontweight='bold')
+
+            axs[1, 1].set_title(TITULO_ESQUEMA, fontsize=14, fontweight='bold')
+
+            fig.tight_layout(pad=3.0) # Add padding to avoid cropping
+
+            buf = io.BytesIO()
+            fig.savefig(buf, format='png', bbox_inches='tight', facecolor='white', dpi=100)
+            return buf.getvalue()
+        finally:
+            plt.close(fig)
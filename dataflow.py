@@ -0,0 +1,145 @@
+import asyncio
+import inspect
+import sys
+from collections import OrderedDict
+
+from metrics import ERRORS, STAGE_SECONDS
+
+
+class Stage:
+    """
+    Etapa do fluxo de cálculo: uma função das entradas nomeadas que produz um valor nomeado.
+
+    Parameters:
+    - name (str): Name of the value the stage produces (other stages can use it as an input).
+    - function (callable): Called with the input values in order; may be a coroutine function.
+    - inputs (tuple): Names of the inputs or stage outputs the function reads.
+    - memoize (int): Number of recent results kept by input values (0 for stages with side effects).
+    """
+
+    def __init__(self, name, function, inputs, memoize=32):
+        self.name = name
+        self.function = function
+        self.inputs = tuple(inputs)
+        self.memoize = memoize
+        self.results = OrderedDict()  # input values -> output, in LRU order
+
+    async def compute(self, args):
+        if args in self.results:
+            self.results.move_to_end(args)
+            return self.results[args]
+        with STAGE_SECONDS.time(stage='dataflow', step=self.name):
+            output = self.function(*args)
+            if inspect.isawaitable(output):
+                output = await output
+        if self.memoize:
+            self.results[args] = output
+            while len(self.results) > self.memoize:
+                self.results.popitem(last=False)
+        return output
+
+
+class Dataflow:
+    """
+    Grafo de dependências entre as entradas e as etapas do cálculo, recalculado de forma incremental.
+
+    Inputs are set with `set`; every stage that reads a changed value, directly or through
+    another stage, is marked dirty and recomputed by `run` in declaration order (stages can
+    only read values declared before them, so the order is topological). A stage whose
+    output did not change does not dirty the stages after it, and memoized stages answer
+    repeated input values from their recent results. `set` runs the flow after `debounce`
+    seconds without further changes, so fast edits cause a single recomputation.
+
+    A stage is skipped (and stays dirty) while any of its inputs is None, e.g. an empty
+    field; a stage that raises keeps its previous output.
+
+    Parameters:
+    - debounce (float): Quiet time in seconds before `set` triggers a run (0 runs on the next loop turn).
+    """
+
+    def __init__(self, debounce=0.3):
+        self.debounce = debounce
+        self.stages = []
+        self.values = {}
+        self.dirty = set()  # Changed inputs and stages not computed yet
+        self._timer = None
+        self._lock = asyncio.Lock()
+
+    def stage(self, name, function, inputs, memoize=32):
+        """
+        Declara uma etapa; as entradas devem ser entradas do fluxo ou etapas já declaradas.
+        """
+        if any(name == stage.name or name in stage.inputs for stage in self.stages):
+            raise ValueError(f'Stage {name!r} already declared or read by an earlier stage')
+        stage = Stage(name, function, inputs, memoize)
+        self.stages.append(stage)
+        self.dirty.add(name)  # Computed on the first run
+        return stage
+
+    def seed(self, **inputs):
+        """
+        Define valores de entrada sem agendar um recálculo (e.g. os valores iniciais dos campos).
+        """
+        for name, value in inputs.items():
+            if self.values.get(name, object()) != value:
+                self.values[name] = value
+                self.dirty.add(name)
+
+    def set(self, **inputs):
+        """
+        Altera entradas e agenda o recálculo das etapas afetadas depois do intervalo de debounce.
+        """
+        self.seed(**inputs)
+        self.cancel()
+        self._timer = asyncio.get_running_loop().create_task(self._run_later())
+
+    def cancel(self):
+        """
+        Cancela o recálculo agendado, se houver (e.g. quando a página é fechada).
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def _run_later(self):
+        await asyncio.sleep(self.debounce)
+        self._timer = None  # From here on a new change schedules another run instead of cancelling this one
+        try:
+            await self.run()
+        except Exception as e:
+            sys.stderr.write(f"Error running the dataflow: {e}\n")
+
+    async def run(self):
+        """
+        Recalcula as etapas sujas, em ordem, propagando só as saídas que mudaram.
+
+        Changes made while a run is in progress are picked up by the next run.
+
+        Returns:
+        - list: Names of the stages that were (re)computed or answered from memo.
+        """
+        async with self._lock:
+            changed, self.dirty = self.dirty, set()
+            computed = []
+            for stage in self.stages:
+                if stage.name not in changed and changed.isdisjoint(stage.inputs):
+                    continue
+                args = tuple(self.values.get(name) for name in stage.inputs)
+                if any(value is None for value in args):
+                    self.dirty.add(stage.name)  # Incomplete inputs: retry when they are filled in
+                    continue
+                try:
+                    output = await stage.compute(args)
+                except Exception as e:
+                    ERRORS.inc(source='dataflow', stage=stage.name)
+                    sys.stderr.write(f"Error in dataflow stage {stage.name}: {e}\n")
+                    self.dirty.add(stage.name)  # Retried on the next run
+                    changed.discard(stage.name)
+                    continue
+                computed.append(stage.name)
+                if stage.name not in self.values or self.values[stage.name] != output:
+                    self.values[stage.name] = output
+                    changed.add(stage.name)
+                else:
+                    changed.discard(stage.name)
+            return computed
@@ -0,0 +1,379 @@
+import json
+import struct
+
+import numpy as np
+
+# --- glTF Constants ---
+BYTE = 5120
+UNSIGNED_BYTE = 5121
+SHORT = 5122
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+FLOAT = 5126
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+COMPONENT_TYPES = {
+    np.dtype(np.int8): BYTE,
+    np.dtype(np.uint8): UNSIGNED_BYTE,
+    np.dtype(np.int16): SHORT,
+    np.dtype(np.uint16): UNSIGNED_SHORT,
+    np.dtype(np.uint32): UNSIGNED_INT,
+    np.dtype(np.float32): FLOAT,
+}
+ACCESSOR_TYPES = {1: 'SCALAR', 2: 'VEC2', 3: 'VEC3', 4: 'VEC4'}
+
+GLB_MAGIC = b'glTF'
+GLB_VERSION = 2
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+
+def pad4(length):
+    return (4 - length % 4) % 4
+
+
+def glb_header(json_bytes, bin_length):
+    """
+    Retorna o cabeçalho GLB e o chunk JSON (com padding), seguidos do cabeçalho do chunk BIN.
+
+    The BIN chunk payload itself (bin_length bytes plus padding) must follow.
+    """
+    json_bytes = json_bytes + b' ' * pad4(len(json_bytes))
+    bin_padded = bin_length + pad4(bin_length)
+    total = 12 + 8 + len(json_bytes) + (8 + bin_padded if bin_length else 0)
+    parts = [
+        struct.pack('<4sII', GLB_MAGIC, GLB_VERSION, total),
+        struct.pack('<II', len(json_bytes), CHUNK_JSON),
+        json_bytes,
+    ]
+    if bin_length:
+        parts.append(struct.pack('<II', bin_padded, CHUNK_BIN))
+    return b''.join(parts)
+
+
+def pack_glb(gltf, binary):
+    """
+    Monta um arquivo GLB a partir do dicionário glTF e do buffer binário.
+    """
+    json_bytes = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    return glb_header(json_bytes, len(binary)) + binary + b'\0' * pad4(len(binary))
+
+
+def index_array(indices, vertex_count):
+    # Smallest index type that can address every vertex
+    return np.ascontiguousarray(indices, dtype=np.uint16 if vertex_count <= 0xFFFF else np.uint32)
+
+
+class GLBBuilder:
+    """
+    Monta um documento glTF 2.0 com um único buffer binário e o serializa como GLB.
+
+    Arrays are appended to the binary buffer in order, each in its own 4-byte aligned buffer
+    view, and referenced through accessors. Only what the building exporters need is covered.
+    Accessors added with `add_streamed_accessor` only declare their size: their data is pulled
+    from an iterable while `iter_bytes` writes the file, so it never has to be held at once.
+    """
+
+    def __init__(self):
+        self.gltf = {
+            'asset': {'version': '2.0', 'generator': 'STAMADE building_model'},
+            'scene': 0,
+            'scenes': [{'nodes': []}],
+            'nodes': [],
+            'meshes': [],
+            'materials': [],
+            'accessors': [],
+            'bufferViews': [],
+        }
+        self.chunks = []
+        self.byte_length = 0
+
+    def use_extension(self, name, required=False):
+        used = self.gltf.setdefault('extensionsUsed', [])
+        if name not in used:
+            used.append(name)
+        if required:
+            required_list = self.gltf.setdefault('extensionsRequired', [])
+            if name not in required_list:
+                required_list.append(name)
+
+    def add_buffer_view(self, data, target=None):
+        data = bytes(data)
+        view = {'buffer': 0, 'byteOffset': self.byte_length, 'byteLength': len(data)}
+        if target is not None:
+            view['target'] = target
+        self.chunks.append(data + b'\0' * pad4(len(data)))
+        self.byte_length += len(data) + pad4(len(data))
+        self.gltf['bufferViews'].append(view)
+        return len(self.gltf['bufferViews']) - 1
+
+    def add_streamed_accessor(self, chunks, count, dtype, components, target=None):
+        """
+        Adiciona um accessor cujos dados vêm de `chunks` só na escrita do arquivo (sem min/max).
+
+        Parameters:
+        - chunks (iterable): NumPy arrays of `dtype` whose rows add up to exactly `count`.
+        - count (int): Number of elements of the accessor.
+        - dtype (np.dtype): glTF-compatible dtype of the data.
+        - components (int): Components per element (1 to 4).
+        - target (int | None): Buffer view target (ARRAY_BUFFER or ELEMENT_ARRAY_BUFFER).
+        """
+        dtype = np.dtype(dtype)
+        byte_length = count * components * dtype.itemsize
+        view = {'buffer': 0, 'byteOffset': self.byte_length, 'byteLength': byte_length}
+        if target is not None:
+            view['target'] = target
+        self.chunks.append((chunks, byte_length))
+        self.byte_length += byte_length + pad4(byte_length)
+        self.gltf['bufferViews'].append(view)
+        self.gltf['accessors'].append({
+            'bufferView': len(self.gltf['bufferViews']) - 1,
+            'componentType': COMPONENT_TYPES[dtype],
+            'count': count,
+            'type': ACCESSOR_TYPES[components],
+        })
+        return len(self.gltf['accessors']) - 1
+
+    def add_accessor(self, array, target=None, normalized=False, bounds=False):
+        """
+        Adiciona um array NumPy (N,) ou (N, k) ao buffer e retorna o índice do accessor.
+
+        Parameters:
+        - array (np.ndarray): Data with a glTF-compatible dtype (int8/int16/uint16/uint32/float32).
+        - target (int | None): Buffer view target (ARRAY_BUFFER or ELEMENT_ARRAY_BUFFER).
+        - normalized (bool): Whether integer values map to [-1, 1] / [0, 1].
+        - bounds (bool): Whether to record per-component min/max (required for POSITION).
+        """
+        array = np.ascontiguousarray(array)
+        components = 1 if array.ndim == 1 else array.shape[1]
+        accessor = {
+            'bufferView': self.add_buffer_view(array.tobytes(), target),
+            'componentType': COMPONENT_TYPES[array.dtype],
+            'count': len(array),
+            'type': ACCESSOR_TYPES[components],
+        }
+        if normalized:
+            accessor['normalized'] = True
+        if bounds:
+            flat = array.reshape(len(array), components)
+            cast = float if array.dtype.kind == 'f' else int
+            accessor['min'] = [cast(v) for v in flat.min(axis=0)]
+            accessor['max'] = [cast(v) for v in flat.max(axis=0)]
+        self.gltf['accessors'].append(accessor)
+        return len(self.gltf['accessors']) - 1
+
+    def add_material(self, base_color, metallic, roughness):
+        self.gltf['materials'].append({
+            'pbrMetallicRoughness': {
+                'baseColorFactor': [float(c) for c in base_color],
+                'metallicFactor': float(metallic),
+                'roughnessFactor': float(roughness),
+            },
+        })
+        return len(self.gltf['materials']) - 1
+
+    def add_mesh(self, attributes, indices, material=None, name=None):
+        primitive = {'attributes': attributes, 'indices': indices, 'mode': 4}
+        if material is not None:
+            primitive['material'] = material
+        mesh = {'primitives': [primitive]}
+        if name:
+            mesh['name'] = name
+        self.gltf['meshes'].append(mesh)
+        return len(self.gltf['meshes']) - 1
+
+    def add_node(self, root=True, **node):
+        self.gltf['nodes'].append(node)
+        index = len(self.gltf['nodes']) - 1
+        if root:
+            self.gltf['scenes'][0]['nodes'].append(index)
+        return index
+
+    def document(self):
+        gltf = {key: value for key, value in self.gltf.items() if value != []}
+        if self.byte_length:
+            gltf['buffers'] = [{'byteLength': self.byte_length}]
+        return gltf
+
+    def header(self):
+        return glb_header(json.dumps(self.document(), separators=(',', ':')).encode('utf-8'), self.byte_length)
+
+    def byte_size(self):
+        """
+        Retorna o tamanho total do arquivo GLB, conhecido antes de qualquer dado em streaming.
+        """
+        return len(self.header()) + self.byte_length + pad4(self.byte_length)
+
+    def iter_bytes(self):
+        """
+        Escreve o GLB em partes: cabeçalho e chunk JSON, depois o chunk BIN buffer view por buffer view.
+
+        Raises:
+        - ValueError: If a streamed accessor yields more or less data than it declared.
+        """
+        yield self.header()
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                yield chunk
+                continue
+            arrays, byte_length = chunk
+            written = 0
+            for array in arrays:
+                data = np.ascontiguousarray(array).tobytes()
+                written += len(data)
+                if written > byte_length:
+                    break
+                yield data
+            if written != byte_length:
+                raise ValueError(f'Streamed buffer view has {written} bytes, {byte_length} declared')
+            yield b'\0' * pad4(byte_length)
+
+    def to_bytes(self):
+        return b''.join(self.iter_bytes())
+
+
+# --- Reading and Rewriting ---
+DTYPES = {component: dtype for dtype, component in COMPONENT_TYPES.items()}
+COMPONENT_COUNTS = {name: count for count, name in ACCESSOR_TYPES.items()}
+
+
+def read_glb(data):
+    """
+    Separa um arquivo GLB em dicionário glTF e buffer binário.
+
+    Returns:
+    - tuple(dict, bytes): (gltf, binary); binary is empty if the file has no BIN chunk.
+    """
+    magic, version, total = struct.unpack_from('<4sII', data, 0)
+    if magic != GLB_MAGIC or version != GLB_VERSION:
+        raise ValueError('Not a glTF 2.0 binary file')
+    json_length, json_type = struct.unpack_from('<II', data, 12)
+    if json_type != CHUNK_JSON:
+        raise ValueError('First GLB chunk is not JSON')
+    gltf = json.loads(data[20:20 + json_length])
+    binary = b''
+    offset = 20 + json_length
+    if offset + 8 <= total:
+        bin_length, bin_type = struct.unpack_from('<II', data, offset)
+        if bin_type == CHUNK_BIN:
+            binary = data[offset + 8:offset + 8 + bin_length]
+    return gltf, binary
+
+
+def accessor_array(gltf, binary, index):
+    """
+    Retorna os dados de um accessor (sem byteStride nem sparse) como array NumPy (N,) ou (N, k).
+    """
+    accessor = gltf['accessors'][index]
+    view = gltf['bufferViews'][accessor['bufferView']]
+    if 'byteStride' in view or 'sparse' in accessor:
+        raise ValueError('Interleaved or sparse accessors are not supported')
+    components = COMPONENT_COUNTS[accessor['type']]
+    dtype = DTYPES[accessor['componentType']]
+    offset = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+    array = np.frombuffer(binary, dtype=dtype, count=accessor['count'] * components, offset=offset)
+    return array if components == 1 else array.reshape(-1, components)
+
+
+def rebuild_glb(gltf, binary, replacements):
+    """
+    Regrava o GLB copiando todos os accessors na mesma ordem, trocando os dados dos índices em
+    `replacements` ({accessor index: (array, normalized)}). Node/mesh JSON is kept as given.
+    """
+    builder = GLBBuilder()
+    builder.gltf = {key: value for key, value in gltf.items() if key not in ('accessors', 'bufferViews', 'buffers')}
+    builder.gltf['accessors'] = []
+    builder.gltf['bufferViews'] = []
+    for index, accessor in enumerate(gltf.get('accessors', [])):
+        target = gltf['bufferViews'][accessor['bufferView']].get('target')
+        if index in replacements:
+            array, normalized = replacements[index]
+        else:
+            array, normalized = accessor_array(gltf, binary, index), accessor.get('normalized', False)
+        builder.add_accessor(array, target, normalized=normalized, bounds='min' in accessor)
+    return builder.to_bytes()
+
+
+def quantize_positions(positions, offset, scale):
+    return np.round((positions - offset) / scale).astype(np.int16)
+
+
+def quantize_glb(data):
+    """
+    Converte um GLB para KHR_mesh_quantization: posições (e translações de instâncias) em int16
+    e normais em int8 normalizado. A desquantização vai na transformação (translation/scale) do nó.
+
+    Index buffers are narrowed to uint16 where possible. Only nodes with at most a translation
+    and no children are rewritten; files with embedded images, or where quantizing would not
+    shrink the file, are returned unchanged.
+
+    Returns:
+    - bytes: The quantized GLB content.
+    """
+    gltf, binary = read_glb(data)
+    if gltf.get('images') or not gltf.get('meshes'):
+        return data
+
+    nodes_by_mesh = {}
+    for node in gltf.get('nodes', []):
+        if 'mesh' in node:
+            nodes_by_mesh.setdefault(node['mesh'], []).append(node)
+
+    replacements = {}
+    for mesh_index, nodes in nodes_by_mesh.items():
+        if any(set(node) - {'mesh', 'name', 'translation', 'extensions', 'extras'} for node in nodes):
+            continue
+        instanced = [node for node in nodes if 'EXT_mesh_gpu_instancing' in node.get('extensions', {})]
+        if instanced and len(nodes) > 1:
+            continue
+        primitives = gltf['meshes'][mesh_index]['primitives']
+        positions = [accessor_array(gltf, binary, p['attributes']['POSITION']).astype(np.float64) for p in primitives]
+        lo = np.min([p.min(axis=0) for p in positions], axis=0)
+        hi = np.max([p.max(axis=0) for p in positions], axis=0)
+
+        if instanced:
+            # Vertices and instance translations share the node scale: world = O + S * (t_q + v_q)
+            instancing = nodes[0]['extensions']['EXT_mesh_gpu_instancing']['attributes']
+            translations = accessor_array(gltf, binary, instancing['TRANSLATION']).astype(np.float64)
+            t_lo, t_hi = translations.min(axis=0), translations.max(axis=0)
+            origin = (t_lo + t_hi) / 2
+            half_range = (t_hi - t_lo) / 2 + np.maximum(np.abs(lo), np.abs(hi))
+            vertex_offset = 0.0
+        else:
+            origin = (lo + hi) / 2
+            half_range = (hi - lo) / 2
+            vertex_offset = origin
+        scale = np.where(half_range > 0, half_range / 32767, 1.0)
+
+        for primitive, primitive_positions in zip(primitives, positions):
+            if 'indices' in primitive:
+                indices = accessor_array(gltf, binary, primitive['indices'])
+                if indices.dtype == np.uint32 and len(primitive_positions) <= 0xFFFF:
+                    replacements[primitive['indices']] = (index_array(indices, len(primitive_positions)), False)
+            replacements[primitive['attributes']['POSITION']] = (
+                quantize_positions(primitive_positions, vertex_offset, scale), False)
+            if 'NORMAL' in primitive['attributes']:
+                normals = accessor_array(gltf, binary, primitive['attributes']['NORMAL'])
+                replacements[primitive['attributes']['NORMAL']] = (
+                    np.round(np.clip(normals, -1, 1) * 127).astype(np.int8), True)
+        if instanced:
+            replacements[instancing['TRANSLATION']] = (quantize_positions(translations, origin, scale), False)
+
+        for node in nodes:
+            translation = np.asarray(node.get('translation', [0.0, 0.0, 0.0])) + origin
+            node['translation'] = [float(v) for v in translation]
+            node['scale'] = [float(v) for v in scale]
+
+    if not replacements:
+        return data
+    extensions = gltf.setdefault('extensionsUsed', [])
+    if 'KHR_mesh_quantization' not in extensions:
+        extensions.append('KHR_mesh_quantization')
+    required = gltf.setdefault('extensionsRequired', [])
+    if 'KHR_mesh_quantization' not in required:
+        required.append('KHR_mesh_quantization')
+    quantized = rebuild_glb(gltf, binary, replacements)
+    # Per-node dequantization transforms can outweigh the savings (e.g. one node per element)
+    return quantized if len(quantized) < len(data) else data
@@ -0,0 +1,210 @@
+import mmap
+import os
+
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# Content-addressed URLs never change meaning, so browsers and proxies may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class UncompressedPaths:
+    """
+    Middleware ASGI que impede a compressão das respostas sob os prefixos de caminho informados.
+
+    Added outside the GZip middleware, it drops the request's Accept-Encoding for those paths,
+    so their bodies go out as-is: Content-Length and Content-Range keep describing the bytes
+    sent, and already compact binaries (PNG, GLB) are not compressed again on every request.
+
+    Parameters:
+    - app: The wrapped ASGI application.
+    - prefixes (tuple(str)): URL path prefixes served uncompressed (e.g. '/model/').
+    """
+
+    def __init__(self, app, prefixes=()):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].startswith(self.prefixes):
+            scope = {**scope, 'headers': [(name, value) for name, value in scope['headers'] if name != b'accept-encoding']}
+        await self.app(scope, receive, send)
+
+
+def etag_for(content_id):
+    return f'"{content_id}"'
+
+
+def etag_matches(request, etag):
+    """
+    Verifica se o cabeçalho If-None-Match da requisição contém a ETag informada.
+    """
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in header.split(',')]
+    return etag in tags or f'W/{etag}' in tags
+
+
+def parse_range(header, size):
+    """
+    Interpreta um cabeçalho Range de intervalo único ("bytes=start-end", "bytes=start-" ou "bytes=-suffix").
+
+    Returns:
+    - tuple(int, int): Inclusive (start, end) byte positions.
+    - None: If the header is absent, malformed or asks for several ranges (serve the full body).
+
+    Raises:
+    - ValueError: If the range cannot be satisfied for a body of `size` bytes.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start_text, sep, end_text = header[len('bytes='):].strip().partition('-')
+    if not sep or not all(text == '' or text.isdigit() for text in (start_text, end_text)):
+        return None
+    if start_text == '':
+        if end_text == '':
+            return None
+        suffix = int(end_text)
+        if suffix == 0:
+            raise ValueError('range not satisfiable')
+        return max(0, size - suffix), size - 1
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if start >= size:
+        raise ValueError('range not satisfiable')
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def negotiate_variant(request, requested, variants, default='raw'):
+    """
+    Escolhe a variante de um artefato pelo parâmetro de query ou pelo cabeçalho Accept.
+
+    The query parameter wins; otherwise a `variant=<name>` media-type parameter in Accept
+    (e.g. "model/gltf-binary; variant=quantized") is honored. Unknown names fall back to `default`.
+    """
+    if requested in variants:
+        return requested
+    for media_range in request.headers.get('accept', '').split(','):
+        for parameter in media_range.split(';')[1:]:
+            name, _, value = parameter.partition('=')
+            if name.strip() == 'variant' and value.strip().strip('"') in variants:
+                return value.strip().strip('"')
+    return default
+
+
+def conditional_range(request, size, headers):
+    """
+    Resolve as partes comuns de uma resposta endereçada por conteúdo: 304, 416 ou o intervalo pedido.
+
+    `headers` must already hold the ETag; Content-Range is added to it when relevant.
+
+    Returns:
+    - tuple(Response | None, tuple(int, int) | None): A finished 304/416 response, or None and the
+      inclusive byte range to send (None for the full body).
+    """
+    etag = headers['ETag']
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers), None
+
+    if_range = request.headers.get('if-range')
+    try:
+        byte_range = parse_range(request.headers.get('range'), size) if if_range in (None, etag) else None
+    except ValueError:
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status_code=416, headers=headers), None
+    if byte_range is not None:
+        headers['Content-Range'] = f'bytes {byte_range[0]}-{byte_range[1]}/{size}'
+    return None, byte_range
+
+
+def cached_response(request, data, media_type, content_id, headers=None):
+    """
+    Monta a resposta de um artefato endereçado por conteúdo com ETag, Cache-Control imutável,
+    respostas condicionais 304 e requisições parciais (Range / 206).
+
+    Parameters:
+    - request (Request): The incoming request (for If-None-Match and Range).
+    - data (bytes): The full artifact.
+    - media_type (str): Content type of the artifact.
+    - content_id (str): Content hash used as the ETag.
+    - headers (dict | None): Extra response headers (e.g. Vary).
+
+    A 206 must carry the bytes its Content-Range describes, not a gzip stream of them: serve
+    these routes through `UncompressedPaths`.
+    """
+    headers = {'ETag': etag_for(content_id), 'Cache-Control': IMMUTABLE_CACHE_CONTROL, 'Accept-Ranges': 'bytes', **(headers or {})}
+    response, byte_range = conditional_range(request, len(data), headers)
+    if response is not None:
+        return response
+    if byte_range is None:
+        return Response(content=data, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
+# Size of the slices copied out of a memory-mapped file per body chunk (Range requests)
+FILE_CHUNK_SIZE = 256 * 1024
+
+
+def cached_file_response(request, path, media_type, content_id, headers=None):
+    """
+    Como `cached_response`, mas serve o artefato direto de um arquivo no disco.
+
+    Full bodies are sent with a FileResponse, which reads the file off the event loop in
+    fixed-size chunks (or hands it to the server when it supports path sending); ranges are
+    streamed from a memory mapping in FILE_CHUNK_SIZE slices. Either way a large file is never
+    loaded into the Python heap as a whole.
+
+    Returns:
+    - Response: The 200/206/304/416 response.
+    - None: If the file no longer exists (the caller decides how to fall back).
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        stat_result = os.fstat(f.fileno())
+        size = stat_result.st_size
+        headers = {'ETag': etag_for(content_id), 'Cache-Control': IMMUTABLE_CACHE_CONTROL, 'Accept-Ranges': 'bytes',
+                   **(headers or {})}
+        response, byte_range = conditional_range(request, size, headers)
+        if response is not None:
+            return response
+        if byte_range is None:
+            return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+        # The mapping keeps the range readable even if the file is removed while it is sent
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    start, end = byte_range
+    headers['Content-Length'] = str(end - start + 1)
+
+    def chunks():
+        try:
+            for offset in range(start, end + 1, FILE_CHUNK_SIZE):
+                yield view[offset:min(offset + FILE_CHUNK_SIZE, end + 1)]
+        finally:
+            view.close()
+
+    return StreamingResponse(chunks(), status_code=206, media_type=media_type, headers=headers)
+
+
+def streamed_response(request, chunks, size, media_type, content_id, headers=None):
+    """
+    Como `cached_response`, mas o corpo é produzido enquanto é enviado (e.g. um GLB sendo gerado).
+
+    The total `size` must be known up front; it is sent as Content-Length. If-None-Match
+    is honored, but Range requests get the whole body (the bytes do not exist yet to seek in).
+    `chunks` is only consumed if a body is actually sent. A gzipped stream would drop the
+    Content-Length, so the route belongs under `UncompressedPaths`.
+    """
+    headers = {'ETag': etag_for(content_id), 'Cache-Control': IMMUTABLE_CACHE_CONTROL, **(headers or {})}
+    if etag_matches(request, headers['ETag']):
+        return Response(status_code=304, headers=headers)
+    headers['Content-Length'] = str(size)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
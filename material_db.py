@@ -0,0 +1,221 @@
+import os
+import sys
+import unicodedata
+
+import numpy as np
+
+MATERIAIS = ['Madeira', 'Concreto', 'Aço']
+
+# --- Workbook Layout ---
+# One row per (scenario, material): the scenario is the slab type that was calculated
+# ('Padrão' for the default), the material is the one the row's cost/carbon/weight refer to
+DATABASE_SHEET = 'Materiais'
+TEXT_COLUMNS = ('cenario', 'material')
+VALUE_COLUMNS = ('custo', 'carbono', 'peso')
+DEFAULT_SCENARIO = 'Padrão'
+# Optional per-m³ rates of each material (read from its default-scenario row), used by the optimizer.
+# custo/carbono/peso above are chart totals per scenario, not rates
+RATE_COLUMNS = ('custo_m3', 'carbono_m3', 'peso_m3')
+
+# Built-in values used while Database.xlsx is not available
+DEFAULT_ROWS = {
+    DEFAULT_SCENARIO: {'custo': [10000, 15000, 20000], 'carbono': [500, 1000, 1500], 'peso': [1000, 2000, 3000]},
+    'Madeira': {'custo': [9000, 16000, 21000], 'carbono': [400, 1100, 1600], 'peso': [900, 2100, 3100]},
+    'Concreto': {'custo': [18000, 12000, 19000], 'carbono': [1200, 600, 1400], 'peso': [2500, 1500, 2800]},
+    'Aço': {'custo': [15000, 18000, 10000], 'carbono': [1100, 1300, 500], 'peso': [1800, 2200, 1200]},
+}
+
+# Illustrative per-m³ rates (R$/m³, kg CO2e/m³, kg/m³) for materials the workbook gives none for
+DEFAULT_RATES = {'Madeira': (3500.0, 120.0, 500.0), 'Concreto': (2000.0, 350.0, 2500.0), 'Aço': (60000.0, 12000.0, 7850.0)}
+
+
+def normalize_name(name):
+    # Header and lookup matching ignores case, accents and surrounding spaces ("Cenário" == "cenario")
+    text = unicodedata.normalize('NFKD', str(name).strip().lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def default_columns():
+    """
+    Retorna a base embutida no formato colunar (um array NumPy por coluna).
+    """
+    rows = [(scenario, material, *(values[column][index] for column in VALUE_COLUMNS))
+            for scenario, values in DEFAULT_ROWS.items() for index, material in enumerate(MATERIAIS)]
+    columns = list(zip(*rows))
+    return {
+        **{name: np.array(columns[i], dtype=str) for i, name in enumerate(TEXT_COLUMNS)},
+        **{name: np.array(columns[i + len(TEXT_COLUMNS)], dtype=np.float64) for i, name in enumerate(VALUE_COLUMNS)},
+        **{name: np.full(len(rows), np.nan) for name in RATE_COLUMNS},  # DEFAULT_RATES apply
+    }
+
+
+def read_workbook(path):
+    """
+    Lê a planilha de materiais do Excel (custo, carbono e peso por cenário e material) em colunas NumPy.
+
+    The RATE_COLUMNS are optional; rows without them read as NaN.
+
+    Raises:
+    - ValueError: If the sheet lacks one of the expected columns.
+    """
+    import pandas as pd  # Only needed when the workbook has to be parsed
+
+    frame = pd.read_excel(path, sheet_name=DATABASE_SHEET, engine='openpyxl')
+    frame.columns = [normalize_name(column) for column in frame.columns]
+    missing = [column for column in TEXT_COLUMNS + VALUE_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Sheet '{DATABASE_SHEET}' of {path} is missing columns: {', '.join(missing)}")
+    frame = frame.dropna(subset=['material'])
+    frame['cenario'] = frame['cenario'].fillna(DEFAULT_SCENARIO)
+    return {
+        **{name: frame[name].astype(str).str.strip().to_numpy(dtype=str) for name in TEXT_COLUMNS},
+        **{name: pd.to_numeric(frame[name], errors='coerce').fillna(0).to_numpy(dtype=np.float64) for name in VALUE_COLUMNS},
+        **{name: pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=np.float64) if name in frame.columns
+           else np.full(len(frame), np.nan) for name in RATE_COLUMNS},
+    }
+
+
+class MaterialDatabase:
+    """
+    Base de materiais carregada de Database.xlsx, com cache colunar em disco e consultas indexadas.
+
+    The workbook is parsed with openpyxl once; its columns are then saved as a NumPy .npz
+    next to it, tagged with the workbook's mtime and size. Later loads (in this or any other
+    process) read the .npz instead, until the workbook changes. Without a workbook the
+    built-in DEFAULT_ROWS are used. `refresh()` is a single stat call, cheap enough to run
+    before every lookup.
+
+    Parameters:
+    - path (str): Excel workbook.
+    - cache_path (str | None): Columnar cache file; defaults to `<path>.npz`.
+    """
+
+    def __init__(self, path='Database.xlsx', cache_path=None):
+        self.path = path
+        self.cache_path = cache_path or f'{path}.npz'
+        self.source = None   # 'workbook', 'cache' or 'defaults'
+        self.columns = {}
+        self._signature = False  # (mtime_ns, size) of the loaded workbook; None for the defaults
+        self._index = {}        # (scenario, material) -> row
+        self._by_material = {}  # material -> rows
+
+    def refresh(self):
+        """
+        Recarrega a base se a planilha mudou (ou surgiu/sumiu) desde a última carga.
+        """
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature != self._signature:
+            self._load(signature)
+        return self
+
+    def _load(self, signature):
+        columns, source = None, 'defaults'
+        if signature is not None:
+            columns, source = self._read_cache(signature), 'cache'
+            if columns is None:
+                try:
+                    columns, source = read_workbook(self.path), 'workbook'
+                    self._write_cache(columns, signature)
+                except Exception as e:
+                    sys.stderr.write(f"Error reading material database {self.path}: {e}\n")
+                    columns, source = None, 'defaults'
+        if columns is None:
+            columns = default_columns()
+        self.columns, self.source, self._signature = columns, source, signature
+        self._build_index()
+
+    def _read_cache(self, signature):
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as cached:
+                if tuple(cached['signature'].tolist()) != signature:
+                    return None
+                return {name: cached[name] for name in TEXT_COLUMNS + VALUE_COLUMNS + RATE_COLUMNS}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _write_cache(self, columns, signature):
+        # Write then rename, so a concurrent reader never sees a partial cache
+        temp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                np.savez(f, signature=np.array(signature, dtype=np.int64), **columns)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            sys.stderr.write(f"Could not write material cache {self.cache_path}: {e}\n")
+
+    def _build_index(self):
+        scenarios = [normalize_name(value) for value in self.columns['cenario']]
+        materials = [normalize_name(value) for value in self.columns['material']]
+        self._index = {key: row for row, key in enumerate(zip(scenarios, materials))}
+        self._by_material = {}
+        for row, material in enumerate(materials):
+            self._by_material.setdefault(material, []).append(row)
+        self._by_material = {material: np.array(rows) for material, rows in self._by_material.items()}
+
+    def lookup(self, material, scenario=DEFAULT_SCENARIO):
+        """
+        Retorna custo, carbono e peso de um material em um cenário.
+
+        Returns:
+        - dict: {'custo', 'carbono', 'peso'} as floats.
+        - None: If the database has no such row.
+        """
+        row = self._index.get((normalize_name(scenario), normalize_name(material)))
+        if row is None:
+            return None
+        return {name: float(self.columns[name][row]) for name in VALUE_COLUMNS}
+
+    def rows_for_material(self, material):
+        """
+        Retorna as colunas de todas as linhas de um material (um array por coluna, vazio se não houver).
+        """
+        rows = self._by_material.get(normalize_name(material), np.array([], dtype=np.int64))
+        return {name: values[rows] for name, values in self.columns.items()}
+
+    def series(self, scenario, materials=MATERIAIS):
+        """
+        Retorna as séries (custos, carbono, peso) de um cenário, na ordem de `materials`.
+
+        Scenarios without rows fall back to the default scenario; missing materials count as 0.
+        """
+        if not any((normalize_name(scenario), normalize_name(material)) in self._index for material in materials):
+            scenario = DEFAULT_SCENARIO
+        values = [self.lookup(material, scenario) or dict.fromkeys(VALUE_COLUMNS, 0.0) for material in materials]
+        return tuple([value[name] for value in values] for name in VALUE_COLUMNS)
+
+    def rates(self, materials=MATERIAIS):
+        """
+        Retorna as taxas por m³ (custo, carbono, peso) de cada material, na ordem de `materials`.
+
+        Rates come from the RATE_COLUMNS of the material's default-scenario row; a material
+        without all three takes its DEFAULT_RATES (or zeros for an unknown material).
+
+        Returns:
+        - tuple(list, bool): One [custo, carbono, peso] list per material, and whether every
+          rate came from the workbook (False means the result is illustrative).
+        """
+        rates, from_workbook = [], True
+        for material in materials:
+            row = self._index.get((normalize_name(DEFAULT_SCENARIO), normalize_name(material)))
+            values = [float(self.columns[name][row]) for name in RATE_COLUMNS] if row is not None else []
+            if len(values) < len(RATE_COLUMNS) or not np.all(np.isfinite(values)):
+                values, from_workbook = list(DEFAULT_RATES.get(material, (0.0,) * len(RATE_COLUMNS))), False
+            rates.append(values)
+        return rates, from_workbook
+
+
+_databases = {}
+
+
+def get_database(path='Database.xlsx'):
+    """
+    Retorna a base de materiais do processo para `path`, recarregada se a planilha mudou.
+    """
+    database = _databases.get(path)
+    if database is None:
+        database = _databases[path] = MaterialDatabase(path)
+    return database.refresh()
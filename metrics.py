@@ -0,0 +1,244 @@
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond cache hits to multi-second renders
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Observations made inside a worker process call, shipped back to the app process (see `call_recorded`)
+_recording = threading.local()
+
+
+def format_labels(labels, extra=None):
+    items = list(labels) + list(extra or ())
+    if not items:
+        return ''
+    escaped = (f'{name}="{escape_label(value)}"' for name, value in items)
+    return '{' + ','.join(escaped) + '}'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Histograma de latência no formato Prometheus, com rótulos.
+
+    Parameters:
+    - name (str): Metric name (e.g. 'stamade_stage_seconds').
+    - documentation (str): HELP text.
+    - buckets (tuple): Upper bounds in seconds (+Inf is added).
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        recording = getattr(_recording, 'samples', None)
+        if recording is not None:
+            recording.append((self.name, key, value))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[bisect_left(self.buckets, value)] += 1  # Non-cumulative here, summed on export
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """
+        Decorador que observa a duração de cada chamada (funções síncronas ou assíncronas).
+
+        The wrapper keeps the wrapped signature, so it can decorate FastAPI route handlers.
+        """
+        def decorator(function):
+            if asyncio.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapper(*args, **kwargs):
+                    with self.time(**labels):
+                        return await function(*args, **kwargs)
+            else:
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    with self.time(**labels):
+                        return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def collect(self):
+        lines = []
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{format_labels(key, [("le", format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(key)} {format_value(values[-2])}')
+            lines.append(f'{self.name}_count{format_labels(key)} {values[-1]}')
+        return lines
+
+
+class Counter:
+    """
+    Contador monotônico no formato Prometheus, com rótulos.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        recording = getattr(_recording, 'samples', None)
+        if recording is not None:
+            recording.append((self.name, key, amount))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f'{self.name}{format_labels(key)} {format_value(value)}' for key, value in sorted(values.items())]
+
+
+class Gauge:
+    """
+    Medida instantânea calculada na hora da coleta.
+
+    Parameters:
+    - callback (callable): Returns an iterable of (labels dict, value) pairs.
+    - kind (str): 'gauge', or 'counter' for totals maintained elsewhere (e.g. store hit counts).
+    """
+
+    def __init__(self, name, documentation, callback, kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+
+    def collect(self):
+        return [f'{self.name}{format_labels(sorted(labels.items()))} {format_value(value)}'
+                for labels, value in self.callback()]
+
+
+class Registry:
+    """
+    Conjunto de métricas exportadas em /metrics.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """
+        Retorna todas as métricas no formato de texto do Prometheus (versão 0.0.4).
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# --- Hot Paths ---
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'stamade_stage_seconds', 'Time spent in model and chart generation stages (mesh_build, concatenate, glb_export, chart_render, scene_diff, dataflow, optimizer_block).'))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'stamade_request_seconds', 'Time spent in the /model and /chart handlers.'))
+JOB_SECONDS = REGISTRY.register(Histogram(
+    'stamade_job_seconds', 'Wall time of worker pool jobs as seen by the app, queueing included.'))
+ERRORS = REGISTRY.register(Counter(
+    'stamade_errors_total', 'Errors while generating models, charts and variants.'))
+
+
+def call_recorded(callback, *args, **kwargs):
+    """
+    Executa `callback` registrando as observações feitas durante a chamada (função executável no pool).
+
+    Returns:
+    - tuple(object, list): The callback's result and the (metric name, labels, value) observations.
+    """
+    _recording.samples = samples = []
+    try:
+        return callback(*args, **kwargs), samples
+    finally:
+        _recording.samples = None
+
+
+def replay(samples):
+    """
+    Reaplica no registro deste processo as observações feitas em um processo do pool.
+    """
+    for name, labels, value in samples:
+        metric = REGISTRY.get(name)
+        if isinstance(metric, Histogram):
+            metric.observe(value, **dict(labels))
+        elif isinstance(metric, Counter):
+            metric.inc(value, **dict(labels))
+
+
+def register_store_gauges(stores):
+    """
+    Exporta entradas, bytes e contadores de cada armazenamento de artefatos.
+
+    Parameters:
+    - stores (dict): Label value (e.g. 'models') -> store with a `stats()` method.
+    """
+    cached = {'at': None, 'stats': {}}
+
+    def stats():
+        # One stats() call per store and scrape, shared by all the store gauges
+        now = time.monotonic()
+        if cached['at'] is None or now - cached['at'] > 1.0:
+            cached['stats'] = {name: store.stats() for name, store in stores.items()}
+            cached['at'] = now
+        return cached['stats']
+
+    def series(field):
+        return lambda: [({'store': name}, values.get(field, 0)) for name, values in stats().items()]
+
+    REGISTRY.register(Gauge('stamade_store_entries', 'Entries held by each artifact store.', series('entries')))
+    REGISTRY.register(Gauge('stamade_store_bytes', 'Bytes held by each artifact store (spilled files included).', series('bytes')))
+    REGISTRY.register(Gauge('stamade_store_max_bytes', 'Byte budget of each artifact store.', series('max_bytes')))
+    for field in ('hits', 'misses', 'evictions', 'expirations'):
+        REGISTRY.register(Gauge(f'stamade_store_{field}_total', f'Store lookups/removals: {field}.', series(field), kind='counter'))
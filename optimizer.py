@@ -0,0 +1,186 @@
+import asyncio
+import itertools
+import math
+import os
+
+import numpy as np
+
+from building_model import STORY_HEIGHT, floor_layout
+from material_db import MATERIAIS, RATE_COLUMNS, VALUE_COLUMNS, get_database
+from metrics import STAGE_SECONDS
+from sizing import secao_laje, secao_viga
+
+# --- Design Space ---
+ELEMENTOS = ('laje', 'viga', 'pilar')
+GRID_MIN, GRID_MAX, GRID_PASSO = 3.0, 8.0, 0.5  # Default bay spans tried along X and Y (m)
+SECAO_PILAR = (200, 300)  # Pillar section (mm), the one the pillar panel assigns
+# Material of the slab, the beams and the pillars: every combination of MATERIAIS
+COMBINACOES = np.array(list(itertools.product(range(len(MATERIAIS)), repeat=len(ELEMENTOS))), dtype=np.int64)
+
+# Candidates (geometry × material combination) evaluated per worker pool job
+CANDIDATOS_POR_BLOCO = 200_000
+
+
+def grids_entre(minimo=GRID_MIN, maximo=GRID_MAX, passo=GRID_PASSO):
+    """
+    Retorna os vãos de `minimo` a `maximo` (inclusive) a cada `passo`, em metros.
+    """
+    return np.round(np.arange(minimo, maximo + passo / 2, passo), 3)
+
+
+def taxas_materiais(materiais=MATERIAIS):
+    """
+    Retorna as taxas de custo, carbono e peso por m³ de cada material.
+
+    The rates are the per-m³ RATE_COLUMNS of the material database (`MaterialDatabase.rates`),
+    the same for every element; the scenario totals behind the charts are not rates and are
+    not used here.
+
+    Returns:
+    - tuple(ndarray, bool): Shape (materials, objectives), objectives in VALUE_COLUMNS order, and
+      whether the rates came from the workbook (False: illustrative built-in rates).
+    """
+    taxas, da_planilha = get_database().rates(materiais)
+    return np.array(taxas, dtype=np.float64).reshape(len(materiais), len(RATE_COLUMNS)), da_planilha
+
+
+def espaco_de_projeto(area, pavimentos, grids=None):
+    """
+    Enumera as geometrias candidatas e descarta as dominadas antes de combinar os materiais.
+
+    Every Grid X × Grid Y pair is laid out with `floor_layout`; the sections follow the same
+    rules as the calculation panels (`secao_laje`, `secao_viga` for the longer span and the
+    SECAO_PILAR pillar), so only the spans and the materials are searched. Cost, carbon and
+    weight grow with each element's volume for every material, so a geometry whose slab,
+    beam and pillar volumes are all at least those of another one can never win. Such
+    geometries are pruned here, before they are multiplied by the material combinations.
+
+    Parameters:
+    - area (float): Floor area in m².
+    - pavimentos (int): Number of floors.
+    - grids (array | None): Bay spans in meters tried along each axis (grids_entre() if omitted).
+
+    Returns:
+    - dict: Arrays with one entry per surviving geometry: grid_x, grid_y, bays_x, bays_y,
+      secao_laje (mm), base_viga and altura_viga (mm), and volumes (m³ of slab, beams and
+      pillars, shape (n, 3)); 'enumeradas' counts the geometries before pruning.
+    """
+    grids = grids_entre() if grids is None else np.asarray(grids, dtype=np.float64)
+    pavimentos = max(1, int(pavimentos or 1))
+    grid_x, grid_y = (eixo.ravel() for eixo in np.meshgrid(grids, grids, indexing='ij'))
+    layouts = np.array([floor_layout(gx, gy, area) for gx, gy in zip(grid_x.tolist(), grid_y.tolist())])
+    gx, gy, bx, by = layouts.T
+
+    laje = secao_laje(gx, gy)
+    base_viga, altura_viga = secao_viga(np.maximum(gx, gy))
+    base_pilar, altura_pilar = SECAO_PILAR
+    comprimento_vigas = (by + 1) * bx * gx + (bx + 1) * by * gy
+    volumes = pavimentos * np.stack([
+        bx * gx * by * gy * laje / 1000,
+        comprimento_vigas * base_viga * altura_viga / 1e6,
+        (bx + 1) * (by + 1) * STORY_HEIGHT * base_pilar * altura_pilar / 1e6,
+    ], axis=1)
+
+    eficientes = fronteira_pareto(volumes)
+    enumeradas = len(volumes)
+    espaco = {'grid_x': gx, 'grid_y': gy, 'bays_x': bx.astype(np.int64), 'bays_y': by.astype(np.int64),
+              'secao_laje': laje, 'base_viga': base_viga, 'altura_viga': altura_viga, 'volumes': volumes}
+    return {**{nome: valores[eficientes] for nome, valores in espaco.items()}, 'enumeradas': enumeradas}
+
+
+def fronteira_pareto(pontos):
+    """
+    Marca os pontos não dominados (minimização em todas as colunas).
+
+    Points are visited in lexicographic order; each surviving point removes every point it
+    dominates in one vectorized comparison, so the cost is about N × (front size).
+
+    Returns:
+    - ndarray: Boolean mask, True for the points on the Pareto front.
+    """
+    pontos = np.asarray(pontos, dtype=np.float64)
+    indices = np.lexsort(pontos.T[::-1])
+    restantes = pontos[indices]
+    posicao = 0
+    while posicao < len(restantes):
+        atual = restantes[posicao]
+        dominados = np.all(restantes >= atual, axis=1) & np.any(restantes > atual, axis=1)
+        indices, restantes = indices[~dominados], restantes[~dominados]
+        posicao = int(np.count_nonzero(~dominados[:posicao])) + 1
+    eficientes = np.zeros(len(pontos), dtype=bool)
+    eficientes[indices] = True
+    return eficientes
+
+
+def avaliar_bloco(volumes, taxas):
+    """
+    Pontua geometrias × combinações de materiais e retorna a fronteira local (executável no pool).
+
+    Parameters:
+    - volumes (ndarray): Shape (geometries, elements), m³ of slab, beams and pillars.
+    - taxas (ndarray): Shape (materials, objectives), see `taxas_materiais`.
+
+    Returns:
+    - tuple(ndarray, ndarray, ndarray): Geometry index, COMBINACOES index and objectives
+      (shape (n, objectives)) of the non-dominated candidates of this block.
+    """
+    with STAGE_SECONDS.time(stage='optimizer_block'):
+        # taxas_por_elemento[c, e, o]: rate of objective o for element e in material combination c
+        taxas_por_elemento = taxas[COMBINACOES]
+        objetivos = np.einsum('ge,ceo->gco', volumes, taxas_por_elemento).reshape(-1, taxas.shape[-1])
+        eficientes = np.flatnonzero(fronteira_pareto(objetivos))
+        geometria, combinacao = np.divmod(eficientes, len(COMBINACOES))
+        return geometria, combinacao, objetivos[eficientes]
+
+
+async def otimizar(area, pavimentos, grids=None, submit=None, candidatos_por_bloco=CANDIDATOS_POR_BLOCO):
+    """
+    Busca as soluções de Pareto (custo, carbono, peso) para a área e o número de pavimentos.
+
+    Large searches are split into blocks of about `candidatos_por_bloco` candidates (at most
+    one per CPU) evaluated in parallel through `submit`; the fronts of the blocks are then
+    merged into the global front.
+
+    Parameters:
+    - area (float): Floor area in m².
+    - pavimentos (int): Number of floors.
+    - grids (array | None): Bay spans tried along each axis.
+    - submit (callable | None): Coroutine function such as `WorkerPool.submit`; None evaluates inline.
+
+    Returns:
+    - dict: 'solucoes' (list of dicts sorted by cost), 'candidatos' (number of candidates
+      before pruning), 'avaliados' (candidates scored after the geometry pruning) and
+      'ilustrativo' (True when built-in rates were used instead of the workbook's).
+    """
+    espaco = espaco_de_projeto(area, pavimentos, grids)
+    taxas, da_planilha = taxas_materiais()
+    geometrias = len(espaco['volumes'])
+    blocos = max(1, min(os.cpu_count() or 1, math.ceil(geometrias * len(COMBINACOES) / candidatos_por_bloco)))
+    fatias = [fatia for fatia in np.array_split(np.arange(geometrias), blocos) if len(fatia)]
+    if submit is None or len(fatias) == 1 and geometrias * len(COMBINACOES) < candidatos_por_bloco:
+        resultados = [avaliar_bloco(espaco['volumes'][fatia], taxas) for fatia in fatias]
+    else:
+        resultados = await asyncio.gather(*(submit(avaliar_bloco, espaco['volumes'][fatia], taxas) for fatia in fatias))
+
+    geometria = np.concatenate([fatia[g] for fatia, (g, _, _) in zip(fatias, resultados)])
+    combinacao = np.concatenate([c for _, c, _ in resultados])
+    objetivos = np.concatenate([o for _, _, o in resultados])
+    eficientes = fronteira_pareto(objetivos)
+    ordem = np.flatnonzero(eficientes)[np.argsort(objetivos[eficientes, 0], kind='stable')]
+
+    return {
+        'solucoes': [solucao(espaco, int(geometria[i]), int(combinacao[i]), objetivos[i]) for i in ordem],
+        'candidatos': espaco['enumeradas'] * len(COMBINACOES),
+        'avaliados': geometrias * len(COMBINACOES),
+        'ilustrativo': not da_planilha,
+    }
+
+
+def solucao(espaco, geometria, combinacao, objetivos):
+    materiais = [MATERIAIS[indice] for indice in COMBINACOES[combinacao]]
+    return {
+        'tipo_laje': materiais[0], 'tipo_viga': materiais[1], 'tipo_pilar': materiais[2],
+        'grid_x': float(espaco['grid_x'][geometria]), 'grid_y': float(espaco['grid_y'][geometria]),
+        'bays_x': int(espaco['bays_x'][geometria]), 'bays_y': int(espaco['bays_y'][geometria]),
+        **{nome: round(float(valor), 2) for nome, valor in zip(VALUE_COLUMNS, objetivos)},
+    }
@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+from functools import partial
+
+import building_model
+import glb
+from building_model import generate_with
+from cache import ModelCache, content_id, render_model
+from charts import MATERIAIS, chart_key, render_charts_png
+from warm_cache import code_version
+
+# Where `python prebake.py` writes (e.g. during the Docker build) and the app reads on startup
+PREBAKED_DIR = os.environ.get('PREBAKED_DIR', 'prebaked')
+MANIFEST_NAME = 'manifest.json'
+
+# The model shown before the user calculates anything: (material, floors, slab thickness, lod)
+DEFAULT_MODEL_KEY = ('wood', 1, 0.2, 'full')
+
+
+def prebake(directory=PREBAKED_DIR, export_mode='instanced'):
+    """
+    Gera o modelo padrão e os gráficos de cada material e os grava em `directory` com um manifesto.
+
+    Parameters:
+    - directory (str): Output directory (created if needed).
+    - export_mode (str): GLB export mode, must match the app's MODEL_EXPORT_MODE to be used.
+
+    Returns:
+    - dict: The manifest that was written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = {'models': [], 'charts': []}
+
+    def write(data, suffix):
+        filename = content_id(data) + suffix
+        with open(os.path.join(directory, filename), 'wb') as f:
+            f.write(data)
+        return filename
+
+    glb_bytes = render_model(partial(generate_with, export_mode=export_mode), ModelCache.normalize_key(*DEFAULT_MODEL_KEY))
+    if glb_bytes:
+        manifest['models'].append({'key': list(DEFAULT_MODEL_KEY), 'export_mode': export_mode,
+                                   'code_version': code_version(building_model, glb), 'file': write(glb_bytes, '.glb')})
+    for material in MATERIAIS:
+        key = chart_key(material)
+        manifest['charts'].append({'material': material, 'key': [list(serie) for serie in key],
+                                   'file': write(render_charts_png(*key), '.png')})
+
+    with open(os.path.join(directory, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_prebaked(model_cache, chart_cache, directory=PREBAKED_DIR, export_mode='instanced'):
+    """
+    Carrega os artefatos pré-gerados nos caches, ignorando os que não valem mais.
+
+    Models baked with another export mode or by another version of the geometry and GLB code,
+    and charts whose data no longer matches the material database, are skipped (they are
+    rendered on demand instead).
+
+    Returns:
+    - int: Number of artifacts loaded (0 if there is no manifest).
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return 0
+
+    def read(filename):
+        with open(os.path.join(directory, filename), 'rb') as f:
+            return f.read()
+
+    loaded = 0
+    version = code_version(building_model, glb)
+    for entry in manifest.get('models', []):
+        if entry.get('export_mode') == export_mode and entry.get('code_version') == version:
+            model_cache.put(model_cache.normalize_key(*entry['key']), read(entry['file']))
+            loaded += 1
+    for entry in manifest.get('charts', []):
+        key = chart_cache.normalize_key(entry['material'])
+        if key == tuple(tuple(serie) for serie in entry['key']):
+            chart_cache.put(key, read(entry['file']))
+            loaded += 1
+    return loaded
+
+
+if __name__ == '__main__':
+    output = sys.argv[1] if len(sys.argv) > 1 else PREBAKED_DIR
+    result = prebake(output, os.environ.get('MODEL_EXPORT_MODE', 'instanced'))
+    print(f"Prebaked {len(result['models'])} model(s) and {len(result['charts'])} chart(s) into {output}/")
@@ -0,0 +1,110 @@
+from building_model import DEFAULT_LAYOUT, DEFAULT_MATERIAL, MATERIALS, STORY_HEIGHT, story_layout
+from metrics import STAGE_SECONDS
+
+
+def material_color(material_type):
+    """
+    Retorna a cor CSS (#rrggbb) do material (wood/steel/concrete), a mesma cor base do GLB.
+    """
+    base_color = MATERIALS.get(material_type, DEFAULT_MATERIAL)[0]
+    return '#' + ''.join(f'{round(channel * 255):02x}' for channel in base_color[:3])
+
+
+class BuildingScene:
+    """
+    Grafo de cena do prédio dentro de um `ui.scene`: um grupo por pavimento com suas caixas.
+
+    Instead of clearing the scene and loading a new glTF file, `show` diffs the requested
+    building against what the browser already has: floor groups are added or deleted at the
+    top and the existing boxes are moved/rescaled in place, so only the changed objects go
+    over the websocket. Every box is a unit cube scaled to its element's dimensions. A floor
+    plan with a different number of elements per story rebuilds the floors.
+
+    Parameters:
+    - scene (ui.scene): The scene that holds the building.
+    - scale (float): Scale of the whole building, as applied to the glTF models.
+    """
+
+    def __init__(self, scene, scale=0.5):
+        self.scene = scene
+        self.scale = scale
+        self.root = None
+        self.layout = None
+        self.floors = []  # (group, boxes) per floor, bottom to top
+
+    @property
+    def active(self):
+        return self.root is not None
+
+    def clear(self):
+        """
+        Remove todos os objetos da cena (o prédio e qualquer glTF carregado) e esquece o grafo.
+
+        `ui.scene.clear()` deletes every object in turn and fails on the children of a group it
+        already deleted, so only top-level objects are deleted here (children go with them).
+        """
+        top_level = self.scene.stack[0]
+        self.scene.delete_objects(lambda obj: obj.parent is top_level)
+        self.root = None
+        self.layout = None
+        self.floors = []
+
+    def fit_camera(self, num_floors, layout):
+        """
+        Enquadra o prédio inteiro: câmera ao sul, acima, olhando para o meio da altura.
+        """
+        grid_x, grid_y, bays_x, bays_y = layout
+        height = num_floors * STORY_HEIGHT * self.scale
+        reach = max(bays_x * grid_x * self.scale, bays_y * grid_y * self.scale, height)
+        self.scene.move_camera(x=0, y=-1.2 * reach, z=reach, look_at_z=height / 2)
+
+    def show(self, material_type='wood', num_floors=1, floor_slab_thickness=0.2, layout=DEFAULT_LAYOUT):
+        """
+        Atualiza a cena para o prédio pedido aplicando apenas as diferenças.
+
+        Parameters:
+        - material_type (str): Type of material ('wood', 'steel', 'concrete').
+        - num_floors (int): Number of floors for the building.
+        - floor_slab_thickness (float): Thickness of the floor slabs in meters.
+        - layout (tuple): Floor plan (grid_x, grid_y, bays_x, bays_y), see `floor_layout`.
+
+        Returns:
+        - dict: Floors added, removed and kept (updated in place).
+        """
+        num_floors = max(1, int(num_floors))
+        floor_slab_height = max(0.05, float(floor_slab_thickness))  # Same minimum as generate_with
+        with STAGE_SECONDS.time(stage='scene_diff'):
+            if self.root is None:
+                self.clear()  # Drop a glTF model shown before
+                with self.scene:
+                    self.root = self.scene.group().scale(self.scale)
+
+            extents, centers = story_layout(floor_slab_height, layout)
+            # A plan with another number of elements per story shares no boxes with the current one
+            same_plan = not self.floors or len(self.floors[0][1]) == len(extents)
+            # The plan sets the building's footprint and the floor count its height
+            if layout != (self.layout or DEFAULT_LAYOUT) or self.floors and num_floors != len(self.floors):
+                self.fit_camera(num_floors, layout)
+            self.layout = layout
+
+            removed = 0
+            while len(self.floors) > (num_floors if same_plan else 0):
+                group, _ = self.floors.pop()
+                group.delete()
+                removed += 1
+
+            color = material_color(material_type)
+            kept = len(self.floors)
+            for _, boxes in self.floors:
+                # move/scale/material only send a message when the value actually changed
+                for box, extent, center in zip(boxes, extents.tolist(), centers.tolist()):
+                    box.move(*center).scale(*extent).material(color)
+
+            for floor in range(kept, num_floors):
+                with self.root:
+                    group = self.scene.group().move(z=floor * STORY_HEIGHT).with_name(f'pavimento_{floor + 1}')
+                with group:
+                    boxes = [self.scene.box(1, 1, 1).move(*center).scale(*extent).material(color)
+                             for extent, center in zip(extents.tolist(), centers.tolist())]
+                self.floors.append((group, boxes))
+        return {'added': num_floors - kept, 'removed': removed, 'kept': kept}
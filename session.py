@@ -0,0 +1,95 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass(slots=True)
+class Resultado:
+    """
+    Registro compacto de uma solução estrutural (laje, viga e pilar) calculada por um usuário.
+
+    Fields stay None until the corresponding step has been calculated.
+    """
+    # Slab
+    tipo_laje: Optional[str] = None
+    secao_laje: Optional[float] = None
+    area: Optional[float] = None
+    pavimentos: Optional[int] = None
+    coberturas: Optional[int] = None
+    grid_x: Optional[float] = None
+    grid_y: Optional[float] = None
+    # Beam
+    tipo_viga: Optional[str] = None
+    secao_viga: Optional[str] = None
+    gama_viga: Optional[float] = None
+    gama_viga_cob: Optional[float] = None
+    base_viga_cob: Optional[float] = None
+    altura_viga_cob: Optional[float] = None
+    # Pillar
+    tipo_pilar: Optional[str] = None
+    secao_pilar: Optional[str] = None
+    gama_pilar: Optional[float] = None
+
+
+@dataclass(slots=True)
+class Sessao:
+    """
+    Estado de um cliente conectado: suas soluções calculadas e os componentes de UI da sua página.
+    """
+    resultados: List[Resultado] = field(default_factory=list)
+    resultado_text: Any = None
+    resultado_grafico_html: Any = None
+    graficos: Any = None
+    grafico_echart: Any = None
+    model_viewer: Any = None
+    modelo_cena: Any = None
+    tabs: Any = None
+    fluxo: Any = None
+    entradas: Dict[str, Any] = field(default_factory=dict)  # Flow input name -> panel field
+    solucoes: List[dict] = field(default_factory=list)
+    resumo_otimizacao: Any = None
+    grafico_pareto: Any = None
+    tabela_solucoes: Any = None
+
+    def resultado(self, solucao=0, create=False):
+        """
+        Retorna o registro da solução `solucao`, ou None se ainda não existir.
+
+        Parameters:
+        - solucao (int): Index of the solution.
+        - create (bool): Append empty records up to `solucao` instead of returning None.
+        """
+        while create and len(self.resultados) <= solucao:
+            self.resultados.append(Resultado())
+        return self.resultados[solucao] if solucao < len(self.resultados) else None
+
+
+class SessionStore:
+    """
+    Sessões por cliente, indexadas pelo ID do cliente NiceGUI.
+
+    A session is created on first access and must be released when its client goes away,
+    so memory is bounded by the number of connected clients.
+    """
+
+    def __init__(self):
+        self._sessions = {}  # client ID -> Sessao
+
+    def get(self, client_id):
+        sessao = self._sessions.get(client_id)
+        if sessao is None:
+            sessao = self._sessions[client_id] = Sessao()
+        return sessao
+
+    def release(self, client_id):
+        return self._sessions.pop(client_id, None)
+
+    def prune(self, active_ids):
+        # Drop sessions of clients that were discarded without a disconnect event (e.g. never connected)
+        for client_id in [c for c in self._sessions if c not in active_ids]:
+            del self._sessions[client_id]
+
+    def __contains__(self, client_id):
+        return client_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
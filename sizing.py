@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+
+import numpy as np
+
+# --- Sizing Rules ---
+SECAO_LAJE_MIN = 80         # Minimum slab thickness (mm)
+RAZAO_LAJE = 0.0286         # Slab thickness per cm of span (in cm), rounded to whole cm
+VAOS_VIGA = (4.0, 6.0)      # Span thresholds (m) between beam base widths
+BASES_VIGA = (150, 190, 240)  # Beam base width (mm) for spans below 4 m, below 6 m and above
+
+# --- Batch Input ---
+# Column -> default value; grid_x and grid_y are required
+COLUNAS_ENTRADA = {
+    'grid_x': None,
+    'grid_y': None,
+    'material': 'Madeira',
+    'pavimentos': 1,
+    'gk': 1.0,
+    'qk': 2.0,
+}
+# Alternative column names accepted in uploaded rows
+ALIASES_COLUNAS = {
+    'Grid X': 'grid_x',
+    'Grid Y': 'grid_y',
+    'tipo_laje': 'material',
+    'Tipo Laje': 'material',
+    'floors': 'pavimentos',
+    'Pavimentos': 'pavimentos',
+}
+
+
+def secao_laje(grid_x, grid_y):
+    """
+    Calcula a espessura da laje (mm) pelo menor vão do grid.
+
+    Accepts scalars or arrays of grid dimensions in meters and returns a value of the same shape.
+    """
+    vao_laje = np.minimum(grid_x, grid_y)
+    return np.maximum(SECAO_LAJE_MIN, np.round(RAZAO_LAJE * (vao_laje * 100), 0) * 10)
+
+
+def secao_viga(vao_viga):
+    """
+    Calcula a seção da viga (base e altura em mm) pelo vão.
+
+    The base follows the span thresholds in BASES_VIGA; the height is span / 10 and never less than the base.
+
+    Returns:
+    - tuple(ndarray, ndarray): (base, altura) in millimeters, integer arrays shaped like `vao_viga`.
+    """
+    vao_viga = np.asarray(vao_viga, dtype=np.float64)
+    base = np.select([vao_viga < VAOS_VIGA[0], vao_viga < VAOS_VIGA[1]], BASES_VIGA[:2], BASES_VIGA[2])
+    altura = np.maximum(base, vao_viga * 1000 / 10).astype(np.int64)
+    return base.astype(np.int64), altura
+
+
+def formatar_secao_viga(base, altura):
+    """
+    Formata seções de viga como "base x altura" (escalares ou arrays).
+    """
+    if np.ndim(base) == 0:
+        return f'{int(base)} x {int(altura)}'
+    # Only a handful of distinct sections exist: format each once and scatter the labels
+    base, altura = np.asarray(base, dtype=np.int64), np.asarray(altura, dtype=np.int64)
+    escala = int(altura.max(initial=0)) + 1
+    codigos, inversos = np.unique(base * escala + altura, return_inverse=True)
+    rotulos = np.array([f'{codigo // escala} x {codigo % escala}' for codigo in codigos.tolist()], dtype=object)
+    return rotulos[inversos]
+
+
+def dimensionar(linhas):
+    """
+    Dimensiona laje e viga para muitas linhas de projeto de uma vez.
+
+    Parameters:
+    - linhas (DataFrame): One row per design, with the columns of COLUNAS_ENTRADA (or their
+      aliases). Missing optional columns take their defaults.
+
+    Returns:
+    - DataFrame: The input columns plus secao_laje (mm), vao_viga (m), base_viga and
+      altura_viga (mm) and secao_viga ("base x altura").
+
+    Raises:
+    - ValueError: If a required column is missing or the grid dimensions are not positive numbers.
+    """
+    import pandas as pd  # Deferred: only batch sizing needs pandas
+
+    linhas = linhas.rename(columns=ALIASES_COLUNAS)
+    faltando = [coluna for coluna, padrao in COLUNAS_ENTRADA.items() if padrao is None and coluna not in linhas]
+    if faltando:
+        raise ValueError(f"Missing required columns: {', '.join(faltando)}")
+
+    resultado = pd.DataFrame(index=linhas.index)
+    for coluna, padrao in COLUNAS_ENTRADA.items():
+        if coluna not in linhas:
+            resultado[coluna] = padrao
+        elif coluna == 'material':
+            resultado[coluna] = linhas[coluna].fillna(padrao).astype(str)
+        else:
+            valores = pd.to_numeric(linhas[coluna], errors='coerce')
+            resultado[coluna] = valores if padrao is None else valores.fillna(padrao)
+
+    grid_x = resultado['grid_x'].to_numpy(dtype=np.float64)
+    grid_y = resultado['grid_y'].to_numpy(dtype=np.float64)
+    invalidas = ~((grid_x > 0) & (grid_y > 0))  # Also catches NaN from unparseable values
+    if invalidas.any():
+        raise ValueError(f'Grid dimensions must be positive numbers (rows {np.flatnonzero(invalidas)[:10].tolist()})')
+    resultado['pavimentos'] = resultado['pavimentos'].astype(np.int64)
+
+    resultado['secao_laje'] = secao_laje(grid_x, grid_y)
+    vao_viga = np.maximum(grid_x, grid_y)
+    base, altura = secao_viga(vao_viga)
+    resultado['vao_viga'] = vao_viga
+    resultado['base_viga'] = base
+    resultado['altura_viga'] = altura
+    resultado['secao_viga'] = formatar_secao_viga(base, altura)
+    return resultado
+
+
+def ler_linhas(corpo, content_type=''):
+    """
+    Lê as linhas de projeto de um corpo de requisição CSV ou JSON.
+
+    JSON may be a list of row objects, a single row object, an object of column arrays, or
+    {"rows": [...]}.
+    Anything that is not declared as JSON is parsed as CSV (',' or ';' separated; ';' implies
+    decimal commas, as exported by pt-BR spreadsheets).
+
+    Raises:
+    - ValueError: If the body cannot be parsed.
+    """
+    import pandas as pd
+
+    if 'json' in content_type:
+        try:
+            dados = json.loads(corpo)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON: {e}') from e
+        if isinstance(dados, dict) and 'rows' in dados:
+            dados = dados['rows']
+        if not isinstance(dados, (list, dict)):
+            raise ValueError('Expected a list of rows or an object of columns')
+        if isinstance(dados, dict) and not any(isinstance(valor, list) for valor in dados.values()):
+            dados = [dados]  # One row object (no column arrays)
+        return pd.DataFrame(dados)
+    if not corpo.strip():
+        return pd.DataFrame()
+    cabecalho = corpo.lstrip().split(b'\n', 1)[0]
+    separador, decimal = (';', ',') if b';' in cabecalho else (',', '.')
+    try:
+        return pd.read_csv(io.BytesIO(corpo), sep=separador, decimal=decimal)
+    except (pd.errors.ParserError, UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f'Invalid CSV: {e}') from e
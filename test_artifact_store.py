@@ -0,0 +1,187 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import artifact_store
+from artifact_store import DiskBlobStore, SpillingStore, SQLiteBlobStore, open_store
+from cache import BlobStore
+
+KEYS = ['a' * 32, 'b' * 32, 'c' * 32]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Strictly increasing wall clock, so LRU order never depends on timer resolution
+    now = [1_000_000.0]
+
+    def tick():
+        now[0] += 1
+        return now[0]
+
+    monkeypatch.setattr(artifact_store, 'time', SimpleNamespace(time=tick, monotonic=time.monotonic))
+    return now
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'artifacts.sqlite3')
+    writer, reader = SQLiteBlobStore(path, 'models'), SQLiteBlobStore(path, 'models')
+    writer.put('a', b'payload')
+    assert 'a' in reader and reader.get('a') == b'payload'
+    assert reader.get('b') is None
+    assert (reader.hits, reader.misses) == (1, 1)
+    # Namespaces in the same file are separate stores
+    assert 'a' not in SQLiteBlobStore(path, 'charts')
+
+
+def test_sqlite_store_evicts_least_recently_used(tmp_path, clock):
+    evicted = []
+    store = SQLiteBlobStore(str(tmp_path / 'db.sqlite3'), max_bytes=10, on_evict=evicted.append)
+    store.put('a', b'12345')
+    store.put('b', b'12345')
+    store.get('a')  # 'b' is now the least recently used
+    store.put('c', b'12345')
+    assert evicted == ['b'] and store.evictions == 1
+    assert 'a' in store and 'c' in store and 'b' not in store
+    assert store.stats()['entries'] == 2 and store.stats()['bytes'] == 10 and len(store) == 2
+
+
+def test_sqlite_store_never_evicts_the_entry_just_written(tmp_path):
+    store = SQLiteBlobStore(str(tmp_path / 'db.sqlite3'), max_bytes=4)
+    store.put('a', b'12')
+    store.put('big', b'123456')
+    assert 'big' in store and 'a' not in store
+
+
+def test_sqlite_store_expires_entries(tmp_path, clock):
+    store = SQLiteBlobStore(str(tmp_path / 'db.sqlite3'), ttl=10)
+    store.put('a', b'data')
+    store.put('b', b'data', ttl=1000)  # Per-entry TTL overrides the store's
+    clock[0] += 20
+    assert 'a' not in store and store.get('a') is None
+    assert store.expirations == 1
+    assert store.get('b') == b'data'
+
+
+def test_open_store_backends(tmp_path):
+    assert isinstance(open_store('memory'), BlobStore)
+    assert isinstance(open_store('sqlite', 'models', path=str(tmp_path / 'db.sqlite3')), SQLiteBlobStore)
+    disk = open_store('disk', 'models', path=str(tmp_path / 'files'))
+    assert isinstance(disk, DiskBlobStore) and disk.directory == os.path.join(str(tmp_path / 'files'), 'models')
+    with pytest.raises(ValueError):
+        open_store('redis')
+
+
+def test_disk_store_round_trip(tmp_path):
+    store = DiskBlobStore(str(tmp_path), suffix='.glb')
+    store.put(KEYS[0], b'payload')
+    assert KEYS[0] in store and store.get(KEYS[0]) == b'payload'
+    assert store.path(KEYS[0]) == os.path.join(str(tmp_path), 'aa', KEYS[0] + '.glb')
+    assert store.get(KEYS[1]) is None
+    assert (store.hits, store.misses) == (2, 1)
+
+
+def test_disk_store_rejects_unsafe_keys(tmp_path):
+    store = DiskBlobStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.put('../escape', b'x')
+    assert '../escape' not in store
+
+
+def test_disk_store_evicts_least_recently_read(tmp_path):
+    store = DiskBlobStore(str(tmp_path), max_bytes=10)
+    store.put(KEYS[0], b'12345')
+    store.put(KEYS[1], b'12345')
+    past = time.time() - 100
+    os.utime(store.file_path(KEYS[0]), (past, past))
+    os.utime(store.file_path(KEYS[1]), (past + 1, past + 1))
+    store.path(KEYS[0])  # Read: now the most recently used
+    store.put(KEYS[2], b'12345')
+    assert KEYS[0] in store and KEYS[2] in store and KEYS[1] not in store
+    assert store.evictions == 1
+    assert store.stats()['bytes'] == 10 and len(store) == 2
+
+
+def test_disk_store_expires_files(tmp_path):
+    evicted = []
+    store = DiskBlobStore(str(tmp_path), ttl=60, on_evict=evicted.append)
+    store.put(KEYS[0], b'old')
+    past = time.time() - 120
+    os.utime(store.file_path(KEYS[0]), (past, past))
+    assert KEYS[0] not in store
+    assert store.path(KEYS[0]) is None
+    assert evicted == [KEYS[0]] and store.expirations == 1
+    assert store.stats()['entries'] == 0 and store.stats()['bytes'] == 0
+
+
+def test_disk_store_keeps_running_totals_between_sweeps(tmp_path, monkeypatch):
+    store = DiskBlobStore(str(tmp_path), max_bytes=100, sweep_interval=3600)
+    store.put(KEYS[0], b'12345')  # The first write lists the directory once
+    scans = []
+    real_scan = store._scan
+    monkeypatch.setattr(store, '_scan', lambda: scans.append(1) or real_scan())
+
+    store.put(KEYS[1], b'1234567890')
+    store.put(KEYS[1], b'123')  # Overwrite: the old size is replaced, not added
+    store.get(KEYS[0])
+    assert store.stats()['entries'] == 2 and store.stats()['bytes'] == 8 and len(store) == 2
+    assert scans == []  # Within budget and interval: no directory listing
+
+    store.put(KEYS[2], b'x' * 100)  # Over budget: sweep
+    assert scans == [1]
+    assert KEYS[2] in store and store.stats()['bytes'] <= 100 + 3
+
+
+def test_disk_store_sweeps_after_the_interval(tmp_path):
+    store = DiskBlobStore(str(tmp_path), sweep_interval=0)
+    store.put(KEYS[0], b'12345')
+    # A file written by another process sharing the directory shows up at the next sweep
+    DiskBlobStore(str(tmp_path)).put(KEYS[1], b'12345')
+    assert store.stats()['entries'] == 1
+    store.put(KEYS[2], b'12345')
+    assert store.stats()['entries'] == 3 and store.stats()['bytes'] == 15
+
+
+def test_disk_store_stream_is_stored_only_when_complete(tmp_path):
+    store = DiskBlobStore(str(tmp_path))
+    chunks = store.put_stream(KEYS[0], iter([b'ab', b'cd']))
+    next(chunks)
+    chunks.close()  # Consumer went away
+    assert KEYS[0] not in store and store.stats()['bytes'] == 0
+    assert b''.join(store.put_stream(KEYS[1], iter([b'ab', b'cd']))) == b'abcd'
+    assert store.get(KEYS[1]) == b'abcd' and store.stats()['bytes'] == 4
+
+
+def test_spilling_store_routes_by_size(tmp_path):
+    spill = DiskBlobStore(str(tmp_path))
+    store = SpillingStore(BlobStore(), spill, threshold=8)
+    store.put(KEYS[0], b'small')
+    store.put(KEYS[1], b'large payload')
+    assert store.path(KEYS[0]) is None and store.get(KEYS[0]) == b'small'
+    assert store.path(KEYS[1]) is not None and store.get(KEYS[1]) == b'large payload'
+    assert KEYS[0] in store and KEYS[1] in store and len(store) == 2
+    stats = store.stats()
+    assert stats['entries'] == 2 and stats['spilled_entries'] == 1 and stats['spilled_bytes'] == 13
+
+
+def test_spilling_store_with_a_disk_primary(tmp_path):
+    primary = open_store('disk', 'models', max_bytes=8, path=str(tmp_path))
+    store = SpillingStore(primary, DiskBlobStore(str(tmp_path / 'models-spill'), suffix='.glb'), threshold=8)
+    store.put(KEYS[0], b'small')
+    store.put(KEYS[1], b'large payload')
+    assert store.path(KEYS[0]) is None and store.get(KEYS[1]) == b'large payload'
+    assert primary.stats()['entries'] == 1 and primary.stats()['bytes'] == 5
+    with pytest.raises(ValueError):
+        SpillingStore(primary, DiskBlobStore(primary.directory, suffix='.glb'))
+
+
+def test_disk_store_without_suffix_skips_other_stores_files(tmp_path):
+    # Both stores on one directory: the spilled file is neither counted nor evicted by the other
+    primary = DiskBlobStore(str(tmp_path), max_bytes=10, sweep_interval=0)
+    spill = DiskBlobStore(str(tmp_path), suffix='.glb')
+    spill.put(KEYS[1], b'x' * 100)
+    primary.put(KEYS[0], b'12345')
+    primary.put(KEYS[2], b'12345')
+    assert primary.stats()['entries'] == 2 and primary.stats()['bytes'] == 10
+    assert primary.evictions == 0 and KEYS[1] in spill
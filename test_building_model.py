@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from building_model import (MAX_ELEMENTS, boxes_to_arrays, check_building_size, floor_layout, generate_with,
+                            hidden_triangles, optimize_boxes, story_elements, story_layout, touching_pairs,
+                            weld_vertices)
+
+
+def test_floor_layout_covers_the_area():
+    assert floor_layout(5, 5, 2500) == (5.0, 5.0, 10, 10)
+    assert floor_layout(5, 5, 2501) == (5.0, 5.0, 11, 10)
+    assert floor_layout() == (4.0, 4.0, 1, 1)
+
+
+def test_oversized_buildings_are_refused():
+    layout = floor_layout(0.6, 0.6, 20000)
+    assert 20 * story_elements(layout) > MAX_ELEMENTS
+    with pytest.raises(ValueError):
+        check_building_size(20, layout)
+    assert generate_with('wood', 20, 0.2, return_bytes=True, export_mode='instanced', grid_x=0.6, grid_y=0.6, area=20000) is None
+    assert check_building_size(2, floor_layout(5, 5, 2500)) == 2 * story_elements((5.0, 5.0, 10, 10))
+
+
+def brute_force_pairs(mins, maxs):
+    touching = np.all((mins[:, None] <= maxs[None] + 1e-9) & (mins[None] <= maxs[:, None] + 1e-9), axis=2)
+    np.fill_diagonal(touching, False)
+    return set(zip(*np.nonzero(touching)))
+
+
+def test_touching_pairs_matches_brute_force():
+    rng = np.random.default_rng(0)
+    mins = rng.uniform(0, 10, (300, 3))
+    maxs = mins + rng.uniform(0.1, 2, (300, 3))
+    maxs[:5] = mins[:5] + 8  # A few large boxes spanning many hash cells
+    i, j = touching_pairs(mins, maxs)
+    assert set(zip(i.tolist(), j.tolist())) == brute_force_pairs(mins, maxs)
+
+
+def test_stacked_boxes_hide_their_contact_faces():
+    extents = np.ones((2, 3))
+    centers = np.array([[0, 0, 0.5], [0, 0, 1.5]])
+    hidden = hidden_triangles(extents, centers).reshape(2, -1)
+    vertices, faces = boxes_to_arrays(extents, centers)
+    z = vertices[faces].reshape(2, -1, 3, 3)[..., 2]
+    # Exactly the lower box's top and the upper box's bottom (two triangles each)
+    assert hidden.sum() == 4
+    assert np.all(z[0][hidden[0]] == 1) and np.all(z[1][hidden[1]] == 1)
+
+
+def test_partially_covered_faces_are_kept():
+    extents = np.array([[4, 4, 1], [1, 1, 1]], dtype=np.float64)
+    centers = np.array([[0, 0, 0.5], [0, 0, 1.5]])
+    hidden = hidden_triangles(extents, centers).reshape(2, -1)
+    assert hidden[0].sum() == 0  # The slab top is only partly under the small box
+    assert hidden[1].sum() == 2  # The small box's bottom lies on the slab
+
+
+def test_separate_boxes_hide_nothing():
+    extents = np.ones((2, 3))
+    centers = np.array([[0, 0, 0], [3, 0, 0]], dtype=np.float64)
+    assert not hidden_triangles(extents, centers).any()
+
+
+def test_weld_vertices_merges_shared_corners():
+    extents = np.ones((2, 3))
+    centers = np.array([[0, 0, 0.5], [0, 0, 1.5]])
+    vertices, faces = boxes_to_arrays(extents, centers)
+    welded, remapped = weld_vertices(vertices, faces)
+    assert len(welded) == 12  # 16 corners, 4 of them shared
+    np.testing.assert_allclose(welded[remapped], vertices[faces])
+
+
+def test_optimize_boxes_keeps_the_visible_surface():
+    extents, centers = story_layout(0.2, floor_layout(4, 4, 32))
+    vertices, faces, stats = optimize_boxes(extents, centers)
+    assert stats['triangles_after'] < stats['triangles_before']
+    assert stats['vertices_after'] < stats['vertices_before']
+    assert (len(faces), len(vertices)) == (stats['triangles_after'], stats['vertices_after'])
+    # Every remaining triangle is one of the original, visible ones
+    all_vertices, all_faces = boxes_to_arrays(extents, centers)
+    visible = all_vertices[all_faces[~hidden_triangles(extents, centers)]]
+    np.testing.assert_allclose(vertices[faces], visible)
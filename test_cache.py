@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from artifact_store import DiskBlobStore, SpillingStore
+from cache import BlobStore, ModelCache, RenderCache, content_id
+
+
+def test_blob_store_evicts_least_recently_used():
+    store = BlobStore(max_bytes=10)
+    store.put('a', b'12345')
+    store.put('b', b'12345')
+    store.get('a')  # 'b' is now the least recently used
+    store.put('c', b'12345')
+    assert 'a' in store and 'c' in store and 'b' not in store
+    assert store.evictions == 1 and store.total_bytes == 10
+
+
+def test_blob_store_expires_entries():
+    store = BlobStore(ttl=0.01)
+    store.put('a', b'data')
+    time.sleep(0.02)
+    assert 'a' not in store
+    assert store.get('a') is None
+    assert store.expirations == 1
+
+
+def test_render_cache_shares_ids_between_equal_keys():
+    calls = []
+    cache = RenderCache(lambda value: calls.append(value) or value.encode(), key_func=lambda value: (value.strip(),))
+    first = cache.get_or_render(' x ')
+    assert cache.get_or_render('x') == first == content_id(b'x')
+    assert calls == ['x']
+
+
+def test_render_cache_forgets_evicted_artifacts():
+    cache = RenderCache(lambda value: value * 8, max_bytes=8)
+    cache.get_or_render(b'a')
+    cache.get_or_render(b'b')  # Evicts the first artifact
+    assert cache.lookup(b'a') is None
+    assert cache.lookup(b'b') is not None
+
+
+def test_lookup_does_not_read_spilled_payloads(tmp_path, monkeypatch):
+    spill = DiskBlobStore(str(tmp_path), suffix='.glb')
+    store = SpillingStore(BlobStore(), spill, threshold=4)
+    cache = RenderCache(lambda value: value, store=store)
+    artifact_id = cache.get_or_render(b'large payload')
+    assert store.path(artifact_id) is not None
+
+    def fail(key):
+        raise AssertionError('lookup read the payload')
+
+    monkeypatch.setattr(spill, 'get', fail)
+    hits = spill.hits
+    for _ in range(20):
+        assert cache.lookup(b'large payload') == artifact_id
+    assert spill.hits == hits
+
+
+def test_model_cache_normalizes_equivalent_parameters():
+    key = ModelCache.normalize_key(' Wood ', 2.0, 0.01, 'full', 5, 5, 40)
+    assert key == ('wood', 2, 0.05, 'full', 5.0, 5.0, 50.0)
+    assert ModelCache.normalize_key('wood', 2, 0.05, 'full', 5, 5, 50) == key
+
+
+def test_model_cache_rejects_oversized_buildings():
+    with pytest.raises(ValueError):
+        ModelCache.normalize_key('wood', 20, 0.2, 'full', 0.6, 0.6, 20000)
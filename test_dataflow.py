@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from dataflow import Dataflow
+
+
+def build(calls, debounce=0.01):
+    fluxo = Dataflow(debounce=debounce)
+    fluxo.stage('soma', lambda a, b: calls.append('soma') or a + b, ('a', 'b'))
+    fluxo.stage('dobro', lambda soma: calls.append('dobro') or 2 * soma, ('soma',))
+    fluxo.stage('c_mais_um', lambda c: calls.append('c_mais_um') or c + 1, ('c',))
+    fluxo.seed(a=1, b=2, c=3)
+    return fluxo
+
+
+def test_first_run_computes_every_stage():
+    calls = []
+    fluxo = build(calls)
+    assert asyncio.run(fluxo.run()) == ['soma', 'dobro', 'c_mais_um']
+    assert fluxo.values['dobro'] == 6 and fluxo.values['c_mais_um'] == 4
+
+
+def test_only_dependent_stages_are_recomputed():
+    calls = []
+    fluxo = build(calls)
+
+    async def scenario():
+        await fluxo.run()
+        calls.clear()
+        fluxo.seed(c=10)
+        return await fluxo.run()
+
+    assert asyncio.run(scenario()) == ['c_mais_um']
+    assert calls == ['c_mais_um']
+
+
+def test_unchanged_outputs_stop_propagation():
+    calls = []
+    fluxo = build(calls)
+
+    async def scenario():
+        await fluxo.run()
+        calls.clear()
+        fluxo.seed(a=2, b=1)  # Same sum: 'dobro' does not run
+        return await fluxo.run()
+
+    assert asyncio.run(scenario()) == ['soma']
+    assert calls == ['soma']
+
+
+def test_memoized_stages_answer_repeated_inputs():
+    calls = []
+    fluxo = build(calls)
+
+    async def scenario():
+        await fluxo.run()
+        fluxo.seed(c=10)
+        await fluxo.run()
+        calls.clear()
+        fluxo.seed(c=3)  # Back to a value computed before
+        return await fluxo.run()
+
+    assert asyncio.run(scenario()) == ['c_mais_um']
+    assert calls == []  # Answered from the memo
+
+
+def test_set_debounces_fast_edits():
+    calls = []
+    fluxo = build(calls, debounce=0.05)
+
+    async def scenario():
+        await fluxo.run()
+        calls.clear()
+        for value in range(5):
+            fluxo.set(c=100 + value)
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert calls == ['c_mais_um']
+    assert fluxo.values['c_mais_um'] == 105
+
+
+def test_cancel_drops_the_pending_run():
+    calls = []
+    fluxo = build(calls, debounce=0.02)
+
+    async def scenario():
+        fluxo.set(c=5)
+        fluxo.cancel()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert calls == []
+
+
+def test_incomplete_inputs_wait_for_a_value():
+    calls = []
+    fluxo = build(calls)
+
+    async def scenario():
+        await fluxo.run()
+        calls.clear()
+        fluxo.seed(a=None)
+        first = await fluxo.run()
+        fluxo.seed(a=5)
+        return first, await fluxo.run()
+
+    skipped, computed = asyncio.run(scenario())
+    assert skipped == [] and computed == ['soma', 'dobro']
+    assert fluxo.values['dobro'] == 14
+
+
+def test_failing_stage_keeps_its_output_and_is_retried():
+    fluxo = Dataflow(debounce=0)
+    fluxo.stage('inverso', lambda x: 1 / x, ('x',))
+    fluxo.seed(x=2)
+
+    async def scenario():
+        await fluxo.run()
+        fluxo.seed(x=0)
+        failed = await fluxo.run()
+        kept = fluxo.values['inverso']
+        fluxo.seed(x=4)
+        return failed, kept, await fluxo.run()
+
+    failed, kept, retried = asyncio.run(scenario())
+    assert failed == [] and kept == 0.5
+    assert retried == ['inverso'] and fluxo.values['inverso'] == 0.25
+
+
+def test_stages_must_be_declared_in_dependency_order():
+    fluxo = Dataflow()
+    fluxo.stage('b', lambda a: a, ('a',))
+    with pytest.raises(ValueError):
+        fluxo.stage('a', lambda: 1, ())
+    with pytest.raises(ValueError):
+        fluxo.stage('b', lambda a: a, ('a',))
+
+
+def test_coroutine_stages_are_awaited():
+    async def lenta(x):
+        await asyncio.sleep(0)
+        return x * 3
+
+    fluxo = Dataflow()
+    fluxo.stage('triplo', lenta, ('x',))
+    fluxo.seed(x=2)
+    asyncio.run(fluxo.run())
+    assert fluxo.values['triplo'] == 6
@@ -0,0 +1,65 @@
+import numpy as np
+
+from building_model import generate_with, stream_with
+from glb import accessor_array, quantize_glb, quantize_positions, read_glb
+
+
+def world_positions(data):
+    """Every vertex (per instance for instanced meshes) in world space, dequantized through the node transform."""
+    gltf, binary = read_glb(data)
+    points = []
+    for node in gltf['nodes']:
+        if 'mesh' not in node:
+            continue
+        translation = np.array(node.get('translation', [0.0, 0.0, 0.0]))
+        scale = np.array(node.get('scale', [1.0, 1.0, 1.0]))
+        instancing = node.get('extensions', {}).get('EXT_mesh_gpu_instancing')
+        offsets = accessor_array(gltf, binary, instancing['attributes']['TRANSLATION']) if instancing else np.zeros((1, 3))
+        for primitive in gltf['meshes'][node['mesh']]['primitives']:
+            vertices = accessor_array(gltf, binary, primitive['attributes']['POSITION']).astype(np.float64)
+            local = offsets.astype(np.float64)[:, None, :] + vertices[None, :, :]
+            points.append(translation + scale * local.reshape(-1, 3))
+    return np.concatenate(points), gltf
+
+
+def scales(gltf):
+    return np.array([node['scale'] for node in gltf['nodes'] if 'scale' in node])
+
+
+def test_quantize_positions_rounds_to_the_grid():
+    positions = np.array([[0.0, 1.0, -1.0], [0.5, 0.25, 0.126]])
+    quantized = quantize_positions(positions, 0.0, 0.25)
+    assert quantized.dtype == np.int16
+    assert np.all(np.abs(quantized * 0.25 - positions) <= 0.125)
+
+
+def test_instanced_model_error_is_within_one_step():
+    raw = stream_with('steel', 40, 0.2, 'full', 5, 5, 400).to_bytes()
+    quantized = quantize_glb(raw)
+    assert len(quantized) < len(raw)
+    before, _ = world_positions(raw)
+    after, gltf = world_positions(quantized)
+    assert 'KHR_mesh_quantization' in gltf['extensionsRequired']
+    # Vertex and instance translation are each rounded to half a step of the node scale
+    step = scales(gltf).max(axis=0)
+    assert np.all(np.abs(after - before) <= step + 1e-4)
+
+
+def test_mesh_model_error_is_within_half_a_step():
+    raw = generate_with('concrete', 3, 0.2, return_bytes=True, export_mode='mesh', grid_x=5, grid_y=5, area=100)
+    quantized = quantize_glb(raw)
+    before, _ = world_positions(raw)
+    after, gltf = world_positions(quantized)
+    gltf_raw, _ = read_glb(raw)
+    assert len(quantized) < len(raw)
+    step = scales(gltf).max(axis=0)
+    assert np.all(np.abs(after - before) <= step / 2 + 1e-5)
+    # The extent of the model bounds the step: 16-bit over the half range
+    extent = before.max(axis=0) - before.min(axis=0)
+    assert np.all(step <= extent / 2 / 32767 + 1e-12)
+    assert len(gltf['accessors']) == len(gltf_raw['accessors'])
+
+
+def test_quantize_glb_returns_files_it_cannot_shrink_unchanged():
+    raw = generate_with('wood', 2, 0.2, return_bytes=True, export_mode='nodes')
+    assert quantize_glb(raw) == raw  # One node per element: the node transforms outweigh the savings
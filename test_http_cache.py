@@ -0,0 +1,153 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+
+from http_cache import UncompressedPaths, cached_file_response, cached_response, conditional_range, parse_range, streamed_response
+
+BODY = bytes(range(256)) * 4096  # 1 MiB, compressible enough for gzip to kick in
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / 'model.glb'
+    path.write_bytes(BODY)
+    app = FastAPI()
+    app.add_middleware(GZipMiddleware, minimum_size=500)
+    app.add_middleware(UncompressedPaths, prefixes=('/file', '/bytes', '/stream'))
+
+    @app.get('/file')
+    async def get_file(request: Request):
+        return cached_file_response(request, str(path), 'model/gltf-binary', 'abc')
+
+    @app.get('/bytes')
+    async def get_bytes(request: Request):
+        return cached_response(request, BODY, 'model/gltf-binary', 'abc')
+
+    @app.get('/stream')
+    async def get_stream(request: Request):
+        return streamed_response(request, iter([BODY[:len(BODY) // 2], BODY[len(BODY) // 2:]]), len(BODY), 'model/gltf-binary', 'abc')
+
+    @app.get('/page')
+    async def get_page():
+        return Response(content=BODY, media_type='text/plain')
+
+    return Client(app)
+
+
+class Client:
+    # Starlette's TestClient predates the installed httpx, so requests go through its ASGI transport
+    def __init__(self, app):
+        self.app = app
+
+    def get(self, url, headers=None):
+        async def send():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app), base_url='http://test') as client:
+                return await client.get(url, headers=headers)
+        return asyncio.run(send())
+
+
+class FakeRequest:
+    def __init__(self, **headers):
+        self.headers = {name.replace('_', '-'): value for name, value in headers.items()}
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('bytes=0-99', (0, 99)),
+    ('bytes=100-', (100, 999)),
+    ('bytes=-100', (900, 999)),
+    ('bytes=-5000', (0, 999)),  # Suffix longer than the body: the whole body
+    ('bytes=990-5000', (990, 999)),  # End clamped to the body
+    ('bytes=999-999', (999, 999)),
+    ('bytes=50-10', None),  # Inverted: ignored
+    ('bytes=0-9,20-29', None),  # Several ranges: full body
+    ('items=0-9', None),
+    ('bytes=a-b', None),
+    ('bytes=-', None),
+    ('bytes=5', None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=5000-6000', 'bytes=-0'])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_conditional_range_not_modified():
+    response, byte_range = conditional_range(FakeRequest(if_none_match='W/"x", "abc"', range='bytes=0-9'), 1000, {'ETag': '"abc"'})
+    assert response.status_code == 304 and byte_range is None
+
+
+def test_conditional_range_not_satisfiable():
+    headers = {'ETag': '"abc"'}
+    response, _ = conditional_range(FakeRequest(range='bytes=1000-'), 1000, headers)
+    assert response.status_code == 416
+    assert headers['Content-Range'] == 'bytes */1000'
+
+
+def test_conditional_range_if_range():
+    headers = {'ETag': '"abc"'}
+    assert conditional_range(FakeRequest(range='bytes=0-9', if_range='"abc"'), 1000, headers) == (None, (0, 9))
+    assert headers['Content-Range'] == 'bytes 0-9/1000'
+    # A stale validator gets the full body
+    headers = {'ETag': '"abc"'}
+    assert conditional_range(FakeRequest(range='bytes=0-9', if_range='"old"'), 1000, headers) == (None, None)
+    assert 'Content-Range' not in headers
+
+
+def test_range_response_is_sent_uncompressed(client):
+    response = client.get('/bytes', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=0-999999'})
+    assert response.status_code == 206
+    assert 'content-encoding' not in response.headers
+    assert response.headers['content-range'] == f'bytes 0-999999/{len(BODY)}'
+    assert response.content == BODY[:1000000]
+
+
+def test_full_response_is_sent_uncompressed(client):
+    response = client.get('/bytes', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+    assert response.headers['content-length'] == str(len(BODY))
+
+
+def test_file_response_is_sent_uncompressed(client):
+    response = client.get('/file', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'content-encoding' not in response.headers
+    assert response.headers['content-length'] == str(len(BODY))
+    assert response.headers['etag'] == '"abc"'
+    assert response.content == BODY
+
+
+def test_file_range_is_sent_uncompressed(client):
+    response = client.get('/file', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=1000-1999'})
+    assert response.status_code == 206
+    assert 'content-encoding' not in response.headers
+    assert response.headers['content-range'] == f'bytes 1000-1999/{len(BODY)}'
+    assert response.content == BODY[1000:2000]
+
+
+def test_file_response_honors_if_none_match(client):
+    assert client.get('/file', headers={'If-None-Match': '"abc"'}).status_code == 304
+
+
+def test_missing_file_returns_none(tmp_path):
+    assert cached_file_response(None, str(tmp_path / 'gone.glb'), 'model/gltf-binary', 'abc') is None
+
+
+def test_streamed_response_keeps_its_content_length(client):
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+    assert response.headers['content-length'] == str(len(BODY))
+    assert response.content == BODY
+
+
+def test_other_paths_are_still_compressed(client):
+    response = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.content == BODY
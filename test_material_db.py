@@ -0,0 +1,26 @@
+import numpy as np
+
+from material_db import DEFAULT_RATES, DEFAULT_SCENARIO, MATERIAIS, MaterialDatabase
+
+
+def test_defaults_give_illustrative_rates(tmp_path):
+    database = MaterialDatabase(str(tmp_path / 'missing.xlsx')).refresh()
+    assert database.source == 'defaults'
+    rates, from_workbook = database.rates()
+    assert rates == [list(DEFAULT_RATES[material]) for material in MATERIAIS]
+    assert not from_workbook
+
+
+def test_rates_come_from_the_default_scenario_rows(tmp_path):
+    database = MaterialDatabase(str(tmp_path / 'missing.xlsx')).refresh()
+    scenarios = database.columns['cenario']
+    for index, name in enumerate(('custo_m3', 'carbono_m3', 'peso_m3')):
+        # Only the default scenario's rows are rates; other scenarios must be ignored
+        database.columns[name] = np.where(scenarios == DEFAULT_SCENARIO, index + 1.0, 999.0)
+    rates, from_workbook = database.rates()
+    assert rates == [[1.0, 2.0, 3.0]] * len(MATERIAIS)
+    assert from_workbook
+
+    database.columns['peso_m3'][0] = np.nan  # An incomplete row falls back to the built-in rates
+    rates, from_workbook = database.rates()
+    assert rates[0] == list(DEFAULT_RATES[MATERIAIS[0]]) and not from_workbook
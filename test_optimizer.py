@@ -0,0 +1,75 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from optimizer import COMBINACOES, avaliar_bloco, espaco_de_projeto, fronteira_pareto, grids_entre, otimizar, taxas_materiais
+from sizing import secao_viga
+
+
+def dominated_brute_force(points):
+    dominated = np.all(points[:, None] >= points[None], axis=2) & np.any(points[:, None] > points[None], axis=2)
+    return ~dominated.any(axis=1)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_fronteira_pareto_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    points = rng.integers(0, 20, (400, 3)).astype(np.float64)  # Small integers: many ties and duplicates
+    np.testing.assert_array_equal(fronteira_pareto(points), dominated_brute_force(points))
+
+
+def test_fronteira_pareto_keeps_duplicates_and_drops_dominated_points():
+    points = np.array([[1, 2], [1, 2], [2, 1], [2, 2], [3, 3]], dtype=np.float64)
+    assert fronteira_pareto(points).tolist() == [True, True, True, False, False]
+
+
+def test_grids_entre_includes_the_maximum():
+    assert grids_entre(3, 4, 0.5).tolist() == [3.0, 3.5, 4.0]
+
+
+def test_espaco_de_projeto_prunes_only_dominated_geometries():
+    espaco = espaco_de_projeto(500, 3, grids_entre(3, 6, 0.5))
+    assert len(espaco['volumes']) < espaco['enumeradas']
+    assert fronteira_pareto(espaco['volumes']).all()
+    # Every plan covers the area
+    assert np.all(espaco['bays_x'] * espaco['grid_x'] * espaco['bays_y'] * espaco['grid_y'] >= 500 - 1e-6)
+    # Sections follow the panel rules for the spans
+    base, altura = secao_viga(np.maximum(espaco['grid_x'], espaco['grid_y']))
+    assert np.array_equal(espaco['base_viga'], base) and np.array_equal(espaco['altura_viga'], altura)
+
+
+def exhaustive_front(area, pavimentos, grids):
+    espaco = espaco_de_projeto(area, pavimentos, grids)
+    taxas, _ = taxas_materiais()
+    objetivos = np.einsum('ge,ceo->gco', espaco['volumes'], taxas[COMBINACOES]).reshape(-1, taxas.shape[-1])
+    return {tuple(np.round(o, 2)) for o in objetivos[fronteira_pareto(objetivos)]}
+
+
+def test_otimizar_finds_the_exhaustive_front():
+    grids = grids_entre(3, 6, 0.5)
+    busca = asyncio.run(otimizar(800, 4, grids))
+    found = {(s['custo'], s['carbono'], s['peso']) for s in busca['solucoes']}
+    assert found == exhaustive_front(800, 4, grids)
+    custos = [s['custo'] for s in busca['solucoes']]
+    assert custos == sorted(custos)
+    assert busca['avaliados'] <= busca['candidatos']
+
+
+def test_otimizar_blocks_give_the_same_front():
+    grids = grids_entre(3, 6, 0.5)
+
+    async def submit(function, *args):
+        return function(*args)
+
+    inline = asyncio.run(otimizar(800, 4, grids))
+    blocks = asyncio.run(otimizar(800, 4, grids, submit=submit, candidatos_por_bloco=50))
+    assert blocks['solucoes'] == inline['solucoes']
+
+
+def test_avaliar_bloco_scores_each_element_with_its_material():
+    taxas = np.array([[1.0, 10.0, 100.0], [2.0, 20.0, 200.0], [3.0, 30.0, 300.0]])
+    volumes = np.array([[1.0, 0.0, 0.0]])  # Only slab volume: the score follows the slab material alone
+    geometria, combinacao, objetivos = avaliar_bloco(volumes, taxas)
+    assert set(COMBINACOES[combinacao, 0].tolist()) == {0}
+    assert np.all(objetivos == [1.0, 10.0, 100.0])
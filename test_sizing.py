@@ -0,0 +1,29 @@
+import pytest
+
+from sizing import dimensionar, ler_linhas
+
+
+@pytest.mark.parametrize('corpo', [
+    b'[{"grid_x": 5, "grid_y": 6}]',
+    b'{"grid_x": 5, "grid_y": 6}',
+    b'{"grid_x": [5], "grid_y": [6]}',
+    b'{"rows": [{"grid_x": 5, "grid_y": 6}]}',
+])
+def test_ler_linhas_json_shapes(corpo):
+    linhas = ler_linhas(corpo, 'application/json')
+    assert linhas.to_dict('records') == [{'grid_x': 5, 'grid_y': 6}]
+
+
+def test_ler_linhas_csv_with_decimal_commas():
+    linhas = ler_linhas(b'grid_x;grid_y\n5,5;6\n', 'text/csv')
+    assert linhas.to_dict('records') == [{'grid_x': 5.5, 'grid_y': 6}]
+
+
+def test_ler_linhas_rejects_scalars():
+    with pytest.raises(ValueError):
+        ler_linhas(b'5', 'application/json')
+
+
+def test_dimensionar_single_object_row():
+    resultado = dimensionar(ler_linhas(b'{"grid_x": 5, "grid_y": 6}', 'application/json'))
+    assert len(resultado) == 1 and resultado['secao_viga'][0] == '240 x 600'
@@ -0,0 +1,51 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from metrics import ERRORS
+from workers import PoolBusy, WorkerPool
+
+
+def crash():
+    os._exit(1)
+
+
+def errors(source):
+    return ERRORS._values.get((('source', source),), 0)
+
+
+def test_submit_runs_in_a_worker_process():
+    pool = WorkerPool(max_workers=1)
+    try:
+        assert asyncio.run(pool.submit(os.getpid)) != os.getpid()
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+def test_pool_recovers_after_a_worker_dies():
+    pool = WorkerPool(max_workers=1)
+    before = errors('worker_pool')
+
+    async def scenario():
+        with pytest.raises(BrokenProcessPool):
+            await pool.submit(crash)
+        return await pool.submit(pow, 2, 10)
+
+    try:
+        assert asyncio.run(scenario()) == 1024
+        assert errors('worker_pool') == before + 1
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+def test_submit_refuses_work_when_full():
+    pool = WorkerPool(max_workers=1, max_pending=0)
+    try:
+        with pytest.raises(PoolBusy):
+            asyncio.run(pool.submit(pow, 2, 10))
+    finally:
+        pool.shutdown()
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+import building_model
+import charts
+import glb
+from cache import render_model
+from charts import MATERIAIS, render_charts_png
+from workers import PoolBusy
+
+# Where the warm cache keeps its index and artifacts; mount it as a volume to survive redeploys
+WARM_CACHE_DIR = os.environ.get('WARM_CACHE_DIR', os.path.join('artifacts', 'warm'))
+INDEX_NAME = 'index.json'
+
+# Request counts kept per model key, so a long tail of one-off parameters can't grow the index
+MAX_TRACKED_KEYS = 1000
+
+
+def code_version(*modules):
+    """
+    Retorna um hash curto do código-fonte dos módulos: muda a cada alteração no código que gera os artefatos.
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class WarmCache:
+    """
+    Cache persistente dos modelos mais pedidos e dos gráficos, recarregado a cada inicialização.
+
+    Requests for full-detail models are counted per normalized key; `warm_up` generates the
+    `max_models` most requested ones (plus any given defaults) that are not cached yet and
+    writes them to `directory` next to an index. `load` puts them back into the caches at
+    boot, so the first users after a restart or deploy are served from the cache.
+
+    Every section of the index records the version of the code that produced it (a hash of
+    the geometry/GLB or chart source, plus the export mode). Entries from another version
+    are deleted on load and rebuilt by the next warm-up; request counts are kept.
+
+    Parameters:
+    - model_cache (ModelCache): Cache the models are loaded into and generated with.
+    - chart_cache (RenderCache | None): Chart PNG cache (None skips charts).
+    - directory (str): Directory for the index and the artifact files.
+    - export_mode (str): GLB export mode of `model_cache`.
+    - max_models (int): Number of most requested models kept warm.
+    """
+
+    def __init__(self, model_cache, chart_cache=None, directory=WARM_CACHE_DIR, export_mode='instanced', max_models=20):
+        self.model_cache = model_cache
+        self.chart_cache = chart_cache
+        self.directory = directory
+        self.max_models = max_models
+        self.model_version = f'{export_mode}:{code_version(building_model, glb)}'
+        self.chart_version = code_version(charts)
+        self.requests = Counter()  # JSON model key -> request count
+        self.models = {}  # JSON model key -> file name
+        self.charts = {}  # material -> {'key': chart key, 'file': file name}
+
+    # --- Index ---
+    def load(self):
+        """
+        Lê o índice e carrega nos caches os artefatos da versão atual do código.
+
+        Returns:
+        - int: Number of artifacts loaded (0 if there is no index yet).
+        """
+        try:
+            with open(os.path.join(self.directory, INDEX_NAME), encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            sys.stderr.write(f"Ignoring unreadable warm cache index: {e}\n")
+            return 0
+
+        self.requests.update(index.get('requests', {}))
+        models = index.get('models', {})
+        if models.get('version') == self.model_version:
+            self.models = dict(models.get('entries', {}))
+        charts_section = index.get('charts', {})
+        if charts_section.get('version') == self.chart_version:
+            self.charts = dict(charts_section.get('entries', {}))
+
+        loaded = 0
+        for key_json, filename in list(self.models.items()):
+            key = self._model_key(key_json)
+            data = self._read(filename) if key is not None else None
+            if data is None:
+                del self.models[key_json]
+                continue
+            self.model_cache.put(key, data)
+            loaded += 1
+        if self.chart_cache is not None:
+            for material, entry in list(self.charts.items()):
+                # Charts also depend on the material database: skip those whose data changed
+                key = self.chart_cache.normalize_key(material)
+                data = self._read(entry['file']) if key == tuple(tuple(serie) for serie in entry['key']) else None
+                if data is None:
+                    del self.charts[material]
+                    continue
+                self.chart_cache.put(key, data)
+                loaded += 1
+        self._collect_garbage()
+        return loaded
+
+    def save(self):
+        """
+        Grava o índice (versões, artefatos e contagem de pedidos) de forma atômica.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.requests = Counter(dict(self.requests.most_common(MAX_TRACKED_KEYS)))
+        index = {
+            'models': {'version': self.model_version, 'entries': self.models},
+            'charts': {'version': self.chart_version, 'entries': self.charts},
+            'requests': dict(self.requests),
+        }
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, os.path.join(self.directory, INDEX_NAME))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def record(self, material_type, num_floors, thickness, grid_x=None, grid_y=None, area=None):
+        """
+        Conta um pedido do modelo completo com estes parâmetros.
+        """
+        key = self.model_cache.normalize_key(material_type, num_floors, thickness, 'full', grid_x, grid_y, area)
+        self.requests[json.dumps(key)] += 1
+
+    def popular_models(self, defaults=()):
+        """
+        Retorna as chaves normalizadas a manter aquecidas: os padrões e depois as mais pedidas.
+        """
+        keys = [json.dumps(self.model_cache.normalize_key(*key)) for key in defaults]
+        for key_json, _ in self.requests.most_common():
+            if len(keys) >= self.max_models + len(defaults):
+                break
+            if key_json not in keys and self._model_key(key_json) is not None:
+                keys.append(key_json)
+        return keys
+
+    def _model_key(self, key_json):
+        # None for keys over the current element limit (e.g. counted before MODEL_MAX_ELEMENTS was lowered)
+        try:
+            return self.model_cache.normalize_key(*json.loads(key_json))
+        except ValueError:
+            return None
+
+    # --- Warm-up ---
+    async def warm_up(self, pool, defaults=()):
+        """
+        Gera no pool os modelos populares e os gráficos que faltam e os grava no disco.
+
+        Artifacts already in the caches (e.g. generated for a user) are just copied to disk.
+        Stops early, keeping what was done, when the pool refuses work (users come first).
+
+        Parameters:
+        - pool (WorkerPool): Pool the artifacts are rendered in.
+        - defaults (iterable): Model keys always kept warm (e.g. the initial model).
+
+        Returns:
+        - int: Number of artifacts written.
+        """
+        written = 0
+        wanted = self.popular_models(defaults)
+        try:
+            for key_json in wanted:
+                if key_json in self.models:
+                    continue
+                key = self.model_cache.normalize_key(*json.loads(key_json))
+                model_id = self.model_cache.lookup(*key)
+                if model_id is None:
+                    glb_bytes = await pool.submit(render_model, self.model_cache.generator, key)
+                    if not glb_bytes:
+                        continue
+                    model_id = self.model_cache.put(key, glb_bytes)
+                filename = self._write(self.model_cache.store, model_id, '.glb')
+                if filename:
+                    self.models[key_json] = filename
+                    written += 1
+
+            for material in MATERIAIS if self.chart_cache is not None else ():
+                key = self.chart_cache.normalize_key(material)
+                entry = self.charts.get(material)
+                if entry is not None and key == tuple(tuple(serie) for serie in entry['key']):
+                    continue
+                image_id = self.chart_cache.lookup(material)
+                if image_id is None:
+                    image_id = self.chart_cache.put(key, await pool.submit(render_charts_png, *key))
+                filename = self._write(self.chart_cache.store, image_id, '.png') if image_id else None
+                if filename:
+                    self.charts[material] = {'key': [list(serie) for serie in key], 'file': filename}
+                    written += 1
+        except PoolBusy:
+            pass
+        finally:
+            # Models that dropped out of the most requested ones give their files back
+            for key_json in [k for k in self.models if k not in wanted]:
+                del self.models[key_json]
+            self.save()
+            self._collect_garbage()
+        return written
+
+    # --- Files ---
+    def _read(self, filename):
+        try:
+            with open(os.path.join(self.directory, filename), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, store, artifact_id, suffix):
+        # Content-addressed file names: an artifact that is already on disk is not written again
+        filename = artifact_id + suffix
+        path = os.path.join(self.directory, filename)
+        if os.path.exists(path):
+            return filename
+        source = store.path(artifact_id)
+        data = None if source else store.get(artifact_id)
+        if not source and data is None:
+            return None  # Evicted in the meantime: the next warm-up renders it again
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if source:
+                    with open(source, 'rb') as spilled:
+                        shutil.copyfileobj(spilled, f)  # Spilled models are copied without loading them
+                else:
+                    f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return filename
+
+    def _collect_garbage(self):
+        # Files of stale versions, evicted models and interrupted writes
+        referenced = set(self.models.values()) | {entry['file'] for entry in self.charts.values()} | {INDEX_NAME}
+        try:
+            filenames = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for filename in filenames:
+            if filename not in referenced:
+                try:
+                    os.unlink(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
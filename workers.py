@@ -0,0 +1,82 @@
+import asyncio
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from metrics import ERRORS, JOB_SECONDS, call_recorded, replay
+
+
+class PoolBusy(Exception):
+    """Raised when the worker queue is full and a new job is refused."""
+
+
+class WorkerPool:
+    """
+    Pool de processos para trabalho pesado de CPU (geração de GLB, renderização de gráficos).
+
+    At most `max_pending` jobs (running plus queued) are accepted at a time; further
+    submissions raise PoolBusy immediately instead of queuing without bound, so the
+    caller can tell the user to try again. The executor is created on first use, which
+    keeps importing this module free of side effects. If a worker dies (e.g. killed for
+    running out of memory) the executor is broken for good: it is dropped and the next
+    submission starts a fresh one.
+
+    Parameters:
+    - max_workers (int | None): Number of worker processes (None uses the CPU count).
+    - max_pending (int | None): Queue bound; defaults to twice the number of workers.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            if self.max_pending is None:
+                self.max_pending = 2 * self._executor._max_workers
+        return self._executor
+
+    @property
+    def busy(self):
+        return self.max_pending is not None and self.pending >= self.max_pending
+
+    async def submit(self, callback, *args, **kwargs):
+        """
+        Executa `callback(*args, **kwargs)` em um processo do pool e aguarda o resultado.
+
+        The callback and its arguments must be picklable (module-level functions only).
+        Metric observations made in the worker are replayed into this process's registry.
+
+        Raises:
+        - PoolBusy: If `max_pending` jobs are already in flight.
+        - BrokenProcessPool: If a worker died while the job was pending (the pool is replaced).
+        """
+        executor = self.executor
+        if self.busy:
+            raise PoolBusy(f'{self.pending} jobs already pending')
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with JOB_SECONDS.time(job=getattr(callback, '__name__', 'job')):
+                result, samples = await loop.run_in_executor(executor, partial(call_recorded, callback, *args, **kwargs))
+            replay(samples)
+            return result
+        except BrokenProcessPool as e:
+            # Every job in flight fails with the same error: only the first one replaces the executor
+            if self._executor is executor:
+                ERRORS.inc(source='worker_pool')
+                sys.stderr.write(f"Worker pool broken, restarting it: {e}\n")
+                self.shutdown()
+            raise
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None